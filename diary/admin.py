@@ -2,8 +2,9 @@ from django.contrib import admin
 from django.shortcuts import redirect
 from django.urls import path
 from django.contrib import messages
-from .models import Parameter, Entry, EntryValue
+from .models import Parameter, Entry, EntryValue, TrainingJob
 from diary.scripts.import_excel_to_db import run_excel_import
+from diary.ml_utils.utils import get_excel_export_path, start_debug_excel_export
 
 import re
 
@@ -36,14 +37,21 @@ class ParameterAdmin(admin.ModelAdmin):
         urls = super().get_urls()
         custom_urls = [
             path('import_excel/', self.admin_site.admin_view(self.import_excel), name="import_excel"),
+            path('export_excel/', self.admin_site.admin_view(self.export_excel), name="export_excel"),
         ]
         return custom_urls + urls
 
     def import_excel(self, request):
-        created, updated = run_excel_import()
+        created, updated = run_excel_import(request.FILES.get("excel_file"))
         self.message_user(request, f"✅ Импорт завершён. Создано: {created}, обновлено: {updated}", messages.SUCCESS)
         return redirect("..")
 
+    def export_excel(self, request):
+        start_debug_excel_export()
+        self.message_user(request, f"📄 Выгрузка Excel запущена в фоне: {get_excel_export_path()}", messages.INFO)
+        return redirect("..")
+
 admin.site.register(Parameter, ParameterAdmin)
 admin.site.register(Entry)
 admin.site.register(EntryValue)
+admin.site.register(TrainingJob)
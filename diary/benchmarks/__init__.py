@@ -0,0 +1,12 @@
+# diary/benchmarks/__init__.py
+"""Бенчмарки дневника: синтетические данные + замеры горячих путей.
+
+Запуск: `python manage.py bench_diary --years 5 --params 200 --output bench.json`;
+`--compare old.json` печатает отношения к предыдущему отчёту.
+Нагрузочный тест записи: `python manage.py load_test_writes --threads 8`.
+"""
+from .generator import generate_diary
+from .harness import compare_reports, measure, run_cases
+from .load import run_write_load
+
+__all__ = ["compare_reports", "generate_diary", "measure", "run_cases", "run_write_load"]
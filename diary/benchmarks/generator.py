@@ -0,0 +1,96 @@
+# diary/benchmarks/generator.py
+"""Синтетический дневник для бенчмарков.
+
+Заполняет `Parameter` / `Entry` / `EntryValue` заданного размера
+с «реалистичной» разреженностью:
+
+• у каждого параметра своя доля заполненных дней (Beta‑распределение:
+  часть параметров отмечается почти каждый день, часть — изредка);
+• часть дней пропущена целиком (`skip_days`);
+• значения 0‑5 зависят от нескольких скрытых факторов дня, поэтому
+  между параметрами есть корреляции и регрессиям есть что учить.
+
+Запись идёт через `bulk_create` пачками, поэтому сигналы не срабатывают —
+в конце собираются широкие строки дней (`diary.wide`), статистики
+live-модели помечаются устаревшими и поднимается версия данных
+(как в импорте из Excel).
+"""
+from __future__ import annotations
+
+import logging
+from datetime import date, timedelta
+from typing import Dict
+
+import numpy as np
+from django.db import transaction
+
+from diary import wide
+from diary.data_version import bump_data_version
+from diary.ml_utils.live_stats import mark_stale
+from diary.models import Entry, EntryValue, Parameter
+
+logger = logging.getLogger("diary.benchmarks")
+
+BATCH_SIZE = 5000
+N_FACTORS = 4
+
+
+def generate_diary(
+    *,
+    years: float = 5,
+    params: int = 200,
+    density: float = 0.3,
+    skip_days: float = 0.05,
+    seed: int = 0,
+    end: date | None = None,
+) -> Dict[str, int]:
+    """Создаёт синтетическую историю; возвращает число созданных строк.
+
+    `density` — средняя доля заполненных ячеек у параметра в записанный день.
+    """
+    rng = np.random.default_rng(seed)
+    end = end or date.today() - timedelta(days=1)
+    n_days = max(1, int(round(years * 365)))
+    days = [end - timedelta(days=n_days - 1 - i) for i in range(n_days)]
+    days = [d for d, skip in zip(days, rng.random(n_days) < skip_days) if not skip]
+
+    # --- Профили параметров ---
+    a = 2.0
+    fill = rng.beta(a, a * (1 - density) / max(density, 1e-6), size=params)
+    loadings = rng.normal(0, 1, size=(params, N_FACTORS))
+    base_level = rng.uniform(0.5, 3.0, size=params)
+
+    # --- Значения: скрытые факторы дня + шум, округление к шкале 0‑5 ---
+    factors = rng.normal(0, 1, size=(len(days), N_FACTORS))
+    raw = base_level + 0.6 * factors @ loadings.T + rng.normal(0, 0.7, size=(len(days), params))
+    values = np.clip(np.rint(raw), 0, 5)
+    present = rng.random((len(days), params)) < fill
+
+    with transaction.atomic():
+        Parameter.objects.bulk_create(
+            [Parameter(key=f"bench-{i:04d}", name_ru=f"Параметр {i + 1}") for i in range(params)],
+            batch_size=BATCH_SIZE,
+        )
+        Entry.objects.bulk_create([Entry(date=d) for d in days], batch_size=BATCH_SIZE)
+
+        param_ids = list(
+            Parameter.objects.filter(key__startswith="bench-").order_by("key").values_list("id", flat=True)
+        )
+        entry_ids = dict(Entry.objects.filter(date__in=days).values_list("date", "id"))
+
+        rows, cols = np.nonzero(present)
+        batch = []
+        for r, c in zip(rows.tolist(), cols.tolist()):
+            batch.append(EntryValue(entry_id=entry_ids[days[r]], parameter_id=param_ids[c], value=float(values[r, c])))
+            if len(batch) >= BATCH_SIZE:
+                EntryValue.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            EntryValue.objects.bulk_create(batch)
+        wide.refresh_rows(entry_ids.values())
+
+    mark_stale()
+    bump_data_version(parameters=True)
+    counts = {"parameters": params, "entries": len(days), "values": int(present.sum())}
+    logger.info("🧪 Синтетический дневник: %(parameters)d параметров, %(entries)d дней, %(values)d значений", counts)
+    return counts
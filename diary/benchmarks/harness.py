@@ -0,0 +1,85 @@
+# diary/benchmarks/harness.py
+"""Замеры горячих путей дневника.
+
+Каждый сценарий — функция без аргументов. `measure()` прогоняет её
+`repeat` раз и записывает время (min / median / max, секунды). Затем
+делает ещё один прогон под `CaptureQueriesContext` и `tracemalloc` и
+записывает число SQL-запросов и пиковую память Python-аллокаций
+(NumPy и pandas тоже учитываются). Трассировка памяти замедляет код,
+поэтому в замер времени этот прогон не входит.
+
+`compare_reports()` сравнивает два JSON-отчёта, например до и после коммита.
+"""
+from __future__ import annotations
+
+import gc
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+COMPARED_METRICS = ("wall_median", "queries", "peak_mem_bytes")
+
+
+def _ratio(before: float, after: float) -> float:
+    if before:
+        return after / before
+    return 1.0 if not after else float("inf")
+
+
+def measure(fn: Callable[[], Any], *, repeat: int = 5, setup: Callable[[], Any] | None = None) -> Dict[str, float]:
+    """Время, число запросов и пиковая память одного сценария.
+
+    `setup` вызывается перед каждым прогоном (и не входит в замер),
+    например чтобы сбросить кэш для «холодного» варианта.
+    """
+    timings: List[float] = []
+    for _ in range(max(1, repeat)):
+        if setup:
+            setup()
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+
+    if setup:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "wall_min": min(timings),
+        "wall_median": statistics.median(timings),
+        "wall_max": max(timings),
+        "repeat": len(timings),
+        "queries": len(queries.captured_queries),
+        "peak_mem_bytes": peak,
+    }
+
+
+def run_cases(cases: Iterable[Tuple[str, Callable[[], Any], Dict[str, Any]]], *, repeat: int = 5) -> Dict[str, Dict]:
+    """Прогоняет сценарии `(имя, функция, опции measure)` по порядку."""
+    results: Dict[str, Dict] = {}
+    for name, fn, options in cases:
+        results[name] = measure(fn, repeat=options.get("repeat", repeat), setup=options.get("setup"))
+    return results
+
+
+def compare_reports(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+    """Отношения new/old по медианному времени, запросам и памяти."""
+    diff: Dict[str, Dict[str, float]] = {}
+    for name, after in new.get("results", {}).items():
+        before = old.get("results", {}).get(name)
+        if not before:
+            continue
+        diff[name] = {metric: _ratio(before[metric], after[metric]) for metric in COMPARED_METRICS}
+    return diff
@@ -0,0 +1,211 @@
+# diary/benchmarks/load.py
+"""Нагрузочный тест записи: несколько потоков кликают слайдеры одновременно.
+
+`run_write_load()` на временной SQLite-базе (как `run_benchmarks`)
+прогоняет один и тот же сценарий в двух профилях:
+
+• `baseline` — как было до настройки: журнал `DELETE`, `synchronous=FULL`,
+  отложенные (DEFERRED) транзакции, соединение на каждый запрос, и каждый
+  клик пишет сам путём прежнего `update_value`
+  (`get_or_create` + `update_or_create`);
+• `tuned` — текущие настройки: PRAGMA из `DIARY_SQLITE_PRAGMAS` (WAL,
+  `synchronous=NORMAL`, `busy_timeout`), `transaction_mode=IMMEDIATE`,
+  постоянные соединения и запись через `diary.write_queue`.
+
+Сценарий: `threads` потоков в течение `seconds` секунд пишут одиночные
+значения (случайный день из последних `days`, случайный параметр).
+Параллельно фоновая «задача» читает всю матрицу (`wide.read_matrix`, как
+обучение) и время от времени пишет пакет (как импорт).
+
+По каждому профилю: успешные записи, ошибки блокировки («database is
+locked»), прочие ошибки, записей в секунду и задержка клика p50/p95.
+"""
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection, connections
+from django.test.utils import override_settings
+
+from diary import wide
+from diary.catalog import get_catalog
+from diary.db import get_pragmas
+from diary.models import Entry, EntryValue
+from diary.write_queue import write_queue
+from diary.writes import apply_value_operations
+
+from .generator import generate_diary
+from .suite import isolated_database
+
+logger = logging.getLogger("diary.benchmarks")
+
+PROFILES = ("baseline", "tuned")
+IMPORT_EVERY = 5  # каждое какое чтение фоновой задачи сопровождается пакетной записью
+IMPORT_SIZE = 50
+
+
+def _profile_settings(profile: str) -> Dict[str, Any]:
+    if profile == "baseline":
+        return {
+            # busy_timeout = 5 с — значение по умолчанию у sqlite3.connect
+            "pragmas": {"journal_mode": "delete", "synchronous": "full", "busy_timeout": 5000},
+            "options": {},
+            "conn_max_age": 0,
+            "queue": False,
+        }
+    return {
+        "pragmas": get_pragmas(),
+        "options": dict(settings.DATABASES["default"].get("OPTIONS", {})),
+        "conn_max_age": settings.DATABASES["default"].get("CONN_MAX_AGE", 0),
+        "queue": True,
+    }
+
+
+def _legacy_write(op: Dict[str, Any]) -> None:
+    """Запись одного значения так, как её делал `update_value` до очереди."""
+    entry, _ = Entry.objects.get_or_create(date=op["date"])
+    EntryValue.objects.update_or_create(
+        entry=entry,
+        parameter_id=get_catalog().id_for(op["parameter"]),
+        defaults={"value": op["value"]},
+    )
+
+
+def _queued_write(op: Dict[str, Any]) -> None:
+    result = write_queue.apply([op])[0]
+    if result["status"] == "error":
+        raise ValueError(result["message"])
+
+
+def _is_lock_error(exc: Exception) -> bool:
+    message = str(exc).lower()
+    return isinstance(exc, OperationalError) and ("locked" in message or "busy" in message)
+
+
+def _run_profile(profile: str, *, threads: int, seconds: float, days: List, keys: List[str], seed: int) -> Dict[str, Any]:
+    config = _profile_settings(profile)
+    db = connection.settings_dict
+    saved = (dict(db.get("OPTIONS", {})), db.get("CONN_MAX_AGE", 0))
+    db["OPTIONS"], db["CONN_MAX_AGE"] = dict(config["options"]), config["conn_max_age"]
+    write: Callable[[Dict[str, Any]], None] = _queued_write if config["queue"] else _legacy_write
+
+    latencies: List[float] = []
+    counts = {"writes": 0, "lock_errors": 0, "errors": 0, "job_reads": 0, "job_imports": 0, "job_lock_errors": 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def writer(worker: int) -> None:
+        rng = random.Random(seed * 1000 + worker)
+        try:
+            while not stop.is_set():
+                op = {"date": rng.choice(days).isoformat(), "parameter": rng.choice(keys), "value": rng.randint(0, 5)}
+                started = time.perf_counter()
+                try:
+                    write(op)
+                    outcome = "writes"
+                except Exception as exc:
+                    outcome = "lock_errors" if _is_lock_error(exc) else "errors"
+                    if outcome == "errors":
+                        logger.warning("⚠️ Нагрузочный тест (%s): %s", profile, exc)
+                elapsed = time.perf_counter() - started
+                with lock:
+                    counts[outcome] += 1
+                    if outcome == "writes":
+                        latencies.append(elapsed)
+                close_old_connections()  # конец «запроса»
+        finally:
+            connections.close_all()
+
+    def job() -> None:
+        rng = random.Random(seed)
+        param_ids = [get_catalog().by_key[k].id for k in keys]
+        try:
+            while not stop.is_set():
+                try:
+                    wide.read_matrix(param_ids)
+                    outcome = "job_reads"
+                    if (counts["job_reads"] + 1) % IMPORT_EVERY == 0:
+                        apply_value_operations([
+                            {"date": rng.choice(days).isoformat(), "parameter": rng.choice(keys), "value": rng.randint(0, 5)}
+                            for _ in range(IMPORT_SIZE)
+                        ])
+                        with lock:
+                            counts["job_imports"] += 1
+                except Exception as exc:
+                    if not _is_lock_error(exc):
+                        raise
+                    outcome = "job_lock_errors"
+                with lock:
+                    counts[outcome] += 1
+                close_old_connections()
+        finally:
+            connections.close_all()
+
+    try:
+        with override_settings(DIARY_SQLITE_PRAGMAS=config["pragmas"], DIARY_WRITE_QUEUE=config["queue"]):
+            connections.close_all()  # новые соединения получат PRAGMA профиля
+            workers = [threading.Thread(target=writer, args=(i,), name=f"load-writer-{i}") for i in range(threads)]
+            workers.append(threading.Thread(target=job, name="load-job"))
+            started = time.perf_counter()
+            for thread in workers:
+                thread.start()
+            time.sleep(seconds)
+            stop.set()
+            for thread in workers:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            write_queue.stop()
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode")
+                journal_mode = cursor.fetchone()[0]
+    finally:
+        db["OPTIONS"], db["CONN_MAX_AGE"] = saved
+        connections.close_all()
+
+    lat = np.asarray(latencies) * 1000 if latencies else np.array([np.nan])
+    attempts = counts["writes"] + counts["lock_errors"] + counts["errors"]
+    report = {
+        **counts,
+        "journal_mode": journal_mode,
+        "seconds": elapsed,
+        "writes_per_sec": counts["writes"] / elapsed,
+        "lock_error_rate": counts["lock_errors"] / attempts if attempts else 0.0,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p95_ms": float(np.percentile(lat, 95)),
+    }
+    logger.info(
+        "🔥 Нагрузка %s: %d записей (%.0f/с), блокировок %d, p95 %.1f мс",
+        profile, counts["writes"], report["writes_per_sec"], counts["lock_errors"], report["p95_ms"],
+    )
+    return report
+
+
+def run_write_load(
+    *,
+    threads: int = 8,
+    seconds: float = 5.0,
+    params: int = 50,
+    years: float = 1,
+    days: int = 30,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Оба профиля на одной временной БД; возвращает `{"config": ..., "results": {профиль: метрики}}`."""
+    with isolated_database(prefix="diary-load-"):
+        generate_diary(years=years, params=params, seed=seed)
+        last = Entry.objects.order_by("-date").values_list("date", flat=True)[:days]
+        recent = sorted(last)
+        keys = sorted(get_catalog().by_key)
+        results = {
+            profile: _run_profile(profile, threads=threads, seconds=seconds, days=recent, keys=keys, seed=seed)
+            for profile in PROFILES
+        }
+    return {
+        "config": {"threads": threads, "seconds": seconds, "params": params, "years": years, "days": days, "seed": seed},
+        "results": results,
+    }
@@ -0,0 +1,203 @@
+# diary/benchmarks/suite.py
+"""Набор сценариев бенчмарка и его запуск на изолированной БД.
+
+`run_benchmarks()` создаёт отдельную тестовую SQLite-базу (рабочая
+не трогается), наполняет её `generate_diary()` и замеряет:
+
+• `train_models` — команду обучения (`--force`);
+• `get_diary_dataframe` — «холодную» сборку (без кэша и снапшота) и из кэша;
+• `_predict_for_row` в режимах live и base;
+• варианты базовой модели `base` / `flags` / `hybrid`: обучение всех целей
+  (`train_models[...]`) и прогноз дня (`predict[...]`);
+• GET страницы дневника (`add_entry`), POST `predict_today`, POST `update_value`.
+
+Модели, снапшот и выгрузки пишутся во временный каталог.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from itertools import cycle
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import django
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from diary import snapshot, views
+from diary.ml_utils import live_stats, utils
+from diary.ml_utils.utils import get_diary_dataframe
+from diary.ml_utils.variants import VARIANTS
+
+from .generator import generate_diary
+from .harness import run_cases
+
+logger = logging.getLogger("diary.benchmarks")
+_UNSET = object()
+
+
+def _reset_frame_caches() -> None:
+    """Сбрасывает кэши процесса и снапшот на диске («холодный» старт)."""
+    utils._frame_cache.clear()
+    snapshot._opened.clear()
+    shutil.rmtree(snapshot.get_snapshot_dir(), ignore_errors=True)
+
+
+def variant_cases(df: pd.DataFrame, today_values: Dict[str, float], *, jobs: int = 1) -> List:
+    """Стоимость обучения и прогноза для каждого варианта модели.
+
+    `train_models[...]` обучает и публикует все цели варианта (для `base`
+    это общий сценарий `train_models`). `predict[...]` строит прогноз дня
+    по опубликованным моделям. Кэш прогнозов сбрасывается перед каждым
+    прогоном, чтобы замерялся сам расчёт.
+    """
+    cases: List = []
+    for name, variant in VARIANTS.items():
+        if name != "base":
+            cases.append((
+                f"train_models[{name}]",
+                lambda name=name: call_command("train_models", force=True, jobs=jobs, model=name),
+                {"repeat": 1},
+            ))
+        cases.append((
+            f"predict[{name}]",
+            lambda variant=variant: views._predict_for_row(df, today_values, mode="base", variant=variant),
+            {"setup": views.prediction_cache.clear},
+        ))
+    return cases
+
+
+def build_cases(*, jobs: int = 1) -> List:
+    """Сценарии в порядке запуска: обучение первым (base-прогнозам нужны модели),
+    запись — последней (она инвалидирует кэши)."""
+    client = Client()
+    df = get_diary_dataframe()
+    today_values = df.drop(columns="date").iloc[-1].to_dict()
+    first_key = df.columns[1]
+    write_values = cycle([1, 2])
+    write_date = (date.today() - timedelta(days=1)).isoformat()
+
+    def post_json(name: str, payload: Any):
+        response = client.post(reverse(name), json.dumps(payload), content_type="application/json")
+        assert response.status_code == 200, (name, response.status_code)
+        return response
+
+    def get_page():
+        response = client.get(reverse("diary:add_entry"))
+        assert response.status_code == 200, response.status_code
+
+    return [
+        ("train_models", lambda: call_command("train_models", force=True, jobs=jobs), {"repeat": 1}),
+        ("get_diary_dataframe[cold]", get_diary_dataframe, {"setup": _reset_frame_caches}),
+        ("get_diary_dataframe[warm]", get_diary_dataframe, {}),
+        ("_predict_for_row[live]", lambda: views._predict_for_row(df, today_values, mode="live"), {}),
+        ("_predict_for_row[base]", lambda: views._predict_for_row(df, today_values, mode="base"), {}),
+        *variant_cases(df, today_values, jobs=jobs),
+        ("add_entry[GET]", get_page, {}),
+        ("predict_today", lambda: post_json("diary:predict_today", today_values), {}),
+        (
+            "update_value",
+            lambda: post_json(
+                "diary:update_value", {"date": write_date, "parameter": first_key, "value": next(write_values)}
+            ),
+            {},
+        ),
+    ]
+
+
+def _git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def _max_rss_bytes() -> int | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if platform.system() == "Darwin" else rss * 1024
+
+
+@contextmanager
+def isolated_database(prefix: str = "diary-bench-") -> Iterator[Path]:
+    """Временная SQLite-база и каталоги моделей/снапшотов; после выхода удаляются."""
+    workdir = Path(tempfile.mkdtemp(prefix=prefix))
+    test_settings = connection.settings_dict.setdefault("TEST", {})
+    saved_name = test_settings.get("NAME", _UNSET)
+    test_settings["NAME"] = str(workdir / "bench.sqlite3")
+    try:
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(
+                DIARY_BASE_MODEL_DIR=workdir / "models",
+                DIARY_SNAPSHOT_DIR=workdir / "snapshots",
+                DIARY_EXCEL_EXPORT_PATH=workdir / "debug_diary_dataframe.xlsx",
+                ALLOWED_HOSTS=["testserver"],
+            ):
+                _reset_frame_caches()
+                yield workdir
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+    finally:
+        # Следующий прогон (или тест-раннер) не должен унаследовать путь бенчмарка
+        if saved_name is _UNSET:
+            test_settings.pop("NAME", None)
+        else:
+            test_settings["NAME"] = saved_name
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_benchmarks(
+    *,
+    years: float = 5,
+    params: int = 200,
+    density: float = 0.3,
+    seed: int = 0,
+    repeat: int = 5,
+    jobs: int = 1,
+) -> Dict[str, Any]:
+    """Полный прогон на временной БД; возвращает отчёт (JSON-совместимый dict)."""
+    with isolated_database():
+        started = time.perf_counter()
+        counts = generate_diary(years=years, params=params, density=density, seed=seed)
+        generate_seconds = time.perf_counter() - started
+
+        live_stats.get_live_system()  # статистики собираются один раз, как после импорта
+        results = run_cases(build_cases(jobs=jobs), repeat=repeat)
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "config": {"years": years, "params": params, "density": density, "seed": seed,
+                       "repeat": repeat, "jobs": jobs},
+            "data": counts,
+            "generate_seconds": generate_seconds,
+            "max_rss_bytes": _max_rss_bytes(),
+        },
+        "results": results,
+    }
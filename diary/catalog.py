@@ -0,0 +1,83 @@
+# diary/catalog.py
+"""Справочник параметров: key ↔ id ↔ название, кэш в процессе.
+
+• Вместо `Parameter.objects.get(key=...)` на каждое поле формы —
+  один запрос на весь набор параметров, дальше словари.
+• Кэш ключуется версией параметров (`get_parameters_version`): её
+  поднимают только сигналы Parameter, так что записи значений кэш не
+  сбрасывают, а изменения параметров из других воркеров видны.
+  В своём процессе сигнал сбрасывает кэш сразу (`invalidate`).
+• `entry_values(entry_id)` — значения одной записи одним запросом
+  (широкая строка дня, `diary.wide`) в виде `{key: value}`; этот
+  словарь передаётся и в `EntryForm`, и в шаблон — повторно не читается.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Dict, List, NamedTuple
+
+from .data_version import get_parameters_version
+from .models import EntryRow, Parameter
+
+
+class ParamInfo(NamedTuple):
+    id: int
+    key: str
+    name_ru: str
+    active: bool
+
+
+class ParameterCatalog:
+    """Неизменяемый снимок таблицы Parameter."""
+
+    def __init__(self, params: List[ParamInfo]) -> None:
+        self.all = params
+        self.active = [p for p in params if p.active]
+        self.by_key: Dict[str, ParamInfo] = {p.key: p for p in params}
+        self.by_id: Dict[int, ParamInfo] = {p.id: p for p in params}
+
+    @property
+    def active_keys(self) -> List[str]:
+        return [p.key for p in self.active]
+
+    def id_for(self, key: str) -> int:
+        """`Parameter.id` по ключу; KeyError, если такого параметра нет."""
+        return self.by_key[key].id
+
+    def entry_values(self, entry_id: int | None) -> Dict[str, float | None]:
+        """`{key: value}` записи за один запрос (только активные параметры)."""
+        if entry_id is None:
+            return {}
+        data = EntryRow.objects.filter(entry_id=entry_id).values_list("data", flat=True).first() or {}
+        out: Dict[str, float | None] = {}
+        for param_id, value in data.items():
+            info = self.by_id.get(int(param_id))
+            if info is not None and info.active:
+                out[info.key] = value
+        return out
+
+
+_cache: Dict[int, ParameterCatalog] = {}
+_lock = threading.Lock()
+
+
+def get_catalog() -> ParameterCatalog:
+    """Справочник для текущей версии параметров (из кэша, если есть)."""
+    version = get_parameters_version()
+    catalog = _cache.get(version)
+    if catalog is not None:
+        return catalog
+    with _lock:
+        catalog = _cache.get(version)
+        if catalog is None:
+            rows = Parameter.objects.order_by("id").values_list("id", "key", "name_ru", "active")
+            catalog = ParameterCatalog([ParamInfo(*row) for row in rows])
+            _cache.clear()
+            _cache[version] = catalog
+    return catalog
+
+
+def invalidate() -> None:
+    """Сбрасывает кэш процесса (вызывается сигналами Parameter)."""
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,58 @@
+# diary/data_version.py
+"""Версия данных дневника.
+
+• Хранится в БД (`DataVersion`, одна строка) — поэтому общая для всех
+  WSGI‑воркеров и процессов `manage.py`.
+• `bump_data_version()` вызывается сигналами (см. `diary/signals.py`)
+  и явно там, где сигналы не срабатывают (`bulk_create` / `bulk_update`).
+• `get_data_version()` — один запрос по первичному ключу; кэши
+  сравнивают её со своей и пересобирают данные только при изменении.
+• `get_parameters_version()` — отдельный счётчик изменений Parameter
+  (`bump_data_version(parameters=True)`); им ключуется справочник
+  параметров (`diary.catalog`), которому записи значений не важны.
+"""
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import DataVersion
+
+_VERSION_PK = 1
+
+
+def get_data_version() -> int:
+    """Текущая версия данных (0, если записей ещё не было)."""
+    version = DataVersion.objects.filter(pk=_VERSION_PK).values_list("version", flat=True).first()
+    return int(version or 0)
+
+
+def get_parameters_version() -> int:
+    """Версия набора параметров (0, если параметры ещё не менялись)."""
+    version = DataVersion.objects.filter(pk=_VERSION_PK).values_list("parameters", flat=True).first()
+    return int(version or 0)
+
+
+async def aget_data_version() -> int:
+    """Async-вариант `get_data_version` (для ASGI-вьюх)."""
+    version = await DataVersion.objects.filter(pk=_VERSION_PK).values_list("version", flat=True).afirst()
+    return int(version or 0)
+
+
+def bump_data_version(*, parameters: bool = False) -> int:
+    """Атомарно увеличивает версию и возвращает новое значение.
+
+    `parameters=True` — изменились сами параметры: растёт и их версия.
+    """
+    updates = {"version": F("version") + 1}
+    if parameters:
+        updates["parameters"] = F("parameters") + 1
+    with transaction.atomic():
+        updated = DataVersion.objects.filter(pk=_VERSION_PK).update(**updates)
+        if not updated:
+            _, created = DataVersion.objects.get_or_create(
+                pk=_VERSION_PK, defaults={"version": 1, "parameters": int(parameters)}
+            )
+            if not created:
+                DataVersion.objects.filter(pk=_VERSION_PK).update(**updates)
+    return get_data_version()
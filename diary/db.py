@@ -0,0 +1,51 @@
+# diary/db.py
+"""Настройка соединений SQLite.
+
+На каждое новое соединение (`connection_created`) выполняются PRAGMA
+из `settings.DIARY_SQLITE_PRAGMAS`, по умолчанию:
+
+• `journal_mode=wal` — читатели (обучение, выгрузки, страницы) не
+  блокируют запись, а запись не блокирует их;
+• `synchronous=normal` — в режиме WAL fsync только на checkpoint,
+  коммит не ждёт диск (целостность базы сохраняется);
+• `busy_timeout` — сколько миллисекунд ждать занятую базу, прежде чем
+  вернуть «database is locked».
+
+Остальное задаётся в `DATABASES`: `transaction_mode = "IMMEDIATE"` —
+транзакция сразу берёт блокировку записи. Иначе два писателя, начавшие
+транзакцию с чтения, взаимно блокируются при повышении блокировки,
+и SQLite отвечает ошибкой без ожидания. `CONN_MAX_AGE` держит
+соединения между запросами. Другие СУБД модуль не трогает.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger("diary.db")
+
+DEFAULT_PRAGMAS: Dict[str, Any] = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "busy_timeout": 20_000,
+}
+
+
+def get_pragmas() -> Dict[str, Any]:
+    return dict(getattr(settings, "DIARY_SQLITE_PRAGMAS", DEFAULT_PRAGMAS))
+
+
+def apply_pragmas(connection, **kwargs) -> None:
+    """`connection_created`: PRAGMA для SQLite-соединения."""
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name, value in get_pragmas().items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    logger.debug("🔌 SQLite-соединение настроено: %s", get_pragmas())
+
+
+connection_created.connect(apply_pragmas, dispatch_uid="diary_sqlite_pragmas")
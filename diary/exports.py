@@ -0,0 +1,122 @@
+# diary/exports.py
+"""Потоковая выгрузка матрицы «дата × параметр» (CSV / Parquet).
+
+• Строки читаются из широкой таблицы (`diary.wide`, одна строка на день)
+  одним упорядоченным запросом через `.iterator()` (серверный курсор там,
+  где БД его поддерживает) — в памяти только текущая пачка строк.
+• CSV отдаётся пачками строк, Parquet — по одной row group за раз:
+  после каждой группы накопленные байты сразу уходят клиенту.
+• `pyarrow` — необязательная зависимость, нужна только для Parquet.
+"""
+from __future__ import annotations
+
+import csv
+import io
+from datetime import date
+from typing import Iterator, List, Sequence, Tuple
+
+from . import wide
+from .models import Parameter
+
+CHUNK_ROWS = 1000
+
+Row = Tuple[date, List[float | None]]
+
+
+def resolve_columns(keys: Sequence[str] | None = None) -> List[Tuple[int, str]]:
+    """(id, key) активных параметров: все по id или в порядке `keys`."""
+    params = dict(Parameter.objects.filter(active=True).values_list("key", "id"))
+    if keys:
+        return [(params[k], k) for k in keys if k in params]
+    return sorted(((pid, key) for key, pid in params.items()))
+
+
+def iter_matrix_rows(
+    columns: List[Tuple[int, str]],
+    *,
+    start: date | None = None,
+    end: date | None = None,
+) -> Iterator[Row]:
+    """Строки матрицы по возрастанию даты; пропуски = None.
+
+    Дни, где нет ни одного из `columns`, пропускаются.
+    """
+    keys = [str(pid) for pid, _ in columns]
+    for day, data in wide.iter_rows(start=start, end=end):
+        if any(k in data for k in keys):
+            yield day, [data.get(k) for k in keys]
+
+
+def _batched(rows: Iterator[Row], size: int) -> Iterator[List[Row]]:
+    batch: List[Row] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_csv(columns: List[Tuple[int, str]], rows: Iterator[Row]) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["date", *(key for _, key in columns)])
+    for batch in _batched(rows, CHUNK_ROWS):
+        for day, values in batch:
+            writer.writerow([day.isoformat(), *("" if v is None else v for v in values)])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+class _DrainableSink(io.RawIOBase):
+    """Файловый объект для ParquetWriter, из которого можно забирать байты."""
+
+    def __init__(self) -> None:
+        self._parts: List[bytes] = []
+        self._pos = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._parts.append(chunk)
+        self._pos += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def drain(self) -> bytes:
+        data, self._parts = b"".join(self._parts), []
+        return data
+
+
+def stream_parquet(columns: List[Tuple[int, str]], rows: Iterator[Row]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([("date", pa.date32()), *((key, pa.float64()) for _, key in columns)])
+    sink = _DrainableSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in _batched(rows, CHUNK_ROWS):
+            arrays = [pa.array([day for day, _ in batch], type=pa.date32())]
+            arrays += [pa.array([values[i] for _, values in batch], type=pa.float64()) for i in range(len(columns))]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
@@ -6,14 +6,20 @@
   из `EntryValue` и проставляет их как initial, чтобы выбранные кнопки
   были подсвечены при открытии страницы.
 • Аргумент `instance` сохраняется в `self.instance`.
+• Параметры берутся из справочника (`diary.catalog`), значения можно
+  передать готовыми (`values={key: value}`) — тогда форма не делает
+  ни одного запроса.
 """
 from __future__ import annotations
 
-from typing import Any
+import logging
+from typing import Any, Dict
 
 from django import forms
 
-from .models import Parameter, EntryValue
+from .catalog import ParameterCatalog, get_catalog
+
+logger = logging.getLogger(__name__)
 
 
 class EntryForm(forms.Form):
@@ -23,15 +29,22 @@ class EntryForm(forms.Form):
         widget=forms.Textarea(attrs={"rows": 2}),
     )
 
-    def __init__(self, *args: Any, **kwargs: Any):
+    def __init__(
+        self,
+        *args: Any,
+        catalog: ParameterCatalog | None = None,
+        values: Dict[str, float | None] | None = None,
+        **kwargs: Any,
+    ):
         # Забираем Entry, если передан
         self.instance = kwargs.pop("instance", None)
         super().__init__(*args, **kwargs)
+        catalog = catalog or get_catalog()
 
         # ------------------------------------------------------------------
         # Динамически создаём числовые поля 0‑5 по активным параметрам
         # ------------------------------------------------------------------
-        for param in Parameter.objects.filter(active=True):
+        for param in catalog.active:
             self.fields[param.key] = forms.IntegerField(
                 label=param.name_ru,
                 required=False,
@@ -43,17 +56,14 @@ class EntryForm(forms.Form):
         # ------------------------------------------------------------------
         # Проставляем initial из EntryValue, чтобы кнопки подсветились
         # ------------------------------------------------------------------
-        if self.instance and self.instance.pk:
-            import logging
-            logger = logging.getLogger(__name__)
-
-            values_qs = EntryValue.objects.filter(entry=self.instance).select_related("parameter")
+        if values is None and self.instance and self.instance.pk:
+            values = catalog.entry_values(self.instance.pk)
+        if values:
             logger.debug("📋 Entry instance: %s", self.instance)
-            logger.debug("📊 Entry values: %s", [(ev.parameter.key, ev.value) for ev in values_qs])
-            for ev in values_qs:
-                key = ev.parameter.key
+            logger.debug("📊 Entry values: %s", values)
+            for key, value in values.items():
                 if key in self.fields:
-                    self.initial[key] = ev.value
+                    self.initial[key] = value
 
     # Пока сохранение логики нет — заглушка
     def save(self):
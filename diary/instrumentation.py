@@ -0,0 +1,185 @@
+# diary/instrumentation.py
+"""Лёгкие замеры стадий запроса: время и число SQL-запросов.
+
+• `stage("имя")` — контекстный менеджер и декоратор. Засекает время
+  и число ORM-запросов внутри блока. Вложенные стадии допустимы.
+• `StageTimingMiddleware` (sync и async) открывает сборщик на запрос.
+  Запросы считает обёртка, которая ставится на каждое соединение
+  (`connection_created`). Сборщик хранится в contextvar, поэтому
+  запросы из `sync_to_async` и пула потоков тоже учитываются.
+  Весь запрос пишется стадией `request:<view_name>`. При `DIARY_SERVER_TIMING = True`
+  стадии отдаются в заголовке `Server-Timing` (видно в DevTools).
+• По каждой стадии в памяти процесса хранится скользящее окно
+  последних `DIARY_TIMING_WINDOW` замеров; `snapshot()` считает по нему
+  p50 / p95 / p99 (эндпоинт `/metrics/timings/`).
+
+Вне запроса (команды, фоновые задачи) стадии тоже попадают в окна,
+но запросы к БД не считаются.
+"""
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import deque
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Tuple
+
+import numpy as np
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+from django.db.backends.signals import connection_created
+
+DEFAULT_WINDOW = 1024
+
+_windows: Dict[str, Deque[Tuple[float, int]]] = {}
+_windows_lock = threading.Lock()
+
+
+class RequestTimings:
+    """Стадии одного запроса + счётчик SQL-запросов."""
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.stages: List[Tuple[str, float, int]] = []
+
+
+_current: ContextVar[RequestTimings | None] = ContextVar("diary_request_timings", default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    timings = _current.get()
+    if timings is not None:
+        timings.queries += 1
+    return execute(sql, params, many, context)
+
+
+def _install_counter(connection, **kwargs) -> None:
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+connection_created.connect(_install_counter, dispatch_uid="diary_instrumentation_counter")
+
+
+def _window_size() -> int:
+    return int(getattr(settings, "DIARY_TIMING_WINDOW", DEFAULT_WINDOW))
+
+
+def record(name: str, seconds: float, queries: int = 0) -> None:
+    """Добавляет замер в скользящее окно стадии."""
+    window = _windows.get(name)
+    if window is None:
+        with _windows_lock:
+            window = _windows.setdefault(name, deque(maxlen=_window_size()))
+    window.append((seconds, queries))
+
+
+class stage(ContextDecorator):
+    """Замер стадии: `with stage("render"): ...` или `@stage("fit")`."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._started = 0.0
+        self._queries = 0
+
+    def _recreate_cm(self) -> "stage":
+        # Декоратор создаёт новый замер на каждый вызов (потокобезопасно)
+        return type(self)(self.name)
+
+    def __enter__(self) -> "stage":
+        timings = _current.get()
+        self._queries = timings.queries if timings else 0
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        elapsed = time.perf_counter() - self._started
+        timings = _current.get()
+        queries = 0
+        if timings is not None:
+            queries = timings.queries - self._queries
+            timings.stages.append((self.name, elapsed, queries))
+        record(self.name, elapsed, queries)
+        return False
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    """Перцентили по всем стадиям (миллисекунды) и запросы на вызов."""
+    with _windows_lock:
+        items = [(name, list(window)) for name, window in _windows.items()]
+
+    report: Dict[str, Dict[str, Any]] = {}
+    for name, samples in sorted(items):
+        if not samples:
+            continue
+        arr = np.array(samples, dtype=np.float64)
+        p50, p95, p99 = np.percentile(arr[:, 0] * 1000.0, [50, 95, 99])
+        report[name] = {
+            "count": len(samples),
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+            "max_ms": round(float(arr[:, 0].max() * 1000.0), 3),
+            "queries_mean": round(float(arr[:, 1].mean()), 2),
+            "queries_max": int(arr[:, 1].max()),
+        }
+    return report
+
+
+def reset() -> None:
+    with _windows_lock:
+        _windows.clear()
+
+
+def _server_timing(timings: RequestTimings, total: float) -> str:
+    parts = [f'{re.sub(r"[^A-Za-z0-9_.-]", "_", name)};dur={sec * 1000:.1f};desc="{queries} q"'
+             for name, sec, queries in timings.stages]
+    parts.append(f'total;dur={total * 1000:.1f};desc="{timings.queries} q"')
+    return ", ".join(parts)
+
+
+class StageTimingMiddleware:
+    """Сборщик стадий на каждый запрос + общий замер `request:<view>`."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        _install_counter(connection)  # соединение могло открыться до импорта модуля
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, started)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timings, started)
+
+    def _finish(self, request, response, timings: RequestTimings, started: float):
+        total = time.perf_counter() - started
+        match = getattr(request, "resolver_match", None)
+        view_name = match.view_name if match else "unresolved"
+        record(f"request:{view_name}", total, timings.queries)
+        if getattr(settings, "DIARY_SERVER_TIMING", False):
+            response["Server-Timing"] = _server_timing(timings, total)
+        return response
@@ -0,0 +1,111 @@
+# diary/jobs.py
+"""Фоновые задачи обучения без внешних сервисов.
+
+• Очередь — таблица `TrainingJob`; исполнитель — daemon‑поток в том
+  процессе, который принял запрос (никаких subprocess / Celery).
+• Повторный запрос, пока задача в очереди или выполняется, возвращает
+  ту же задачу: уникальное поле `active_key` защищает от гонки даже
+  между несколькими воркерами.
+• Прогресс (`progress_done / progress_total`) обновляется после каждой
+  обученной цели — его опрашивает UI через `/train-models/status/<id>/`.
+• Задача «running», не обновлявшаяся дольше
+  `settings.DIARY_TRAINING_STALE_SECONDS` (процесс умер), считается
+  упавшей и не блокирует новый запуск.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from datetime import timedelta
+from typing import Any, Dict, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import TrainingJob
+
+logger = logging.getLogger("train_models")
+
+TRAIN_KIND = "train_models"
+
+
+def _stale_after() -> timedelta:
+    return timedelta(seconds=getattr(settings, "DIARY_TRAINING_STALE_SECONDS", 30 * 60))
+
+
+def _release_stale(kind: str) -> None:
+    """Снимает блокировку с задач, чей процесс, по-видимому, умер."""
+    TrainingJob.objects.filter(
+        active_key=kind,
+        updated_at__lt=timezone.now() - _stale_after(),
+    ).update(
+        active_key=None,
+        status=TrainingJob.STATUS_FAILED,
+        message="Задача прервана (нет обновлений прогресса)",
+        finished_at=timezone.now(),
+    )
+
+
+def enqueue_training(**params: Any) -> Tuple[TrainingJob, bool]:
+    """Ставит обучение в очередь. Возвращает (задача, создана_ли_новая)."""
+    _release_stale(TRAIN_KIND)
+    params.setdefault("jobs", getattr(settings, "DIARY_TRAINING_JOBS", 1))
+    try:
+        with transaction.atomic():
+            job = TrainingJob.objects.create(kind=TRAIN_KIND, active_key=TRAIN_KIND, params=params)
+    except IntegrityError:
+        active = TrainingJob.objects.filter(active_key=TRAIN_KIND).first()
+        if active is not None:
+            logger.info("🔁 Обучение уже идёт — возвращаем задачу #%s", active.pk)
+            return active, False
+        return enqueue_training(**params)  # активная задача успела завершиться
+
+    threading.Thread(target=_run_job, args=(job.pk,), name=f"diary-train-{job.pk}", daemon=True).start()
+    logger.info("🟡 Задача обучения #%s поставлена в очередь", job.pk)
+    return job, True
+
+
+def _run_job(job_id: int) -> None:
+    from .ml_utils.training import run_training
+
+    def progress(done: int, total: int, target: str) -> None:
+        TrainingJob.objects.filter(pk=job_id).update(
+            progress_done=done, progress_total=total, message=f"Обучено: {target}", updated_at=timezone.now()
+        )
+
+    try:
+        job = TrainingJob.objects.get(pk=job_id)
+        TrainingJob.objects.filter(pk=job_id).update(
+            status=TrainingJob.STATUS_RUNNING, started_at=timezone.now(), updated_at=timezone.now()
+        )
+        version, trained = run_training(progress=progress, **job.params)
+        TrainingJob.objects.filter(pk=job_id).update(
+            status=TrainingJob.STATUS_DONE,
+            active_key=None,
+            message=f"Версия {version}: обучено моделей {len(trained)}",
+            finished_at=timezone.now(),
+        )
+        logger.info("🟢 Задача обучения #%s завершена", job_id)
+    except Exception as exc:
+        logger.exception("Задача обучения #%s упала", job_id)
+        TrainingJob.objects.filter(pk=job_id).update(
+            status=TrainingJob.STATUS_FAILED, active_key=None, message=str(exc), finished_at=timezone.now()
+        )
+    finally:
+        connection.close()
+
+
+def job_status(job: TrainingJob) -> Dict[str, Any]:
+    """JSON‑представление задачи для UI."""
+    return {
+        "id": job.pk,
+        "kind": job.kind,
+        "status": job.status,
+        "done": job.progress_done,
+        "total": job.progress_total,
+        "message": job.message,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -0,0 +1,70 @@
+# diary/log_queue.py
+"""Неблокирующее логирование: запись в файл/консоль в фоновом потоке.
+
+`queued(target={...})` — фабрика для `LOGGING` (ключ `"()"`). Она строит
+обычный обработчик из `target` (`class` + аргументы) и оборачивает его
+в `QueueHandler`. Запрос только форматирует запись и кладёт её в очередь;
+в файл пишет `QueueListener` в отдельном потоке.
+
+• Форматтер задаётся на самом `QueueHandler` (как у обычного обработчика).
+• При завершении процесса `logging.shutdown()` закрывает обработчик,
+  и слушатель дописывает очередь до конца.
+• В дочернем процессе после `fork` (пул обучения) очередь и поток
+  слушателя создаются заново.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import weakref
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict
+
+from django.utils.module_loading import import_string
+
+_handlers: "weakref.WeakSet[BackgroundHandler]" = weakref.WeakSet()
+
+
+class BackgroundHandler(QueueHandler):
+    """QueueHandler со своим QueueListener и целевым обработчиком."""
+
+    def __init__(self, target: logging.Handler) -> None:
+        super().__init__(queue.SimpleQueue())
+        self.target = target
+        self._listening = False
+        self._start_listener()
+        _handlers.add(self)
+
+    def _start_listener(self) -> None:
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        self._listening = True
+
+    def restart_after_fork(self) -> None:
+        self.queue = queue.SimpleQueue()
+        self._start_listener()
+
+    def close(self) -> None:
+        # Повторный close (logging.shutdown после dictConfig) не трогает слушателя
+        if self._listening:
+            self._listening = False
+            self.listener.stop()  # дописывает очередь
+        self.target.close()
+        super().close()
+
+
+def queued(target: Dict[str, Any]) -> BackgroundHandler:
+    """Фабрика для dictConfig: `{"()": "diary.log_queue.queued", "target": {...}}`."""
+    options = dict(target)
+    handler_class = import_string(options.pop("class"))
+    return BackgroundHandler(handler_class(**options))
+
+
+def _after_fork_in_child() -> None:
+    for handler in list(_handlers):
+        handler.restart_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
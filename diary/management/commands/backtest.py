@@ -0,0 +1,41 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from diary.ml_utils.backtest import DEFAULT_MIN_HISTORY, MODES, run_backtest
+
+
+class Command(BaseCommand):
+    help = "Walk-forward бэктест live/base-моделей: MAE/RMSE по целям и периодам, результат в .npz"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=MODES, default="live", help="Какие модели проверять")
+        parser.add_argument("--step", type=int, default=1, help="Пересчитывать веса раз в N дней")
+        parser.add_argument("--min-history", type=int, default=DEFAULT_MIN_HISTORY,
+                            help="Сколько первых дней только копить статистики")
+        parser.add_argument("--start", help="Первая дата отчёта (YYYY-MM-DD)")
+        parser.add_argument("--end", help="Последняя дата истории (YYYY-MM-DD)")
+        parser.add_argument("--freq", default="M", help="Период для динамики ошибок: W, M, Q, Y")
+        parser.add_argument("--output", help="Куда записать .npz (по умолчанию diary/backtests/<mode>.npz)")
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options["start"]) if options["start"] else None
+            end = date.fromisoformat(options["end"]) if options["end"] else None
+        except ValueError as exc:
+            raise CommandError(f"Некорректная дата: {exc}")
+
+        result = run_backtest(
+            options["mode"], start=start, end=end, step=options["step"], min_history=options["min_history"]
+        )
+        output = options["output"] or settings.BASE_DIR / "diary" / "backtests" / f"{options['mode']}.npz"
+        result.save(output)
+
+        summary = result.summary().sort_values("mae")
+        self.stdout.write(summary.to_string(float_format=lambda v: f"{v:.3f}"))
+        over_time = result.over_time(options["freq"])
+        if not over_time.empty:
+            self.stdout.write("\nСредние по целям MAE / RMSE по периодам:")
+            by_period = over_time.T.groupby(level=0).mean().T
+            self.stdout.write(by_period.to_string(float_format=lambda v: f"{v:.3f}"))
+        self.stdout.write(self.style.SUCCESS(f"✅ Результат записан: {output}"))
@@ -0,0 +1,46 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from diary.benchmarks import compare_reports
+from diary.benchmarks.suite import run_benchmarks
+
+
+class Command(BaseCommand):
+    help = "Бенчмарк на синтетическом дневнике (отдельная временная БД), отчёт в JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--years", type=float, default=5, help="Длина истории в годах")
+        parser.add_argument("--params", type=int, default=200, help="Сколько параметров")
+        parser.add_argument("--density", type=float, default=0.3, help="Средняя доля заполненных ячеек")
+        parser.add_argument("--seed", type=int, default=0, help="Seed генератора")
+        parser.add_argument("--repeat", type=int, default=5, help="Повторов каждого сценария")
+        parser.add_argument("--jobs", type=int, default=1, help="Процессов для train_models")
+        parser.add_argument("--output", help="Куда записать JSON-отчёт (по умолчанию stdout)")
+        parser.add_argument("--compare", help="JSON-отчёт предыдущего прогона для сравнения")
+
+    def handle(self, *args, **options):
+        if not 0 < options["density"] <= 1:
+            raise CommandError("--density должен быть в (0, 1]")
+
+        report = run_benchmarks(
+            years=options["years"],
+            params=options["params"],
+            density=options["density"],
+            seed=options["seed"],
+            repeat=options["repeat"],
+            jobs=options["jobs"],
+        )
+        payload = json.dumps(report, ensure_ascii=False, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as fh:
+                fh.write(payload)
+            self.stdout.write(self.style.SUCCESS(f"✅ Отчёт записан: {options['output']}"))
+        else:
+            self.stdout.write(payload)
+
+        if options["compare"]:
+            with open(options["compare"], encoding="utf-8") as fh:
+                baseline = json.load(fh)
+            for name, ratios in compare_reports(baseline, report).items():
+                line = ", ".join(f"{metric} ×{ratio:.2f}" for metric, ratio in ratios.items())
+                self.stdout.write(f"  {name}: {line}")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from diary.ml_utils.utils import export_debug_excel, get_excel_export_path
+
+class Command(BaseCommand):
+    help = "Выгружает данные дневника в Excel (только если данные изменились)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=None, help="Куда писать .xlsx (по умолчанию DIARY_EXCEL_EXPORT_PATH)")
+        parser.add_argument("--force", action="store_true", help="Перезаписать, даже если версия данных не менялась")
+
+    def handle(self, *args, **options):
+        path = options["path"] or get_excel_export_path()
+        written = export_debug_excel(path, force=options["force"])
+        if written:
+            self.stdout.write(self.style.SUCCESS(f"✅ Выгружено: {path}"))
+        else:
+            self.stdout.write(f"ℹ️ Данные не менялись, файл актуален: {path}")
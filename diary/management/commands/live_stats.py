@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from diary.ml_utils.live_stats import check_stats, rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Пересобирает и/или проверяет статистики live-модели"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild", action="store_true", help="Пересобрать статистики с нуля")
+        parser.add_argument("--check", action="store_true", help="Сверить статистики с полным переобучением")
+        parser.add_argument("--atol", type=float, default=1e-6, help="Допуск для --check")
+
+    def handle(self, *args, **options):
+        if not options["rebuild"] and not options["check"]:
+            raise CommandError("Укажите --rebuild и/или --check")
+
+        if options["rebuild"]:
+            stats = rebuild_stats()
+            self.stdout.write(self.style.SUCCESS(f"✅ Пересобрано: n={stats.n}, параметров={len(stats.keys)}"))
+
+        if options["check"]:
+            report = check_stats(atol=options["atol"])
+            for name, value in report.items():
+                self.stdout.write(f"  {name}: {value:g}")
+            if not report["ok"]:
+                raise CommandError("❌ Статистики расходятся с полным переобучением")
+            self.stdout.write(self.style.SUCCESS("✅ Статистики согласованы"))
@@ -0,0 +1,40 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from diary.benchmarks.load import run_write_load
+
+
+class Command(BaseCommand):
+    help = "Нагрузочный тест записи (отдельная временная БД): до и после настройки SQLite и очереди записи"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Потоков-писателей")
+        parser.add_argument("--seconds", type=float, default=5.0, help="Длительность каждого профиля")
+        parser.add_argument("--params", type=int, default=50, help="Сколько параметров в синтетическом дневнике")
+        parser.add_argument("--years", type=float, default=1, help="Длина истории в годах")
+        parser.add_argument("--days", type=int, default=30, help="По скольким последним дням кликают писатели")
+        parser.add_argument("--seed", type=int, default=0, help="Seed генератора")
+        parser.add_argument("--output", help="Куда записать JSON-отчёт")
+
+    def handle(self, *args, **options):
+        if options["threads"] < 1 or options["seconds"] <= 0:
+            raise CommandError("--threads должен быть ≥ 1, --seconds > 0")
+
+        report = run_write_load(
+            threads=options["threads"],
+            seconds=options["seconds"],
+            params=options["params"],
+            years=options["years"],
+            days=options["days"],
+            seed=options["seed"],
+        )
+        self.stdout.write(f"{'профиль':<10} {'журнал':<8} {'записей':>8} {'в сек':>8} {'блокировок':>11} {'ошибок':>7} {'p50 мс':>8} {'p95 мс':>8}")
+        for profile, r in report["results"].items():
+            self.stdout.write(
+                f"{profile:<10} {r['journal_mode']:<8} {r['writes']:>8} {r['writes_per_sec']:>8.1f} "
+                f"{r['lock_errors']:>11} {r['errors']:>7} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f}"
+            )
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as fh:
+                json.dump(report, fh, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✅ Отчёт записан: {options['output']}"))
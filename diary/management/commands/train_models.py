@@ -1,42 +1,20 @@
 from django.core.management.base import BaseCommand
-import logging
-from diary.ml_utils.utils import get_diary_dataframe
-from diary.ml_utils.base_model import train_model
 import os
-import joblib
-from datetime import date
-
-logger = logging.getLogger("train_models")
+from diary.ml_utils.training import run_training
+from diary.ml_utils.variants import VARIANTS
 
 class Command(BaseCommand):
-    help = "Обучает все модели и сохраняет .pkl"
-
-    def handle(self, *args, **kwargs):
-        MODEL_DIR = os.path.join("diary", "trained_models", "base")
-        os.makedirs(MODEL_DIR, exist_ok=True)
-
-        df = get_diary_dataframe()
-        today = date.today()
-        df = df[df["date"] < today]
-
-        logger.info("🟡 Старт обучения моделей...")
-        logger.info("📄 Доступные столбцы: %s", ", ".join(df.columns))
-        logger.info("📆 Даты в обучении: от %s до %s", df["date"].min(), df["date"].max())
+    help = "Обучает все модели и атомарно публикует новую версию .pkl"
 
-        # Удаление старых моделей
-        for file in os.listdir(MODEL_DIR):
-            if file.endswith(".pkl"):
-                os.remove(os.path.join(MODEL_DIR, file))
-        logger.info("🧹 Удалены старые модели перед обучением.")
+    def add_arguments(self, parser):
+        parser.add_argument("--jobs", type=int, default=1, help="Сколько процессов обучения (0 — по числу ядер)")
+        parser.add_argument("--force", action="store_true", help="Переобучить все цели, даже если данные не менялись")
+        parser.add_argument("--keep", type=int, default=3, help="Сколько последних версий моделей хранить")
+        parser.add_argument(
+            "--model", choices=list(VARIANTS), default=None,
+            help="Вариант модели (по умолчанию DIARY_MODEL_VARIANT)",
+        )
 
-        for target in df.columns:
-            if target in ("date", "Дата"):
-                continue
-            result = train_model(df.copy(), target=target, exclude=[])
-            model = result.get("model")
-            if model:
-                file_path = os.path.join(MODEL_DIR, f"{target}.pkl")
-                joblib.dump(model, file_path)
-                logger.info("✅ Обучено: %s → %s", target, file_path)
-            else:
-                logger.warning("⛔ Пропущено: %s — модель не обучена", target)
+    def handle(self, *args, **options):
+        jobs = options["jobs"] or os.cpu_count() or 1
+        run_training(jobs=jobs, keep=options["keep"], force=options["force"], model=options["model"])
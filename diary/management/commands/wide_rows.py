@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from diary import wide
+
+
+class Command(BaseCommand):
+    help = "Пересобирает и/или сверяет широкую таблицу EntryRow с EntryValue"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rebuild", action="store_true", help="Пересобрать строки с нуля")
+        parser.add_argument("--check", action="store_true", help="Сверить строки с EntryValue")
+
+    def handle(self, *args, **options):
+        if not options["rebuild"] and not options["check"]:
+            raise CommandError("Укажите --rebuild и/или --check")
+
+        if options["rebuild"]:
+            count = wide.rebuild()
+            self.stdout.write(self.style.SUCCESS(f"✅ Пересобрано строк: {count}"))
+
+        if options["check"]:
+            report = wide.check()
+            for name, value in report.items():
+                self.stdout.write(f"  {name}: {value}")
+            if report["mismatched"] or report["extra"] or report["missing"]:
+                raise CommandError("❌ Широкая таблица расходится с EntryValue")
+            self.stdout.write(self.style.SUCCESS("✅ Широкая таблица согласована"))
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary', '0004_trainingjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirtyDate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('version', models.PositiveBigIntegerField(db_index=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_rows(apps, schema_editor):
+    """Широкие строки для уже записанных дней (одним проходом по EntryValue)."""
+    Entry = apps.get_model("diary", "Entry")
+    EntryValue = apps.get_model("diary", "EntryValue")
+    EntryRow = apps.get_model("diary", "EntryRow")
+
+    data = {}
+    for entry_id, param_id, value in EntryValue.objects.values_list("entry_id", "parameter_id", "value").iterator():
+        data.setdefault(entry_id, {})[str(param_id)] = value
+    dates = dict(Entry.objects.values_list("id", "date"))
+    EntryRow.objects.bulk_create(
+        [EntryRow(entry_id=e, date=dates[e], data=d) for e, d in data.items()], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary', '0005_dirtydate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntryRow',
+            fields=[
+                ('entry', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='row', serialize=False, to='diary.entry')),
+                ('date', models.DateField(unique=True)),
+                ('data', models.JSONField(default=dict)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='entryvalue',
+            index=models.Index(fields=['parameter', 'entry'], name='diary_ev_param_entry_idx'),
+        ),
+        migrations.RunPython(fill_rows, migrations.RunPython.noop),
+    ]
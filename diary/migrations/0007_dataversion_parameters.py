@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary', '0006_entryrow'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataversion',
+            name='parameters',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
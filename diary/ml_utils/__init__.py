@@ -1,10 +1,13 @@
 # diary/ml_utils/__init__.py
 """ML-модуль дневника.
 
-Пока активна **только** базовая линейная регрессия (`base_model`).
-При необходимости можно вернуть `flags_model` и `hybrid_model`,
-но они исключены из публичного интерфейса, чтобы не усложнять код.
+• `base_model` — линейная регрессия на значениях дня и признаках истории;
+  `train_variant_model` — те же регрессии на флагах наличия `*_есть`
+  (и значениях); варианты описаны в `variants`, общий блок флагов
+  строит `features`;
+• `live_model` — «живой» вариант для всех целей сразу
+  (статистики для него — `live_stats`).
 """
-from . import base_model  # noqa: F401
+from . import base_model, live_model, variants  # noqa: F401
 
-__all__ = ["base_model"]
+__all__ = ["base_model", "live_model", "variants"]
@@ -0,0 +1,216 @@
+# diary/ml_utils/backtest.py
+"""Walk-forward бэктест live- и base-регрессий по всей истории.
+
+История проходится по датам. Для каждого дня прогноз всех целей строится
+по модели, обученной **только на предыдущих днях** (вне выборки); затем
+день добавляется в статистики. Так проверяется, насколько хорошо модели
+предсказывают «завтра» по мере накопления истории.
+
+Вместо P × дни обучений sklearn хранятся достаточные статистики, как
+в `live_stats`: среднее и центрированная матрица Грама. Они обновляются
+rank-one поправкой на каждый день (формула Уэлфорда, без потери точности
+на вычитании больших сумм):
+
+    d = x − μ;  μ += d / (n + 1);  S += n / (n + 1) · d dᵀ
+
+Все цели решаются разом (`live_model.solve_all_targets`) — ровно та же
+задача МНК, что у `base_model.train_model` для каждой цели. Пока матрица
+вырождена (первые дни, редкие или повторяющие друг друга параметры),
+берётся одна обратная со сдвигом `ridge` — приближение решения
+минимальной нормы за O(C³) вместо поблочного O(C⁴).
+
+• `mode="live"` — признаки: значения остальных параметров того же дня;
+• `mode="base"` — плюс лаги и скользящие средние (`features`), как у
+  базовых моделей. Признаки истории смотрят только в прошлое, поэтому
+  в прогноз не протекают. Варианты с флагами сюда не входят: у них
+  признаки цели не «все остальные столбцы», и общий трюк не работает.
+
+Решение системы стоит O(C³) для C столбцов. `step` > 1 пересчитывает
+веса раз в `step` дней, а статистики всё равно копятся каждый день.
+В промежутке прогноз строится по последним решённым весам, так что
+он остаётся вне выборки.
+
+Результат (`BacktestResult`) — даты, цели, факт, прогноз и маска
+`observed`: было ли значение цели записано в этот день. Модели, как и
+в проде, видят пропуски нулями, но в ошибку незаписанные дни не
+входят: факт там NaN. Из результата считаются MAE / RMSE по целям
+(`summary`) и по периодам (`over_time`). Сохраняется в сжатый `.npz`
+(float32 + маска).
+"""
+from __future__ import annotations
+
+import logging
+from datetime import date
+from pathlib import Path
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+
+from diary.instrumentation import stage
+
+from .live_model import solve_all_targets
+
+logger = logging.getLogger("predict")
+
+MODES = ("live", "base")
+DEFAULT_MIN_HISTORY = 30
+DEFAULT_RIDGE = 1e-10
+
+
+class BacktestResult(NamedTuple):
+    mode: str
+    dates: np.ndarray  # int64[D], ordinal дат
+    keys: List[str]  # цели
+    actual: np.ndarray  # float32[D, P], NaN — значение не записано
+    predicted: np.ndarray  # float32[D, P], NaN — прогноза ещё нет
+    observed: np.ndarray  # bool[D, P], значение цели записано
+
+    def errors(self) -> pd.DataFrame:
+        """Ошибки прогноза (прогноз − факт), строки — даты; NaN там, где факта нет."""
+        index = pd.Index([date.fromordinal(int(d)) for d in self.dates], name="date")
+        err = np.where(self.observed, self.predicted - self.actual, np.nan)
+        return pd.DataFrame(err, index=index, columns=self.keys)
+
+    def summary(self) -> pd.DataFrame:
+        """MAE / RMSE / число прогнозов по каждой цели за всю историю."""
+        err = self.errors()
+        return pd.DataFrame({
+            "mae": err.abs().mean(),
+            "rmse": np.sqrt((err ** 2).mean()),
+            "n": err.count(),
+        })
+
+    def over_time(self, freq: str = "M") -> pd.DataFrame:
+        """MAE / RMSE по периодам (`freq` — как у `pandas.Period`: W, M, Q, Y).
+
+        Столбцы — MultiIndex (метрика, цель), строки — периоды.
+        """
+        err = self.errors()
+        periods = pd.PeriodIndex(err.index, freq=freq)
+        return pd.concat(
+            {"mae": err.abs().groupby(periods).mean(), "rmse": np.sqrt((err ** 2).groupby(periods).mean())},
+            axis=1,
+        )
+
+    def save(self, path: Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as fh:
+            np.savez_compressed(
+                fh,
+                mode=np.array(self.mode),
+                dates=self.dates,
+                keys=np.array(self.keys, dtype=str),
+                actual=self.actual,
+                predicted=self.predicted,
+                observed=self.observed,
+            )
+        return path
+
+    @classmethod
+    def load(cls, path: Path) -> "BacktestResult":
+        with np.load(path, allow_pickle=False) as data:
+            # Файлы без маски (старый формат) считают записанным всё
+            observed = data["observed"] if "observed" in data.files else np.ones(data["actual"].shape, dtype=bool)
+            return cls(
+                mode=str(data["mode"]),
+                dates=data["dates"],
+                keys=[str(k) for k in data["keys"]],
+                actual=data["actual"],
+                predicted=data["predicted"],
+                observed=observed,
+            )
+
+
+def walk_forward(
+    X: np.ndarray,
+    n_targets: int,
+    *,
+    step: int = 1,
+    min_history: int = DEFAULT_MIN_HISTORY,
+    ridge: float = DEFAULT_RIDGE,
+) -> np.ndarray:
+    """Прогнозы вне выборки для первых `n_targets` столбцов `X` (строки — дни по порядку).
+
+    Цель `k` регрессируется на все остальные столбцы. Строка `i` предсказывается
+    по модели на строках `[0, i)`; первые `min_history` строк остаются NaN.
+    """
+    n_rows, n_cols = X.shape
+    predicted = np.full((n_rows, n_targets), np.nan)
+    mean = np.zeros(n_cols)
+    scatter = np.zeros((n_cols, n_cols))
+    coef = intercept = None
+    step = max(1, step)
+
+    for i in range(n_rows):
+        x = X[i]
+        if i >= max(min_history, 2):
+            if coef is None or (i - min_history) % step == 0:
+                coef = solve_all_targets(scatter, i, ridge=ridge)[:, :n_targets]
+                intercept = mean[:n_targets] - mean @ coef
+            predicted[i] = x @ coef + intercept
+        d = x - mean
+        mean += d / (i + 1)
+        scatter += (i / (i + 1)) * np.outer(d, d)
+    return predicted
+
+
+def _observed(dates: pd.Series, keys: List[str]) -> np.ndarray:
+    """bool[D, P]: записано ли значение цели в день (по маске пропусков снапшота)."""
+    from diary.snapshot import get_snapshot
+
+    snap = get_snapshot()
+    missing = pd.DataFrame(snap.missing, index=snap.date_list(), columns=snap.keys)
+    return ~missing.reindex(index=list(dates), columns=keys, fill_value=True).to_numpy(dtype=bool)
+
+
+def _frame(mode: str) -> Tuple[pd.DataFrame, List[str]]:
+    from .features import get_feature_matrix
+    from .utils import get_diary_dataframe
+
+    if mode == "live":
+        df = get_diary_dataframe()
+        return df, [c for c in df.columns if c != "date"]
+    matrix = get_feature_matrix()
+    return matrix.frame, matrix.keys
+
+
+@stage("backtest")
+def run_backtest(
+    mode: str = "live",
+    *,
+    start: date | None = None,
+    end: date | None = None,
+    step: int = 1,
+    min_history: int = DEFAULT_MIN_HISTORY,
+) -> BacktestResult:
+    """Бэктест по истории из БД (до `end` включительно).
+
+    Обучение всегда идёт с начала истории; `start` только отсекает
+    ранние дни из отчёта.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Неизвестный режим бэктеста: {mode} (есть: {', '.join(MODES)})")
+
+    df, keys = _frame(mode)
+    if end is not None:
+        df = df[df["date"] <= end]
+    columns = keys + [c for c in df.columns if c != "date" and c not in keys]
+    X = np.nan_to_num(df[columns].to_numpy(dtype=np.float64), nan=0.0)
+    dates = np.fromiter((d.toordinal() for d in df["date"]), dtype=np.int64, count=len(df))
+
+    logger.info("🔁 Бэктест %s: %d дней × %d целей (%d признаков), шаг %d", mode, len(dates), len(keys), len(columns), step)
+    predicted = walk_forward(X, len(keys), step=step, min_history=min_history)
+
+    observed = _observed(df["date"], keys)
+    actual = np.where(observed, X[:, :len(keys)], np.nan)
+    keep = dates >= start.toordinal() if start is not None else slice(None)
+    return BacktestResult(
+        mode=mode,
+        dates=dates[keep],
+        keys=keys,
+        actual=actual[keep].astype(np.float32),
+        predicted=predicted[keep].astype(np.float32),
+        observed=observed[keep],
+    )
@@ -3,7 +3,10 @@
 
 • Всегда исключаем `date/Дата` + `exclude` + `target`.
 • Заполняем NaN нулями.
-• Логи пишем через стандартный `logging` → попадают в diary.log.
+• `train_variant_model` — то же для варианта (`base` / `flags` /
+  `hybrid`, см. `variants`): флаги наличия и выбор столбцов по варианту.
+• Логи пишем через стандартный `logging` → попадают в predict.log
+  (в фоновом потоке, см. `diary.log_queue`).
 """
 from __future__ import annotations
 
@@ -13,10 +16,16 @@ from typing import List
 import pandas as pd
 from sklearn.linear_model import LinearRegression
 
+from diary.instrumentation import stage
+
+from .features import add_presence_flags
+from .variants import ModelVariant
+
 logger = logging.getLogger("predict")  # было __name__ — заменено на predict
 
 DROP_ALWAYS: List[str] = ["date", "Дата"]
 
+@stage("base_model.fit")
 def train_model(
     df: pd.DataFrame,
     target: str,
@@ -31,29 +40,31 @@ def train_model(
     y = df[target]
 
     logger.debug("train_model: target=%s, X_shape=%s, exclude=%s", target, X.shape, exclude)
-    for h in logger.handlers:
-        try:
-            h.flush()
-        except Exception:
-            pass
 
     if X.shape[1] == 0:
         logger.warning("train_model: Пропущено обучение для '%s' — нет признаков (X пуст)", target)
-        for h in logger.handlers:
-            try:
-                h.flush()
-            except Exception:
-                pass
         return {"model": None, "features": []}
 
     model = LinearRegression()
     model.fit(X, y)
 
     logger.debug("trained %s: intercept=%.3f", target, model.intercept_)
-    for h in logger.handlers:
-        try:
-            h.flush()
-        except Exception:
-            pass
 
-    return {"model": model, "features": X.columns.tolist()}
\ No newline at end of file
+    return {"model": model, "features": X.columns.tolist()}
+
+def train_variant_model(
+    variant: ModelVariant,
+    df: pd.DataFrame,
+    target: str,
+    *,
+    exclude: list[str] | None = None,
+):
+    """`train_model` с X по варианту.
+
+    Флаги обычно уже дописаны общим блоком (`features.get_feature_matrix(flags=True)`);
+    если пришёл кадр без них, блок добавляется один раз тем же векторным
+    преобразованием.
+    """
+    if variant.flags:
+        df = add_presence_flags(df)
+    return train_model(df, target, exclude=variant.exclude(target, df.columns) + (exclude or []))
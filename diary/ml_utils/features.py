@@ -0,0 +1,204 @@
+# diary/ml_utils/features.py
+"""Лаги и скользящие средние по истории — признаки для базовой модели.
+
+Для каждого параметра `key` добавляются столбцы:
+
+• `key__lag{k}`  — значение k календарных дней назад (`DIARY_FEATURE_LAGS`);
+• `key__mean{w}` — среднее за предыдущие w календарных дней,
+  **не включая** текущий (`DIARY_FEATURE_WINDOWS`, по умолчанию 3/7/30).
+
+Все признаки смотрят только в прошлое, поэтому цель дня в них не
+протекает, а для прогноза «на сегодня» хватает уже записанной истории.
+
+Считается всё одним векторным проходом по календарной оси. Строки
+раскладываются в плотный массив «день × параметр» от первой до
+последней даты, и по нему строятся кумулятивные суммы значений
+и счётчики записанных дней. Лаг — это сдвиг по календарю. Среднее —
+разность кумулятивных сумм, делённая на число записанных дней в окне.
+Пропущенные дни в среднее не входят; лаг на пропущенный день равен 0,
+как и прочие пропуски в df_keys.
+
+Флаги наличия `key_есть` (значение > 0) для вариантов `flags` / `hybrid`
+(см. `variants`) — тоже общий блок на все параметры. Он строится одним
+сравнением по матрице значений и дописывается к той же расширенной
+матрице: `get_feature_matrix(flags=True)`.
+
+Расширенная матрица кэшируется по версии данных (как `get_diary_dataframe`).
+Её используют `train_models` и base-прогнозы (`history_features`);
+по отдельности цели её не пересчитывают.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from datetime import date
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+logger = logging.getLogger("diary.ml_utils.features")
+
+DEFAULT_LAGS: Tuple[int, ...] = (1,)
+DEFAULT_WINDOWS: Tuple[int, ...] = (3, 7, 30)
+FLAG_SUFFIX = "_есть"
+
+_cache: Dict[Tuple[int, "FeatureSpec", bool], "FeatureMatrix"] = {}
+_lock = threading.Lock()
+
+
+class FeatureSpec(NamedTuple):
+    lags: Tuple[int, ...]
+    windows: Tuple[int, ...]
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.lags or self.windows)
+
+    def names(self, keys: List[str]) -> List[str]:
+        """Имена добавляемых столбцов в порядке `expand_features`."""
+        return [f"{k}__lag{n}" for n in self.lags for k in keys] + [
+            f"{k}__mean{n}" for n in self.windows for k in keys
+        ]
+
+
+def get_feature_spec() -> FeatureSpec:
+    return FeatureSpec(
+        lags=tuple(sorted(set(getattr(settings, "DIARY_FEATURE_LAGS", DEFAULT_LAGS)))),
+        windows=tuple(sorted(set(getattr(settings, "DIARY_FEATURE_WINDOWS", DEFAULT_WINDOWS)))),
+    )
+
+
+def flag_name(key: str) -> str:
+    return f"{key}{FLAG_SUFFIX}"
+
+
+def value_columns(columns) -> List[str]:
+    """Исходные параметры среди столбцов расширенной матрицы."""
+    return [
+        c for c in columns
+        if c not in ("date", "Дата") and "__" not in c and not c.endswith(FLAG_SUFFIX)
+    ]
+
+
+def presence_flags(values: Dict[str, float]) -> Dict[str, float]:
+    """Флаги наличия для одной строки `{key: value}` (вход прогноза)."""
+    return {flag_name(k): float((v or 0) > 0) for k, v in values.items()}
+
+
+class _Calendar(NamedTuple):
+    """Плотная календарная раскладка истории с префиксными суммами."""
+
+    start: int  # ordinal первой даты
+    values: np.ndarray  # (L, P), незаписанные дни = 0
+    present: np.ndarray  # (L,) bool
+    csum: np.ndarray  # (L + 1, P): csum[i] = Σ values[:i]
+    ccount: np.ndarray  # (L + 1,):  ccount[i] = Σ present[:i]
+
+    @classmethod
+    def build(cls, ordinals: np.ndarray, X: np.ndarray) -> "_Calendar":
+        start = int(ordinals[0]) if ordinals.size else 0
+        length = int(ordinals[-1]) - start + 1 if ordinals.size else 0
+        values = np.zeros((length, X.shape[1]), dtype=np.float64)
+        present = np.zeros(length, dtype=bool)
+        values[ordinals - start] = X
+        present[ordinals - start] = True
+        csum = np.zeros((length + 1, X.shape[1]), dtype=np.float64)
+        np.cumsum(values, axis=0, out=csum[1:])
+        ccount = np.concatenate([[0], np.cumsum(present)])
+        return cls(start, values, present, csum, ccount)
+
+    def rows(self, ordinals: np.ndarray, spec: FeatureSpec) -> np.ndarray:
+        """Признаки для дней `ordinals` (могут выходить за историю)."""
+        t = np.asarray(ordinals, dtype=np.int64) - self.start
+        length, p = self.values.shape
+        blocks = []
+        for k in spec.lags:
+            src = t - k
+            ok = (src >= 0) & (src < length)
+            block = np.zeros((t.size, p))
+            block[ok] = self.values[src[ok]]
+            blocks.append(block)
+        hi = np.clip(t, 0, length)
+        for w in spec.windows:
+            lo = np.clip(t - w, 0, length)
+            sums = self.csum[hi] - self.csum[lo]
+            counts = (self.ccount[hi] - self.ccount[lo]).astype(np.float64)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                blocks.append(np.where(counts[:, None] > 0, sums / counts[:, None], 0.0))
+        return np.hstack(blocks) if blocks else np.zeros((t.size, 0))
+
+
+class FeatureMatrix(NamedTuple):
+    spec: FeatureSpec
+    keys: List[str]  # исходные параметры (цели)
+    frame: pd.DataFrame  # date + keys + признаки истории (+ флаги наличия)
+    calendar: _Calendar
+
+    def history_features(self, day: date) -> Dict[str, float]:
+        """Лаги/средние для произвольного дня по записанной истории."""
+        if not self.spec.enabled or not self.keys:
+            return {}
+        row = self.calendar.rows(np.array([day.toordinal()]), self.spec)[0]
+        return dict(zip(self.spec.names(self.keys), row.tolist()))
+
+
+def expand_features(df: pd.DataFrame, spec: FeatureSpec | None = None) -> FeatureMatrix:
+    """df_keys → df_keys + лаги и скользящие средние (один проход)."""
+    spec = spec or get_feature_spec()
+    keys = [c for c in df.columns if c != "date"]
+    ordinals = np.fromiter((d.toordinal() for d in df["date"]), dtype=np.int64, count=len(df))
+    if ordinals.size and np.any(np.diff(ordinals) <= 0):
+        raise ValueError("expand_features: даты должны быть уникальными и по возрастанию")
+
+    X = df[keys].to_numpy(dtype=np.float64)
+    calendar = _Calendar.build(ordinals, X)
+    extra = calendar.rows(ordinals, spec)
+    # Значения — своя копия (df_keys — только для чтения поверх mmap снапшота)
+    frame = pd.concat(
+        [df[["date"]].reset_index(drop=True), pd.DataFrame(np.hstack([X, extra]), columns=keys + spec.names(keys))],
+        axis=1,
+    )
+    return FeatureMatrix(spec, keys, frame, calendar)
+
+
+def add_presence_flags(frame: pd.DataFrame, keys: List[str] | None = None) -> pd.DataFrame:
+    """Дописывает блок `key_есть` (значение > 0) сразу для всех параметров."""
+    keys = value_columns(frame.columns) if keys is None else keys
+    names = [flag_name(k) for k in keys]
+    if not keys or names[0] in frame.columns:
+        return frame
+    flags = (frame[keys].to_numpy(dtype=np.float64) > 0).astype(np.float64)
+    return pd.concat([frame, pd.DataFrame(flags, columns=names, index=frame.index)], axis=1)
+
+
+def get_feature_matrix(*, flags: bool = False) -> FeatureMatrix:
+    """Расширенная матрица для текущей версии данных (из кэша, если есть).
+
+    `flags=True` — та же матрица плюс флаги наличия; строится из матрицы
+    без флагов, так что признаки истории считаются один раз.
+    """
+    from diary.data_version import get_data_version
+
+    from .utils import get_diary_dataframe
+
+    spec = get_feature_spec()
+    version = get_data_version()
+    key = (version, spec, flags)
+    matrix = _cache.get(key)
+    if matrix is not None:
+        return matrix
+    with _lock:
+        matrix = _cache.get(key)
+        if matrix is None:
+            for stale in [k for k in _cache if k[:2] != (version, spec)]:
+                del _cache[stale]
+            plain = _cache.get((version, spec, False))
+            if plain is None:
+                plain = expand_features(get_diary_dataframe(), spec)
+                _cache[(version, spec, False)] = plain
+                logger.debug("🧮 Признаки истории пересобраны: %d × %d", *plain.frame.shape)
+            matrix = plain._replace(frame=add_presence_flags(plain.frame, plain.keys)) if flags else plain
+            _cache[key] = matrix
+    return matrix
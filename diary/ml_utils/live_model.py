@@ -0,0 +1,144 @@
+# diary/ml_utils/live_model.py
+"""«Живая» линейная регрессия сразу для всех параметров.
+
+Для каждой колонки `k` решается ровно та же задача, что и в
+`base_model.train_model(df, target=k, exclude=[k])`: МНК с интерсептом
+по всем остальным параметрам. Вместо P отдельных `LinearRegression`
+(и P копий DataFrame) один раз строится центрированная матрица Грама
+`S = ZᵀZ`, а все P регрессий решаются через обратную матрицу `Θ = S⁻¹`:
+
+    β_jk = −Θ_jk / Θ_kk   (j ≠ k)
+
+• Колонки с нулевой дисперсией получают нулевые веса (как у sklearn —
+  решение минимальной нормы) и предсказываются своим средним.
+• Если оставшаяся `S` вырождена, каждая цель решается псевдообратной
+  к своему блоку `S₋ₖ₋ₖ` — это то же решение минимальной нормы, что даёт
+  `lstsq` внутри sklearn.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Any, Dict, List, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .base_model import DROP_ALWAYS
+
+logger = logging.getLogger("predict")
+
+
+class LinearSystem(NamedTuple):
+    """Набор линейных моделей «все цели сразу».
+
+    • `features`  — порядок параметров (и строк, и столбцов `coef`);
+    • `coef`      — матрица P×P: столбец k — веса признаков для цели k;
+    • `intercept` — вектор длины P.
+    """
+
+    features: List[str]
+    coef: np.ndarray
+    intercept: np.ndarray
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Предсказания для одного дня (P,) или многих дней (m, P)."""
+        return X @ self.coef + self.intercept
+
+
+def stack_linear_models(models: Dict[str, Any]) -> LinearSystem | None:
+    """Складывает обученные `LinearRegression` (`target → модель`) в одну систему.
+
+    Строки/столбцы — объединение целей и признаков всех моделей; столбец
+    цели без модели остаётся нулевым. Если хоть одна модель не линейная
+    или обучена без имён признаков, возвращает None.
+    """
+    index: Dict[str, int] = {}
+    for target, model in models.items():
+        names = getattr(model, "feature_names_in_", None)
+        coef = getattr(model, "coef_", None)
+        if names is None or coef is None or np.ndim(coef) != 1:
+            return None
+        for name in (target, *names):
+            index.setdefault(str(name), len(index))
+
+    p = len(index)
+    coef = np.zeros((p, p), dtype=np.float64)
+    intercept = np.zeros(p, dtype=np.float64)
+    for target, model in models.items():
+        k = index[target]
+        coef[[index[str(n)] for n in model.feature_names_in_], k] = model.coef_
+        intercept[k] = float(model.intercept_)
+    return LinearSystem(list(index), coef, intercept)
+
+
+def _pinv_solve(A: np.ndarray, b: np.ndarray, rel_tol: float) -> np.ndarray:
+    """Решение минимальной нормы для симметричной неотрицательной `A`."""
+    w, V = np.linalg.eigh(A)
+    if w.size == 0 or w[-1] <= 0:
+        return np.zeros(A.shape[0])
+    keep = w > w[-1] * rel_tol
+    Vk = V[:, keep]
+    return Vk @ ((Vk.T @ b) / w[keep])
+
+
+def solve_all_targets(S: np.ndarray, n_samples: int, *, ridge: float | None = None) -> np.ndarray:
+    """По центрированной матрице Грама возвращает P×P матрицу весов.
+
+    Столбец `k` — коэффициенты регрессии колонки `k` на все остальные,
+    диагональ нулевая.
+
+    `ridge` — для вырожденной `S` вместо P псевдообратных по блокам взять
+    одну обратную `(S + λI)⁻¹`, λ = `ridge` × наибольшее собственное число.
+    При малом λ это приближение решения минимальной нормы за O(P³),
+    а не O(P⁴) (нужно, когда система решается много раз — `backtest`).
+    """
+    p = S.shape[0]
+    coef = np.zeros((p, p), dtype=np.float64)
+    if p < 2 or n_samples < 2:
+        return coef
+
+    eps = np.finfo(np.float64).eps
+    diag = np.diag(S)
+    varying = np.flatnonzero(diag > diag.max() * eps * max(n_samples, p)) if diag.max() > 0 else np.array([], int)
+    if varying.size < 2:
+        return coef
+
+    S_v = S[np.ix_(varying, varying)]
+    rel_tol = eps * max(n_samples, p) * 10
+    w, V = np.linalg.eigh(S_v)
+    full_rank = w[0] > w[-1] * rel_tol
+    if full_rank or ridge is not None:
+        # Все P регрессий из одной обратной матрицы (вырожденная — со сдвигом λ)
+        shift = 0.0 if full_rank else ridge * w[-1]
+        theta = (V / (w.clip(min=0.0) + shift)) @ V.T
+        block = -theta / np.diag(theta)
+        np.fill_diagonal(block, 0.0)
+        coef[np.ix_(varying, varying)] = block
+        return coef
+
+    logger.debug("solve_all_targets: матрица Грама вырождена, решаем по блокам (P=%d)", varying.size)
+    mask = np.ones(varying.size, dtype=bool)
+    for k in range(varying.size):
+        mask[k] = False
+        coef[varying[mask], varying[k]] = _pinv_solve(S_v[np.ix_(mask, mask)], S_v[mask, k], rel_tol)
+        mask[k] = True
+    return coef
+
+
+def fit_all(df: pd.DataFrame, *, exclude: list[str] | None = None) -> LinearSystem:
+    """Обучает «каждый параметр по всем остальным» за один проход."""
+    drop = set(DROP_ALWAYS) | set(exclude or [])
+    features = [c for c in df.columns if c not in drop]
+    X = np.nan_to_num(df[features].to_numpy(dtype=np.float64), nan=0.0)
+
+    n = X.shape[0]
+    if n == 0:
+        return LinearSystem(features, np.zeros((len(features), len(features))), np.zeros(len(features)))
+
+    mean = X.mean(axis=0)
+    Z = X - mean
+    coef = solve_all_targets(Z.T @ Z, n)
+    intercept = mean - mean @ coef
+
+    logger.debug("fit_all: %d целей, %d строк", len(features), n)
+    return LinearSystem(features, coef, intercept)
@@ -0,0 +1,313 @@
+# diary/ml_utils/live_stats.py
+"""Инкрементальные достаточные статистики для «живой» регрессии.
+
+Вместо перечитывания всей истории на каждый прогноз храним в БД
+(`LiveStats`, одна строка) по вектору активных параметров:
+
+• `n`      — число дней хотя бы с одним значением;
+• `sums`   — Σx (пропуски = 0, как в `get_diary_dataframe`);
+• `cross`  — XᵀX;
+• `counts` — сколько строк EntryValue у параметра (колонка попадает
+  в модель, только если есть хотя бы одна).
+
+Любое изменение EntryValue меняет ровно одну строку-день, поэтому
+статистики правятся rank-one поправкой «минус старая строка, плюс новая»
+(сигналы `pre_*` снимают строку до записи, `post_*` — после).
+
+Поправка честна, только если снимок, запись и обновление строки
+LiveStats идут в одной транзакции писателя. Иначе между ними может
+вклиниться другой процесс, и разница посчитается дважды или потеряется.
+Поэтому снимок берёт блокировку строки (`select_for_update`; в SQLite
+блокировку записи уже держит транзакция `IMMEDIATE`). Все пути записи
+транзакционны: `diary.writes`, импорт, `delete()`, а `Entry.save()` /
+`EntryValue.save()` открывают транзакцию сами. Если сигнал всё же
+пришёл вне транзакции, поправка не делается, а статистики помечаются
+устаревшими.
+Прогноз строится из статистик за O(P³) без обращения к истории.
+Изменения Parameter и bulk-операции помечают статистики устаревшими —
+они пересобираются целиком при следующем чтении.
+"""
+from __future__ import annotations
+
+import io
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+import numpy as np
+from django.db import transaction
+
+from diary import wide
+from diary.data_version import get_data_version
+from diary.models import EntryValue, LiveStats, Parameter
+
+from .live_model import LinearSystem, solve_all_targets
+
+logger = logging.getLogger("predict")
+
+_STATS_PK = 1
+
+# Строки дня, снятые в pre_save / pre_delete (по потокам).
+_pending = threading.local()
+# Метка «запись вне транзакции»: поправку не делаем, статистики устаревают.
+_UNSAFE = object()
+
+# Кэш «версия данных → решённая система».
+_system_cache: Dict[int, LinearSystem] = {}
+_system_lock = threading.Lock()
+
+
+class Stats(NamedTuple):
+    param_ids: np.ndarray  # int64[P]
+    keys: List[str]
+    n: int
+    sums: np.ndarray  # float64[P]
+    cross: np.ndarray  # float64[P, P]
+    counts: np.ndarray  # int64[P]
+
+
+# ---------------------------------------------------------------------------
+# Сериализация
+# ---------------------------------------------------------------------------
+
+def _dump(stats: Stats) -> bytes:
+    buf = io.BytesIO()
+    np.savez(
+        buf,
+        param_ids=stats.param_ids,
+        keys=np.array(stats.keys, dtype=str),
+        n=np.array(stats.n, dtype=np.int64),
+        sums=stats.sums,
+        cross=stats.cross,
+        counts=stats.counts,
+    )
+    return buf.getvalue()
+
+
+def _load(payload: bytes) -> Stats:
+    with np.load(io.BytesIO(payload), allow_pickle=False) as data:
+        return Stats(
+            param_ids=data["param_ids"],
+            keys=[str(k) for k in data["keys"]],
+            n=int(data["n"]),
+            sums=data["sums"],
+            cross=data["cross"],
+            counts=data["counts"],
+        )
+
+
+def _empty(params: List[Tuple[int, str]]) -> Stats:
+    p = len(params)
+    return Stats(
+        param_ids=np.array([pid for pid, _ in params], dtype=np.int64),
+        keys=[key for _, key in params],
+        n=0,
+        sums=np.zeros(p),
+        cross=np.zeros((p, p)),
+        counts=np.zeros(p, dtype=np.int64),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Полная пересборка
+# ---------------------------------------------------------------------------
+
+def compute_stats() -> Stats:
+    """Считает статистики с нуля по всей истории (один проход по широким строкам)."""
+    params = list(Parameter.objects.filter(active=True).order_by("id").values_list("id", "key"))
+    stats = _empty(params)
+    columns = [str(pid) for pid, _ in params]
+
+    rows: List[List[float]] = []
+    for _, data in wide.iter_rows():
+        row = [0.0] * len(columns)
+        filled = False
+        for i, key in enumerate(columns):
+            if key in data:
+                stats.counts[i] += 1
+                if data[key] is not None:
+                    row[i] = data[key]
+                    filled = True
+        if filled:
+            rows.append(row)
+
+    X = np.array(rows, dtype=np.float64) if rows else np.zeros((0, len(params)))
+    return stats._replace(n=len(rows), sums=X.sum(axis=0), cross=X.T @ X)
+
+
+def rebuild_stats() -> Stats:
+    """Пересобирает статистики и сохраняет их в БД."""
+    with transaction.atomic():
+        stats = compute_stats()
+        LiveStats.objects.update_or_create(pk=_STATS_PK, defaults={"payload": _dump(stats), "stale": False})
+    logger.info("📐 Статистики live-модели пересобраны: n=%d, P=%d", stats.n, len(stats.keys))
+    return stats
+
+
+def mark_stale() -> None:
+    """Помечает статистики устаревшими (пересборка при следующем чтении)."""
+    LiveStats.objects.filter(pk=_STATS_PK).update(stale=True)
+
+
+def load_stats() -> Stats:
+    """Актуальные статистики из БД (при необходимости — пересборка)."""
+    row = LiveStats.objects.filter(pk=_STATS_PK, stale=False).values_list("payload", flat=True).first()
+    if row is None:
+        return rebuild_stats()
+    return _load(bytes(row))
+
+
+# ---------------------------------------------------------------------------
+# Rank-one обновления из сигналов
+# ---------------------------------------------------------------------------
+
+def _day_row(entry_id: int) -> Dict[int, float | None]:
+    return dict(
+        EntryValue.objects.filter(entry_id=entry_id, parameter__active=True).values_list("parameter_id", "value")
+    )
+
+
+def snapshot_entry(entry_id: int) -> None:
+    """pre_save / pre_delete: запоминаем строку дня до изменения.
+
+    Вне транзакции снимок не берётся: поправку нельзя сделать атомарно
+    с записью, и `apply_entry_change` пометит статистики устаревшими.
+    """
+    if not hasattr(_pending, "rows"):
+        _pending.rows = {}
+    if not transaction.get_connection().in_atomic_block:
+        _pending.rows[entry_id] = _UNSAFE
+        return
+    # Блокировка до чтения: параллельный писатель не снимет ту же строку дня
+    list(LiveStats.objects.select_for_update().filter(pk=_STATS_PK).values_list("pk", flat=True))
+    _pending.rows[entry_id] = _day_row(entry_id)
+
+
+def apply_entry_change(entry_id: int) -> None:
+    """post_save / post_delete: «минус старая строка, плюс новая».
+
+    При каскадном удалении post_delete приходит на каждое значение,
+    но строка дня уже удалена целиком — применяем разницу один раз.
+    """
+    old = getattr(_pending, "rows", {}).pop(entry_id, None)
+    if old is None:
+        return
+    if old is _UNSAFE:
+        mark_stale()
+        logger.debug("📐 Запись дня %s вне транзакции — статистики будут пересобраны", entry_id)
+        return
+
+    new = _day_row(entry_id)
+    if old == new:
+        return
+
+    with transaction.atomic():
+        row = LiveStats.objects.select_for_update().filter(pk=_STATS_PK, stale=False).first()
+        if row is None:
+            return  # статистики ещё не собраны или устарели — соберём при чтении
+        stats = _load(bytes(row.payload))
+        index = {int(pid): i for i, pid in enumerate(stats.param_ids)}
+        if any(pid not in index for pid in (*old, *new)):
+            LiveStats.objects.filter(pk=_STATS_PK).update(stale=True)
+            return
+
+        p = len(stats.keys)
+        sums, cross, counts, n = stats.sums.copy(), stats.cross.copy(), stats.counts.copy(), stats.n
+        for sign, cells in ((-1, old), (1, new)):
+            vec = np.zeros(p)
+            for pid, value in cells.items():
+                counts[index[pid]] += sign
+                if value is not None:
+                    vec[index[pid]] = value
+            if any(value is not None for value in cells.values()):
+                n += sign
+                sums += sign * vec
+                cross += sign * np.outer(vec, vec)
+
+        row.payload = _dump(stats._replace(n=n, sums=sums, cross=cross, counts=counts))
+        row.save(update_fields=["payload", "updated_at"])
+
+
+@contextmanager
+def track_entries(entry_ids: Iterable[int]) -> Iterator[None]:
+    """Для bulk-операций без сигналов: снимок дней до блока, поправка после."""
+    entry_ids = list(dict.fromkeys(entry_ids))
+    for entry_id in entry_ids:
+        snapshot_entry(entry_id)
+    try:
+        yield
+    except BaseException:
+        for entry_id in entry_ids:
+            getattr(_pending, "rows", {}).pop(entry_id, None)
+        raise
+    for entry_id in entry_ids:
+        apply_entry_change(entry_id)
+
+
+# ---------------------------------------------------------------------------
+# Прогноз и проверка
+# ---------------------------------------------------------------------------
+
+def system_from_stats(stats: Stats) -> LinearSystem:
+    """Решает все регрессии «параметр по остальным» из статистик."""
+    cols = np.flatnonzero(stats.counts > 0)
+    features = [stats.keys[i] for i in cols]
+    p = cols.size
+    if stats.n == 0 or p == 0:
+        return LinearSystem(features, np.zeros((p, p)), np.zeros(p))
+
+    sums = stats.sums[cols]
+    mean = sums / stats.n
+    S = stats.cross[np.ix_(cols, cols)] - np.outer(sums, sums) / stats.n
+    coef = solve_all_targets(S, stats.n)
+    return LinearSystem(features, coef, mean - mean @ coef)
+
+
+def get_live_system() -> LinearSystem:
+    """Решённая система для текущей версии данных (кэш в процессе)."""
+    version = get_data_version()
+    system = _system_cache.get(version)
+    if system is not None:
+        return system
+    with _system_lock:
+        system = _system_cache.get(version)
+        if system is None:
+            system = system_from_stats(load_stats())
+            _system_cache.clear()
+            _system_cache[version] = system
+    return system
+
+
+def check_stats(atol: float = 1e-6) -> Dict[str, float]:
+    """Сравнивает сохранённые статистики и прогнозы с полным переобучением.
+
+    Возвращает максимальные отклонения; `ok` = 1.0, если все в пределах `atol`.
+    """
+    from .live_model import fit_all
+    from .utils import get_diary_dataframe
+
+    stored = load_stats()
+    fresh = compute_stats()
+    same_layout = list(stored.param_ids) == list(fresh.param_ids)
+    report: Dict[str, float] = {
+        "n_diff": float(abs(stored.n - fresh.n)),
+        "sums_diff": float(np.abs(stored.sums - fresh.sums).max(initial=0.0)) if same_layout else np.inf,
+        "cross_diff": float(np.abs(stored.cross - fresh.cross).max(initial=0.0)) if same_layout else np.inf,
+    }
+
+    system = system_from_stats(stored)
+    reference = fit_all(get_diary_dataframe())
+    if sorted(system.features) != sorted(reference.features):
+        report["prediction_diff"] = np.inf
+    else:
+        rng = np.random.default_rng(0)
+        X = rng.integers(0, 6, size=(16, len(reference.features))).astype(np.float64)
+        ref_pos = {f: i for i, f in enumerate(reference.features)}
+        sys_pos = {f: i for i, f in enumerate(system.features)}
+        ours = system.predict(X[:, [ref_pos[f] for f in system.features]])
+        ours = ours[:, [sys_pos[f] for f in reference.features]]
+        report["prediction_diff"] = float(np.abs(ours - reference.predict(X)).max(initial=0.0))
+
+    report["ok"] = float(all(v <= atol for v in report.values()))
+    return report
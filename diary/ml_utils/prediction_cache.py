@@ -0,0 +1,124 @@
+# diary/ml_utils/prediction_cache.py
+"""LRU-кэш прогнозов перед live- и base-моделями.
+
+Фронтенд шлёт `predict_today` на каждое нажатие кнопки, и входы часто
+повторяются (пользователь щёлкает туда-обратно). Ключ кэша:
+
+• режим (`live` / `base`);
+• версия данных и, для base, штамп реестра моделей — после записи
+  или переобучения старые ответы просто перестают находиться;
+• канонизированный вектор входа: пары `(key, value)` по ключу, значение
+  квантуется к шагу `DIARY_PREDICTION_CACHE_STEP` по шкале 0‑5.
+  Прогноз считается уже по квантованному вектору, поэтому ответ
+  одинаков для всех входов одной «корзины».
+
+Размер (`DIARY_PREDICTION_CACHE_SIZE`) и TTL (`DIARY_PREDICTION_CACHE_TTL`,
+секунды) ограничены; статистика попаданий — `stats()`.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Mapping, Tuple
+
+from django.conf import settings
+
+DEFAULT_SIZE = 1024
+DEFAULT_TTL = 600.0
+DEFAULT_STEP = 0.1
+
+
+def _to_float(value: Any) -> float:
+    """Как `views._safe_float`, но нечисловой ввод тоже считается пропуском."""
+    try:
+        return float(value) if value not in (None, "", "None") else 0.0
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def quantize(values: Mapping[str, Any], step: float) -> Dict[str, float]:
+    """Значения, приведённые к float и округлённые к сетке `step`."""
+    return {k: round(round(_to_float(v) / step) * step, 6) for k, v in values.items()}
+
+
+class PredictionCache:
+    """Потокобезопасный LRU с TTL: `key → {target: prediction}`."""
+
+    def __init__(self, maxsize: int | None = None, ttl: float | None = None) -> None:
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Dict[str, float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    @property
+    def maxsize(self) -> int:
+        return self._maxsize if self._maxsize is not None else int(
+            getattr(settings, "DIARY_PREDICTION_CACHE_SIZE", DEFAULT_SIZE)
+        )
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl if self._ttl is not None else float(
+            getattr(settings, "DIARY_PREDICTION_CACHE_TTL", DEFAULT_TTL)
+        )
+
+    @staticmethod
+    def step() -> float:
+        return float(getattr(settings, "DIARY_PREDICTION_CACHE_STEP", DEFAULT_STEP))
+
+    @staticmethod
+    def make_key(mode: str, version: Hashable, values: Mapping[str, float]) -> Tuple:
+        return mode, version, tuple(sorted(values.items()))
+
+    def get(self, key: Hashable) -> Dict[str, float] | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            stored_at, value = item
+            if time.monotonic() - stored_at > self.ttl:
+                del self._data[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return dict(value)
+
+    def put(self, key: Hashable, value: Dict[str, float]) -> None:
+        maxsize = self.maxsize
+        if maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), dict(value))
+            self._data.move_to_end(key)
+            while len(self._data) > maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "step": self.step(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "expired": self.expired,
+        }
+
+
+prediction_cache = PredictionCache()
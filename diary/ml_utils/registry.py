@@ -0,0 +1,183 @@
+# diary/ml_utils/registry.py
+"""Реестр базовых моделей в памяти процесса.
+
+• Все `.pkl` из каталога базовых моделей загружаются **один раз** и
+  живут в памяти до следующего переобучения.
+• Переобучение определяется дёшево — по `os.stat` файла `manifest.json`,
+  который `train_models` атомарно переключает на новый каталог
+  `versions/<версия>/` последним шагом (mtime + размер).
+  Для старых каталогов без манифеста штампом служит список `.pkl` с их mtime.
+• Линейные модели при загрузке складываются в одну матрицу весов
+  (`system()`), чтобы все прогнозы считались одним матричным умножением.
+• Счётчики `hits` / `misses` / `reloads` доступны через `stats()`.
+• У каждого варианта модели (`variants`) свой каталог и свой реестр:
+  `registry` — вариант `base`, остальные — `get_registry(name)`.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import joblib
+from django.conf import settings
+
+from diary.instrumentation import stage
+
+from .live_model import LinearSystem, stack_linear_models
+
+logger = logging.getLogger("predict")
+
+MANIFEST_NAME = "manifest.json"
+
+
+def get_model_dir(variant: str = "base") -> Path:
+    """Каталог моделей варианта.
+
+    `base` — `settings.DIARY_BASE_MODEL_DIR`; остальные варианты лежат
+    рядом с ним, в `<родитель>/<вариант>/`.
+    """
+    base_dir = Path(getattr(settings, "DIARY_BASE_MODEL_DIR", settings.BASE_DIR / "diary" / "trained_models" / "base"))
+    return base_dir if variant == "base" else base_dir.parent / variant
+
+
+def read_manifest(model_dir: Path) -> Dict[str, Any]:
+    """Текущий манифест каталога моделей ({} — если его ещё нет)."""
+    try:
+        return json.loads((model_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {}
+
+
+def write_manifest(model_dir: Path, manifest: Dict[str, Any]) -> None:
+    """Атомарно записывает манифест — сигнал реестрам перечитать модели."""
+    tmp = model_dir / f".{MANIFEST_NAME}.tmp"
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+    os.replace(tmp, model_dir / MANIFEST_NAME)
+
+
+class ModelRegistry:
+    """Потокобезопасный кэш `target → модель` с перезагрузкой по манифесту."""
+
+    def __init__(self, model_dir: Path | None = None, *, variant: str = "base"):
+        self._model_dir = model_dir
+        self.variant = variant
+        self._lock = threading.Lock()
+        self._stamp: Tuple | None = None
+        self._models: Dict[str, Any] = {}
+        self._system: LinearSystem | None = None
+        self._manifest: Dict[str, Any] = {}
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    @property
+    def model_dir(self) -> Path:
+        return self._model_dir or get_model_dir(self.variant)
+
+    # --- штамп каталога ---------------------------------------------------
+    def _current_stamp(self) -> Tuple:
+        model_dir = self.model_dir
+        try:
+            st = os.stat(model_dir / MANIFEST_NAME)
+            return ("manifest", str(model_dir), st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            pass
+        try:
+            with os.scandir(model_dir) as it:
+                files = sorted((e.name, e.stat().st_mtime_ns) for e in it if e.name.endswith(".pkl"))
+        except FileNotFoundError:
+            files = []
+        return ("legacy", str(model_dir), tuple(files))
+
+    @stage("registry.load")
+    def _load_all(self, stamp: Tuple) -> None:
+        """Перечитывает модели каталога; вызывается под `self._lock`."""
+        model_dir = self.model_dir
+        manifest: Dict[str, Any] = {}
+        version_dir = model_dir
+        if stamp[0] == "manifest":
+            manifest = read_manifest(model_dir)
+            files = manifest.get("models", {})
+            version_dir = model_dir / manifest.get("path", ".")
+        else:
+            files = {name[:-4]: name for name, _ in stamp[2]}
+
+        models: Dict[str, Any] = {}
+        for target, file_name in files.items():
+            try:
+                models[target] = joblib.load(version_dir / file_name)
+            except Exception:
+                logger.exception("Не удалось загрузить базовую модель %s", file_name)
+
+        self._system = stack_linear_models(models) if models else None
+        self._models, self._manifest, self._stamp = models, manifest, stamp
+        self.reloads += 1
+        logger.info("📦 Базовые модели загружены: %d шт. (версия %s)", len(models), manifest.get("version", "—"))
+
+    # --- публичный API ----------------------------------------------------
+    def models(self) -> Dict[str, Any]:
+        """Актуальный словарь `target → модель` (перечитывается только после переобучения)."""
+        stamp = self._current_stamp()
+        if stamp != self._stamp:
+            with self._lock:
+                if stamp != self._stamp:
+                    self._load_all(stamp)
+        return self._models
+
+    def lookup(self, targets) -> Dict[str, Any]:
+        """Модели для набора целей за одну проверку штампа."""
+        models = self.models()
+        found = {t: models[t] for t in targets if t in models}
+        with self._lock:  # счётчики меняют потоки запросов и пул async-вьюх
+            self.hits += len(found)
+            self.misses += len(targets) - len(found)
+        return found
+
+    def system(self) -> LinearSystem | None:
+        """Все загруженные модели как одна `LinearSystem` (None — не сложились)."""
+        self.models()
+        return self._system
+
+    def get(self, target: str):
+        return self.lookup([target]).get(target)
+
+    @property
+    def stamp(self) -> Tuple:
+        """Штамп загруженного набора моделей (меняется после переобучения)."""
+        self.models()
+        return self._stamp
+
+    @property
+    def version(self) -> str | None:
+        self.models()
+        return self._manifest.get("version")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "variant": self.variant,
+                "model_dir": str(self.model_dir),
+                "version": self._manifest.get("version"),
+                "models": len(self._models),
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+            }
+
+
+registry = ModelRegistry()
+_registries: Dict[str, ModelRegistry] = {"base": registry}
+_registries_lock = threading.Lock()
+
+
+def get_registry(variant: str = "base") -> ModelRegistry:
+    """Реестр моделей варианта (создаётся при первом обращении)."""
+    found = _registries.get(variant)
+    if found is None:
+        with _registries_lock:
+            found = _registries.setdefault(variant, ModelRegistry(variant=variant))
+    return found
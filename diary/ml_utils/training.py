@@ -0,0 +1,302 @@
+# diary/ml_utils/training.py
+"""Обучение базовых моделей: параллельно и с атомарной публикацией.
+
+• Цели обучаются независимо → `ProcessPoolExecutor` на `jobs` процессов
+  (DataFrame передаётся воркеру один раз через initializer).
+• Результат пишется в новый каталог `versions/<версия>/`, и только потом
+  `manifest.json` в корне атомарно (`os.replace`) переключается на него.
+  Читатели (`ModelRegistry`) всегда видят либо старый, либо новый полный
+  набор моделей — никогда наполовину записанный.
+• Старые версии удаляются, остаются последние `keep`.
+• Для каждой цели в манифест пишется отпечаток (хэш столбцов, на которых
+  она обучается, + гиперпараметры). При следующем запуске цели с тем же
+  отпечатком не переобучаются — их `.pkl` переносятся жёсткой ссылкой
+  из текущей версии; если не изменилось ничего, новая версия не
+  публикуется вовсе. `force=True` переобучает всё.
+• Признаки — параметры того же дня плюс лаги и скользящие средние
+  (`features.get_feature_matrix`, общая расширенная матрица на все
+  цели); целями остаются только исходные параметры.
+• Вариант модели (`base` / `flags` / `hybrid`, см. `variants`) задаёт,
+  какие блоки матрицы идут в X. Он входит в отпечаток, а модели каждого
+  варианта публикуются в свой каталог.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+
+from .base_model import DROP_ALWAYS, train_variant_model
+from .features import get_feature_spec
+from .registry import get_model_dir, read_manifest, write_manifest
+from .variants import ModelVariant, get_variant
+
+logger = logging.getLogger("train_models")
+
+VERSIONS_DIR = "versions"
+
+ProgressCallback = Callable[[int, int, str], None]
+
+# DataFrame воркера (заполняется initializer'ом пула)
+_worker_df: pd.DataFrame | None = None
+
+
+def _init_worker(df: pd.DataFrame) -> None:
+    global _worker_df
+    _worker_df = df
+
+
+def _train_one(df: pd.DataFrame, target: str, out_dir: str, variant: str) -> Tuple[str, str | None]:
+    result = train_variant_model(get_variant(variant), df, target)
+    model = result.get("model")
+    if not model:
+        return target, None
+    file_name = f"{target}.pkl"
+    joblib.dump(model, os.path.join(out_dir, file_name))
+    return target, file_name
+
+
+def _train_in_worker(target: str, out_dir: str, variant: str) -> Tuple[str, str | None]:
+    return _train_one(_worker_df, target, out_dir, variant)
+
+
+def model_hyperparams(variant: ModelVariant | None = None) -> Dict[str, object]:
+    """Всё, что кроме данных влияет на модель — входит в отпечаток."""
+    spec = get_feature_spec()
+    variant = variant or get_variant("base")
+    return {
+        "model": f"{variant.name}_model.LinearRegression",
+        "exclude": [],
+        "sklearn": sklearn.__version__,
+        "features": {"lags": list(spec.lags), "windows": list(spec.windows)},
+    }
+
+
+def target_fingerprints(
+    df: pd.DataFrame,
+    targets: Iterable[str],
+    *,
+    hyperparams: Dict[str, object] | None = None,
+    variant: ModelVariant | None = None,
+) -> Dict[str, str]:
+    """Отпечаток обучающего среза каждой цели.
+
+    Каждый столбец хэшируется один раз; отпечаток цели — хэш от
+    гиперпараметров, имени цели и упорядоченных хэшей её столбцов
+    (признаки варианта в порядке `base_model.train_model` + сама цель).
+    """
+    variant = variant or get_variant("base")
+    columns = [c for c in df.columns if c not in DROP_ALWAYS]
+    col_hash: Dict[str, bytes] = {}
+    for col in columns:
+        values = np.ascontiguousarray(df[col].to_numpy(dtype=np.float64))
+        h = hashlib.blake2b(col.encode("utf-8"), digest_size=16)
+        h.update(values.tobytes())
+        col_hash[col] = h.digest()
+
+    params = json.dumps(hyperparams or model_hyperparams(variant), sort_keys=True).encode("utf-8")
+    fingerprints: Dict[str, str] = {}
+    for target in targets:
+        h = hashlib.blake2b(params, digest_size=16)
+        h.update(target.encode("utf-8"))
+        excluded = set(variant.exclude(target, columns))
+        for col in columns:
+            if col != target and col not in excluded:
+                h.update(col_hash[col])
+        h.update(col_hash[target])
+        fingerprints[target] = h.hexdigest()
+    return fingerprints
+
+
+def _link_or_copy(src: Path, dst: Path) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def new_version() -> str:
+    return datetime.now().strftime("%Y%m%dT%H%M%S%f")
+
+
+def train_targets(
+    df: pd.DataFrame,
+    targets: Iterable[str],
+    out_dir: Path,
+    *,
+    jobs: int = 1,
+    progress: ProgressCallback | None = None,
+    variant: str = "base",
+) -> Dict[str, str]:
+    """Обучает модели варианта `variant` для `targets` и сохраняет их в `out_dir`.
+
+    Возвращает `target → имя .pkl` для успешно обученных целей.
+    """
+    targets = list(targets)
+    trained: Dict[str, str] = {}
+    total = len(targets)
+
+    def _done(i: int, target: str, file_name: str | None) -> None:
+        if file_name:
+            trained[target] = file_name
+            logger.info("✅ Обучено: %s", target)
+        else:
+            logger.warning("⛔ Пропущено: %s — модель не обучена", target)
+        if progress:
+            progress(i, total, target)
+
+    if jobs <= 1 or total <= 1:
+        for i, target in enumerate(targets, 1):
+            _done(i, *_train_one(df, target, str(out_dir), variant))
+        return trained
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(df,)) as pool:
+        futures = [pool.submit(_train_in_worker, target, str(out_dir), variant) for target in targets]
+        for i, future in enumerate(as_completed(futures), 1):
+            _done(i, *future.result())
+    return trained
+
+
+def publish_version(
+    model_dir: Path,
+    version: str,
+    staging_dir: Path,
+    models: Dict[str, str],
+    *,
+    extra: Dict | None = None,
+    keep: int = 3,
+) -> Path:
+    """Переименовывает готовый каталог в `versions/<version>` и переключает манифест."""
+    final_dir = model_dir / VERSIONS_DIR / version
+    os.replace(staging_dir, final_dir)
+    write_manifest(model_dir, {
+        "version": version,
+        "trained_at": datetime.now().isoformat(),
+        "path": f"{VERSIONS_DIR}/{version}",
+        "models": models,
+        **(extra or {}),
+    })
+    _cleanup_versions(model_dir, keep=keep, current=version)
+    return final_dir
+
+
+def _cleanup_versions(model_dir: Path, *, keep: int, current: str) -> None:
+    # .pkl прежнего «плоского» формата больше не читаются — манифест уже есть
+    for legacy in model_dir.glob("*.pkl"):
+        legacy.unlink(missing_ok=True)
+
+    versions_root = model_dir / VERSIONS_DIR
+    published: List[str] = sorted(p.name for p in versions_root.iterdir() if p.is_dir() and not p.name.startswith("."))
+    for name in published[:-max(keep, 1)]:
+        if name != current:
+            shutil.rmtree(versions_root / name, ignore_errors=True)
+            logger.info("🧹 Удалена старая версия моделей: %s", name)
+
+
+def train_and_publish(
+    df: pd.DataFrame,
+    model_dir: Path,
+    *,
+    jobs: int = 1,
+    keep: int = 3,
+    force: bool = False,
+    progress: ProgressCallback | None = None,
+    targets: List[str] | None = None,
+    variant: str = "base",
+) -> Tuple[str, Dict[str, str]]:
+    """Полный цикл: обучить изменившиеся цели в новый каталог и атомарно опубликовать.
+
+    `targets` — по умолчанию все столбцы, кроме даты.
+    """
+    targets = list(targets) if targets is not None else [c for c in df.columns if c not in DROP_ALWAYS]
+    fingerprints = target_fingerprints(df, targets, variant=get_variant(variant))
+
+    current = read_manifest(model_dir)
+    current_dir = model_dir / current.get("path", ".")
+    current_models: Dict[str, str] = current.get("models", {})
+    current_fps: Dict[str, str] = current.get("fingerprints", {})
+    reuse = [] if force else [
+        t for t in targets
+        if t in current_models and current_fps.get(t) == fingerprints[t] and (current_dir / current_models[t]).exists()
+    ]
+    to_train = [t for t in targets if t not in reuse]
+
+    # Без опубликованной версии (пустая БД, первый запуск) публикуем даже пустой набор
+    if not to_train and set(reuse) == set(current_models) and "version" in current:
+        logger.info("💤 Данные не изменились — все %d моделей актуальны (версия %s)", len(reuse), current.get("version"))
+        if progress:
+            progress(len(targets), len(targets), "")
+        return current["version"], dict(current_models)
+
+    version = new_version()
+    staging_dir = model_dir / VERSIONS_DIR / f".{version}.tmp"
+    staging_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        for target in reuse:
+            _link_or_copy(current_dir / current_models[target], staging_dir / current_models[target])
+        logger.info("♻️ Без изменений: %d, к обучению: %d", len(reuse), len(to_train))
+
+        def _progress(done: int, total: int, target: str) -> None:
+            if progress:
+                progress(len(reuse) + done, len(targets), target)
+
+        trained = train_targets(df, to_train, staging_dir, jobs=jobs, progress=_progress, variant=variant)
+        models = {**{t: current_models[t] for t in reuse}, **trained}
+        publish_version(
+            model_dir, version, staging_dir, models,
+            extra={
+                "variant": variant,
+                "fingerprints": {t: fingerprints[t] for t in models},
+                "reused": sorted(reuse),
+            },
+            keep=keep,
+        )
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    logger.info("📝 Опубликована версия моделей %s: %d моделей", version, len(models))
+    return version, models
+
+
+def run_training(
+    *,
+    jobs: int = 1,
+    keep: int = 3,
+    force: bool = False,
+    progress: ProgressCallback | None = None,
+    model: str | None = None,
+) -> Tuple[str, Dict[str, str]]:
+    """Обучение по всей истории до вчерашнего дня (команда и фоновые задачи).
+
+    `model` — вариант (`base` / `flags` / `hybrid`), по умолчанию
+    `DIARY_MODEL_VARIANT`.
+    """
+    from .features import get_feature_matrix  # ORM нужен только здесь, не в воркерах пула
+
+    variant = get_variant(model)
+    model_dir = get_model_dir(variant.name)
+    model_dir.mkdir(parents=True, exist_ok=True)
+
+    matrix = get_feature_matrix(flags=variant.flags)
+    df = matrix.frame[matrix.frame["date"] < date.today()]
+
+    logger.info("🟡 Старт обучения моделей %s (процессов: %d)...", variant.name, jobs)
+    logger.info("📄 Цели: %s", ", ".join(matrix.keys))
+    logger.info("🧮 Признаков истории на цель: %d", len(matrix.spec.names(matrix.keys)))
+    logger.info("📆 Даты в обучении: от %s до %s", df["date"].min(), df["date"].max())
+
+    return train_and_publish(
+        df, model_dir, jobs=jobs, keep=keep, force=force, progress=progress, targets=matrix.keys,
+        variant=variant.name,
+    )
@@ -1,74 +1,224 @@
 # diary/ml_utils/utils.py
 """Utility helpers for ML data preparation.
 
-* Экспортирует «сырые» данные в Excel с человеческими названиями столбцов
-  (на русском) **без** автозаполнения нулями,
-* а для обучения/предсказаний возвращает DataFrame с **machine‑friendly**
-  `Parameter.key`‑колонками, где пропуски заменены на `0.0`.
+* Для обучения/предсказаний возвращает DataFrame с **machine‑friendly**
+  `Parameter.key`‑колонками, где пропуски заменены на `0.0`;
+* по явному запросу (`export_debug_excel`, команда `export_diary_excel`
+  или кнопка в админке) выгружает «сырые» данные в Excel с человеческими
+  названиями столбцов (на русском) **без** автозаполнения нулями.
+
+Для обучения матрица берётся из колоночного снапшота на диске
+(`diary.snapshot`): DataFrame — float64-срез mmap без копии, общий
+page cache для всех воркеров;
+Excel-выгрузка читает значения **одним** `values_list`‑запросом.
+Готовый DataFrame кэшируется в процессе по версии данных
+(`diary.data_version`), поэтому между записями сборка не повторяется.
 """
 
 from __future__ import annotations
 
 import logging
-from typing import Dict, List
-
+import os
+import tempfile
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+import numpy as np
 import pandas as pd
+from django.conf import settings
+from django.db import connection
 
-from diary.models import Entry, EntryValue, Parameter
+from diary.data_version import get_data_version
+from diary.instrumentation import stage
+from diary.models import EntryValue, Parameter
+from diary.snapshot import get_snapshot
 
 logger = logging.getLogger("diary.ml_utils.utils")
 
+# Кэш «версия данных → df_keys»; хранится только последняя версия.
+_frame_cache: Dict[int, pd.DataFrame] = {}
+_frame_lock = threading.Lock()
+
+# Не больше одной выгрузки Excel одновременно в процессе.
+_export_lock = threading.Lock()
+
+
+class DiaryMatrix(NamedTuple):
+    """Плотное представление дневника «дата × параметр».
+
+    • `dates`  — отсортированные даты записей (`datetime.date`);
+    • `keys` / `names` — `Parameter.key` / `Parameter.name_ru` по столбцам;
+    • `values` — float64‑матрица, пропуски = `NaN`;
+    • `param_ids` — `Parameter.id` по столбцам.
+    """
+
+    dates: List[date]
+    keys: List[str]
+    names: List[str]
+    values: np.ndarray
+    param_ids: np.ndarray
+
+
+def build_diary_matrix() -> DiaryMatrix:
+    """Собирает матрицу «дата × активный параметр» за два запроса.
+
+    Порядок столбцов совпадает с прежним построчным построением:
+    параметры идут в порядке первого появления при обходе записей
+    по дате (внутри даты — по `parameter_id`). Параметры без единого
+    значения в матрицу не попадают.
+    """
+    params = list(Parameter.objects.filter(active=True).order_by("id").values_list("id", "key", "name_ru"))
+    rows = list(
+        EntryValue.objects.filter(parameter__active=True)
+        .order_by("entry__date", "parameter_id")
+        .values_list("entry__date", "parameter_id", "value")
+    )
+    if not params or not rows:
+        return DiaryMatrix([], [], [], np.empty((0, 0), dtype=np.float64), np.empty(0, dtype=np.int64))
+
+    n = len(rows)
+    ordinals = np.fromiter((r[0].toordinal() for r in rows), dtype=np.int64, count=n)
+    param_ids = np.fromiter((r[1] for r in rows), dtype=np.int64, count=n)
+    values = np.fromiter((np.nan if r[2] is None else r[2] for r in rows), dtype=np.float64, count=n)
+
+    # --- Индексы строк (даты) и столбцов (параметры) ---
+    day_ordinals, row_idx = np.unique(ordinals, return_inverse=True)
+    all_ids = np.array([p[0] for p in params], dtype=np.int64)
+    id_lookup = np.full(int(max(param_ids.max(), all_ids.max())) + 1, -1, dtype=np.int64)
+    id_lookup[all_ids] = np.arange(len(params))
+    col_idx = id_lookup[param_ids]
+    known = col_idx >= 0  # параметр мог стать неактивным между запросами
+    row_idx, col_idx, values = row_idx[known], col_idx[known], values[known]
+
+    # --- Порядок столбцов = порядок первого появления ---
+    used_cols, first_pos = np.unique(col_idx, return_index=True)
+    col_order = used_cols[np.argsort(first_pos, kind="stable")]
+    remap = np.empty(len(params), dtype=np.int64)
+    remap[col_order] = np.arange(col_order.size)
+
+    matrix = np.full((day_ordinals.size, col_order.size), np.nan, dtype=np.float64)
+    matrix[row_idx, remap[col_idx]] = values
+
+    return DiaryMatrix(
+        dates=[date.fromordinal(int(o)) for o in day_ordinals],
+        keys=[params[i][1] for i in col_order],
+        names=[params[i][2] for i in col_order],
+        values=matrix,
+        param_ids=all_ids[col_order],
+    )
+
+
+def _frame(dates: List[date], columns: List[str], values: np.ndarray) -> pd.DataFrame:
+    df = pd.DataFrame(values, columns=columns, copy=False)
+    df.insert(0, "date", np.array(dates, dtype=object))
+    return df
+
 
 def get_diary_dataframe() -> pd.DataFrame:
-    """Собирает все записи дневника в два представления.
+    """Возвращает df_keys для текущей версии данных (из кэша, если есть).
 
-    1. **df_excel** — колонки = `Parameter.name_ru`, пропуски *оставлены пустыми*;
-       сохраняется в *debug_diary_dataframe.xlsx* для анализа.
-    2. **df_keys**  — колонки = `Parameter.key`, пропуски -> `0.0`;
-       именно его функция *возвращает* для ML‑моделей.
+    Возвращаемый DataFrame общий для всех вызывающих — его нельзя менять
+    на месте; для модификаций делайте `.copy()`. Столбцы значений —
+    float64 только для чтения поверх mmap снапшота.
+    """
+    version = get_data_version()
+    df = _frame_cache.get(version)
+    if df is not None:
+        return df
+
+    with _frame_lock:
+        df = _frame_cache.get(version)
+        if df is None:
+            df = _build_diary_dataframe()
+            _frame_cache.clear()
+            _frame_cache[version] = df
+            logger.debug("🧞 DataFrame пересобран для версии данных %s", version)
+    return df
+
+
+@stage("dataframe.build")
+def _build_diary_dataframe() -> pd.DataFrame:
+    """Собирает **df_keys**: колонки = `Parameter.key`, пропуски -> `0.0`.
+
+    Данные — срез mmap-снапшота (`diary.snapshot`) без копии: пустых
+    дней в нём нет, пропуски уже нулевые, а первые `used` столбцов уже
+    стоят в порядке первого появления по дате (пустые отброшены).
     """
+    with stage("dataframe.snapshot"):
+        snap = get_snapshot()
+    if snap.used == 0:  # пустая БД или ни одного значения
+        return _frame([], [], np.empty((0, 0)))
+    df_keys = _frame(snap.date_list(), snap.keys[:snap.used], snap.values[:, :snap.used])
 
-    # --- Справочники ---
-    parameters: List[Parameter] = list(Parameter.objects.filter(active=True))
-    id_to_key: Dict[int, str] = {p.id: p.key for p in parameters}
-    id_to_name: Dict[int, str] = {p.id: p.name_ru for p in parameters}
+    # --- Лог и возврат «machine»‑варианта ---
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("🧞 DataFrame head used for training:\n%s", df_keys.head(10).to_string())
 
-    # --- Сбор строк как «key»‑ и «name_ru»‑словарей параллельно ---
-    rows_keys: List[Dict[str, object]] = []
-    rows_names: List[Dict[str, object]] = []
+    return df_keys
 
-    for entry in Entry.objects.all().order_by("date"):
-        row_k: Dict[str, object] = {"date": entry.date}
-        row_n: Dict[str, object] = {"date": entry.date}
 
-        for ev in EntryValue.objects.filter(entry=entry):
-            key = id_to_key.get(ev.parameter_id)
-            name = id_to_name.get(ev.parameter_id)
-            if key:
-                row_k[key] = ev.value
-            if name:
-                row_n[name] = ev.value
+# ---------------------------------------------------------------------------
+# Отладочная выгрузка в Excel (только по запросу, не на горячем пути)
+# ---------------------------------------------------------------------------
 
-        rows_keys.append(row_k)
-        rows_names.append(row_n)
+def get_excel_export_path() -> Path:
+    """Путь выгрузки: `settings.DIARY_EXCEL_EXPORT_PATH` или файл в BASE_DIR."""
+    return Path(getattr(settings, "DIARY_EXCEL_EXPORT_PATH", settings.BASE_DIR / "debug_diary_dataframe.xlsx"))
 
-    # --- DataFrames ---
-    df_keys: pd.DataFrame = pd.DataFrame(rows_keys)
-    df_names: pd.DataFrame = pd.DataFrame(rows_names)
 
-    # --- Удаляем полностью пустые строки (все параметры NaN, кроме даты) ---
-    param_cols = [col for col in df_keys.columns if col != "date"]
-    df_keys = df_keys.dropna(how="all", subset=param_cols)
+def export_debug_excel(path: str | os.PathLike | None = None, *, force: bool = False) -> bool:
+    """Выгружает **df_excel** (колонки = `Parameter.name_ru`, пропуски пустые).
 
-    # --- Экспорт «человеческого» варианта ---
-    df_names.to_excel("debug_diary_dataframe.xlsx", index=False)
+    • Файл пишется во временный файл рядом и атомарно подменяется
+      через `os.replace` — читатель никогда не видит недописанный xlsx.
+    • Версия данных сохраняется в `<path>.version`; если она не менялась,
+      выгрузка пропускается (если не передан `force=True`).
 
-    # --- Лог и возврат «machine»‑варианта ---
-    logger.debug("🧞 DataFrame head used for training:\n%s", df_keys.head(10).to_string())
-    for h in logger.handlers:
+    Возвращает True, если файл был перезаписан.
+    """
+    target = Path(path) if path else get_excel_export_path()
+    stamp = target.with_name(target.name + ".version")
+
+    with _export_lock:
+        version = get_data_version()
+        if not force and target.exists() and stamp.exists():
+            if stamp.read_text(encoding="utf-8").strip() == str(version):
+                logger.info("📄 Excel-выгрузка актуальна (версия данных %s): %s", version, target)
+                return False
+
+        matrix = build_diary_matrix()
+        df_names = _frame(matrix.dates, matrix.names, matrix.values)
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(prefix=f".{target.stem}.", suffix=".tmp.xlsx", dir=target.parent)
+        os.close(fd)
+        try:
+            df_names.to_excel(tmp_name, index=False, engine="openpyxl")
+            os.chmod(tmp_name, 0o644)
+            os.replace(tmp_name, target)
+        except Exception:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            raise
+        stamp.write_text(str(version), encoding="utf-8")
+
+    logger.info("📄 Excel-выгрузка обновлена (версия данных %s): %s", version, target)
+    return True
+
+
+def start_debug_excel_export(path: str | os.PathLike | None = None, *, force: bool = False) -> threading.Thread:
+    """Запускает `export_debug_excel` в фоновом daemon‑потоке."""
+
+    def _run() -> None:
         try:
-            h.flush()
+            export_debug_excel(path, force=force)
         except Exception:
-            pass
+            logger.exception("Excel-выгрузка завершилась ошибкой")
+        finally:
+            connection.close()  # у потока своё соединение с БД
 
-    return df_keys.fillna(0.0)
\ No newline at end of file
+    thread = threading.Thread(target=_run, name="diary-excel-export", daemon=True)
+    thread.start()
+    return thread
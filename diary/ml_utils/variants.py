@@ -0,0 +1,56 @@
+# diary/ml_utils/variants.py
+"""Варианты базовой модели: какие блоки расширенной матрицы идут в X.
+
+• `base`   — значения параметров того же дня;
+• `flags`  — только флаги наличия `key_есть` (значение > 0);
+• `hybrid` — значения и флаги вместе.
+
+Признаки истории (лаги, скользящие средние) входят во все варианты.
+Флаги строятся один раз на версию данных для всех параметров
+(`features.get_feature_matrix(flags=True)`). Варианту остаётся только
+выбрать столбцы — это делает `exclude()`. Собственный флаг цели всегда
+исключается: он однозначно выдаёт, была ли цель > 0.
+
+Обучение для любого варианта — `base_model.train_variant_model`.
+У каждого варианта свой каталог моделей (`registry.get_model_dir`)
+и свой реестр. По умолчанию используется `settings.DIARY_MODEL_VARIANT`.
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, NamedTuple
+
+from django.conf import settings
+
+from .features import flag_name, value_columns
+
+DEFAULT_VARIANT = "base"
+
+
+class ModelVariant(NamedTuple):
+    name: str
+    values: bool  # значения параметров дня в X
+    flags: bool  # флаги наличия в X
+
+    def exclude(self, target: str, columns: Iterable[str]) -> List[str]:
+        """Столбцы расширенной матрицы, которые не идут в X для `target`."""
+        columns = list(columns)
+        drop = [flag_name(target)] if flag_name(target) in columns else []
+        if not self.values:
+            drop += [c for c in value_columns(columns) if c != target]
+        return drop
+
+
+VARIANTS: Dict[str, ModelVariant] = {
+    "base": ModelVariant("base", values=True, flags=False),
+    "flags": ModelVariant("flags", values=False, flags=True),
+    "hybrid": ModelVariant("hybrid", values=True, flags=True),
+}
+
+
+def get_variant(name: str | None = None) -> ModelVariant:
+    """Вариант по имени (по умолчанию — `DIARY_MODEL_VARIANT`); ValueError, если такого нет."""
+    name = name or getattr(settings, "DIARY_MODEL_VARIANT", DEFAULT_VARIANT)
+    try:
+        return VARIANTS[name]
+    except KeyError:
+        raise ValueError(f"Неизвестный вариант модели: {name} (есть: {', '.join(VARIANTS)})") from None
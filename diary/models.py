@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 
 class Parameter(models.Model):
     key = models.CharField(max_length=50, unique=True)
@@ -15,6 +15,11 @@ class Entry(models.Model):
     def __str__(self):
         return f"Запись за {self.date}"
 
+    def save(self, *args, **kwargs):
+        # Сигналы (дата широкой строки, версия данных) — в одной транзакции с записью
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 class EntryValue(models.Model):
     entry = models.ForeignKey(Entry, on_delete=models.CASCADE)
     parameter = models.ForeignKey(Parameter, on_delete=models.CASCADE)
@@ -22,3 +27,104 @@ class EntryValue(models.Model):
 
     class Meta:
         unique_together = ('entry', 'parameter')
+        indexes = [
+            # История одного параметра по датам (unique_together ведёт с entry)
+            models.Index(fields=["parameter", "entry"], name="diary_ev_param_entry_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # pre/post_save (широкая строка, статистики live-модели, версия данных)
+        # идут в одной транзакции с самой записью; delete() Django и так
+        # шлёт сигналы внутри своей транзакции
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+class EntryRow(models.Model):
+    """Широкая строка дня для чтения: все значения записи в одном JSON.
+
+    `data` — `{"<Parameter.id>": value}` по всем значениям EntryValue этой
+    записи; `date` продублирована из Entry, чтобы полная история читалась
+    одним упорядоченным проходом по N строкам без join'ов.
+    Поддерживается в той же транзакции, что и запись EntryValue:
+    `save()` моделей и `delete()` открывают транзакцию, bulk-пути
+    (`diary.writes`, импорт) пишут внутри своей (см. `diary.wide`).
+    Дней без значений в таблице нет.
+    """
+    entry = models.OneToOneField(Entry, on_delete=models.CASCADE, primary_key=True, related_name="row")
+    date = models.DateField(unique=True)
+    data = models.JSONField(default=dict)
+
+    def __str__(self):
+        return f"Строка за {self.date} ({len(self.data)} знач.)"
+
+class DataVersion(models.Model):
+    """Монотонный счётчик версии данных дневника (единственная строка pk=1).
+
+    Увеличивается сигналами на любую запись в Entry / EntryValue / Parameter;
+    по нему кэши во всех процессах понимают, что данные устарели.
+    `parameters` растёт только при изменении Parameter — по нему
+    справочник параметров не пересобирается после каждого клика.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    parameters = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Версия данных {self.version}"
+
+class LiveStats(models.Model):
+    """Достаточные статистики «живой» регрессии (единственная строка pk=1).
+
+    `payload` — `np.savez` с n, Σx, XᵀX и счётчиками по активным параметрам;
+    обновляется rank-one поправками на каждую запись в EntryValue
+    (см. `diary.ml_utils.live_stats`). `stale=True` — нужна полная пересборка.
+    """
+    payload = models.BinaryField(blank=True, default=b"")
+    stale = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Статистики live-модели ({'устарели' if self.stale else 'актуальны'})"
+
+class TrainingJob(models.Model):
+    """Фоновая задача обучения моделей (см. `diary.jobs`).
+
+    `active_key` заполнен, пока задача в очереди или выполняется; уникальность
+    поля не даёт запустить две одинаковые задачи одновременно.
+    """
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "В очереди"),
+        (STATUS_RUNNING, "Выполняется"),
+        (STATUS_DONE, "Готово"),
+        (STATUS_FAILED, "Ошибка"),
+    ]
+
+    kind = models.CharField(max_length=50, default="train_models")
+    active_key = models.CharField(max_length=50, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    params = models.JSONField(default=dict, blank=True)
+    progress_done = models.PositiveIntegerField(default=0)
+    progress_total = models.PositiveIntegerField(default=0)
+    message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.get_status_display()})"
+
+class DirtyDate(models.Model):
+    """Дата, значения которой менялись после версии `version`.
+
+    По этим датам снапшот матрицы (`diary.snapshot`) пересобирается
+    инкрементально, без полного чтения EntryValue.
+    """
+    date = models.DateField(unique=True)
+    version = models.PositiveBigIntegerField(db_index=True)
+
+    def __str__(self):
+        return f"{self.date} (v{self.version})"
@@ -1,74 +1,151 @@
-import pandas as pd
-from diary.models import Entry, EntryValue, Parameter
-from slugify import slugify
-from datetime import datetime
+# diary/scripts/import_excel_to_db.py
+"""Потоковый импорт дневника из Excel.
+
+• Лист читается построчно через openpyxl в режиме `read_only` — в памяти
+  только текущая пачка строк, а не весь workbook / DataFrame.
+• Для каждой пачки (`chunk_size` строк) недостающие `Entry` создаются
+  одним `bulk_create`, существующие значения читаются только для дат
+  этой пачки, а значения пишутся upsert'ом
+  `bulk_create(update_conflicts=True)`; широкие строки этих дней
+  (`diary.wide`) пересчитываются в той же транзакции.
+• Каждая пачка коммитится сама, поэтому в её же транзакции статистики
+  live-модели помечаются устаревшими, поднимается версия данных и
+  записываются изменённые даты снапшота. Если импорт упадёт на
+  следующей пачке, уже записанные дни всё равно не останутся в кэшах
+  со старой версией.
+• Вместо print на каждую ячейку — счётчики прогресса в логе.
+"""
+from __future__ import annotations
+
+import logging
 import os
+from datetime import date, datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+import pandas as pd
 from django.conf import settings
+from django.db import transaction
+from openpyxl import load_workbook
+from slugify import slugify
+
+from diary import snapshot, wide
+from diary.ml_utils.live_stats import mark_stale
+from diary.models import Entry, EntryValue, Parameter
+
+logger = logging.getLogger("diary.scripts.import_excel_to_db")
 
-def run_excel_import():
-    file_path = os.path.join(settings.BASE_DIR, 'diary', 'scripts', 'Короткая таблица.xlsx')
+DEFAULT_CHUNK_SIZE = 500
 
-    df = pd.read_excel(file_path)
-    columns = [col.strip() for col in df.columns]
-    df.columns = columns
 
-    print("\n>>> Начинаем импорт...")
+def _chunks(rows: Iterable[Tuple], size: int) -> Iterator[List[Tuple]]:
+    it = iter(rows)
+    while chunk := list(islice(it, size)):
+        yield chunk
 
+
+def _parse_date(raw: Any) -> date:
+    if isinstance(raw, datetime):
+        return raw.date()
+    if isinstance(raw, date):
+        return raw
+    return pd.to_datetime(str(raw).strip()).date()
+
+
+def _resolve_parameters(columns: List[str]) -> Dict[int, int]:
+    """Индекс столбца → Parameter.id; недостающие параметры создаются."""
     param_cache = {p.name_ru: p for p in Parameter.objects.all()}
     param_counter = len(param_cache)
+    by_column: Dict[int, int] = {}
+    for idx, name_ru in enumerate(columns):
+        if idx == 0 or not name_ru:
+            continue
+        param = param_cache.get(name_ru)
+        if not param:
+            key = slugify(name_ru)
+            if not key:
+                param_counter += 1
+                key = f"param_{param_counter}"
+            param = Parameter.objects.create(name_ru=name_ru, key=key)
+            param_cache[name_ru] = param
+            logger.info("➕ Создан параметр: %s (key=%s)", name_ru, key)
+        by_column[idx] = param.id
+    return by_column
 
-    entries = {}
-    entry_values_to_create = []
-    entry_values_to_update = []
-    existing_entry_values = {(ev.entry_id, ev.parameter_id): ev for ev in EntryValue.objects.all()}
 
-    for index, row in df.iterrows():
-        date_str = str(row[columns[0]]).strip()
+def _import_chunk(rows: List[Tuple], by_column: Dict[int, int]) -> Tuple[int, int, int]:
+    """Пишет одну пачку строк. Возвращает (создано, обновлено, пропущено)."""
+    cells: Dict[Tuple[date, int], float] = {}
+    skipped = 0
+    for row in rows:
+        if not row or row[0] is None:
+            continue
         try:
-            entry_date = pd.to_datetime(date_str).date()
+            entry_date = _parse_date(row[0])
         except Exception as e:
-            print(f"[!] Невалидная дата '{date_str}': {e}")
+            logger.warning("[!] Невалидная дата '%s': %s", row[0], e)
+            skipped += 1
             continue
+        for idx, param_id in by_column.items():
+            value = row[idx] if idx < len(row) else None
+            if value is None or (isinstance(value, str) and not value.strip()):
+                continue
+            try:
+                cells[(entry_date, param_id)] = float(value)
+            except (TypeError, ValueError):
+                skipped += 1
 
-        if entry_date not in entries:
-            entries[entry_date], _ = Entry.objects.get_or_create(date=entry_date)
+    if not cells:
+        return 0, 0, skipped
 
-        entry = entries[entry_date]
-        print(f"\n📅 Обработка даты: {entry_date}")
+    dates = {d for d, _ in cells}
+    with transaction.atomic():
+        Entry.objects.bulk_create([Entry(date=d) for d in dates], ignore_conflicts=True)
+        entries = dict(Entry.objects.filter(date__in=dates).values_list("date", "id"))
+        existing = set(
+            EntryValue.objects.filter(entry_id__in=entries.values()).values_list("entry_id", "parameter_id")
+        )
+        objs = [EntryValue(entry_id=entries[d], parameter_id=p, value=v) for (d, p), v in cells.items()]
+        EntryValue.objects.bulk_create(
+            objs,
+            update_conflicts=True,
+            unique_fields=["entry", "parameter"],
+            update_fields=["value"],
+        )
+        wide.refresh_rows(entries.values())
+        mark_stale()  # bulk-операции не вызывают post_save
+        snapshot.bump_dirty_dates(dates)
 
-        for col in columns[1:]:
-            value = row[col]
-            if pd.isnull(value):
-                continue
+    updated = sum((ev.entry_id, ev.parameter_id) in existing for ev in objs)
+    return len(objs) - updated, updated, skipped
+
+
+def run_excel_import(file_path=None, *, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Импортирует лист Excel (путь или файловый объект). Возвращает (создано, обновлено)."""
+    if file_path is None:
+        file_path = os.path.join(settings.BASE_DIR, 'diary', 'scripts', 'Короткая таблица.xlsx')
+
+    logger.info(">>> Начинаем импорт...")
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    created_count = updated_count = skipped_count = rows_seen = 0
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        columns = [str(col).strip() if col is not None else "" for col in header]
+        by_column = _resolve_parameters(columns)
+
+        for chunk in _chunks(rows, chunk_size):
+            created, updated, skipped = _import_chunk(chunk, by_column)
+            created_count += created
+            updated_count += updated
+            skipped_count += skipped
+            rows_seen += len(chunk)
+            logger.info(
+                "📥 Импорт: строк %d, создано %d, обновлено %d, пропущено %d",
+                rows_seen, created_count, updated_count, skipped_count,
+            )
+    finally:
+        wb.close()
 
-            name_ru = col.strip()
-            param = param_cache.get(name_ru)
-            if not param:
-                key = slugify(name_ru)
-                if not key:
-                    param_counter += 1
-                    key = f"param_{param_counter}"
-                param = Parameter.objects.create(name_ru=name_ru, key=key)
-                param_cache[name_ru] = param
-                print(f"➕ Создан параметр: {name_ru} (key={key})")
-
-            key_tuple = (entry.id, param.id)
-            if key_tuple in existing_entry_values:
-                ev = existing_entry_values[key_tuple]
-                ev.value = float(value)
-                entry_values_to_update.append(ev)
-                print(f"  ✏️ {param.name_ru} = {value}")
-            else:
-                entry_values_to_create.append(EntryValue(entry=entry, parameter=param, value=float(value)))
-                print(f"  🆕 {param.name_ru} = {value}")
-
-    if entry_values_to_create:
-        EntryValue.objects.bulk_create(entry_values_to_create)
-    if entry_values_to_update:
-        EntryValue.objects.bulk_update(entry_values_to_update, ["value"])
-
-    created_count = len(entry_values_to_create)
-    updated_count = len(entry_values_to_update)
-
-    print(f"\n✅ Импорт завершён. Создано: {created_count}, обновлено: {updated_count}")
+    logger.info("✅ Импорт завершён. Создано: %d, обновлено: %d", created_count, updated_count)
     return created_count, updated_count
@@ -0,0 +1,72 @@
+# diary/signals.py
+"""Сигналы дневника.
+
+• Любая запись в данные → новая версия данных.
+• Запись в EntryValue → rank-one обновление статистик live-модели
+  (до поднятия версии, чтобы новая версия всегда видела новые статистики).
+• Изменение Parameter меняет набор колонок → статистики пересобираются,
+  справочник параметров (`diary.catalog`) сбрасывается.
+• Изменённые даты записываются в `DirtyDate` с новой версией в одной
+  транзакции с её поднятием (`snapshot.bump_dirty_dates`) — по ним
+  снапшот матрицы (`diary.snapshot`) обновляется инкрементально.
+• Запись в EntryValue пересчитывает широкую строку дня (`diary.wide`)
+  в той же транзакции (её открывают `save()` моделей и `delete()`);
+  перенос Entry на другую дату правит её дату.
+"""
+from __future__ import annotations
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import catalog, snapshot, wide
+from .data_version import bump_data_version
+from .ml_utils import live_stats
+from .models import Entry, EntryValue, Parameter
+
+
+@receiver(pre_save, sender=Entry, dispatch_uid="diary_entry_pre_save")
+def remember_entry_date(sender, instance, **kwargs):
+    # При переносе записи на другую дату старая дата тоже «грязная»
+    instance._old_date = (
+        Entry.objects.filter(pk=instance.pk).values_list("date", flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Entry, dispatch_uid="diary_entry_saved")
+@receiver(post_delete, sender=Entry, dispatch_uid="diary_entry_deleted")
+def bump_on_write(sender, instance, **kwargs):
+    if kwargs.get("signal") is post_save:
+        wide.sync_date(instance)
+    old_date = getattr(instance, "_old_date", None)
+    snapshot.bump_dirty_dates([d for d in (instance.date, old_date) if d])
+
+
+@receiver(pre_save, sender=EntryValue, dispatch_uid="diary_entryvalue_pre_save")
+@receiver(pre_delete, sender=EntryValue, dispatch_uid="diary_entryvalue_pre_delete")
+def snapshot_entry_value(sender, instance, **kwargs):
+    if instance.pk and kwargs.get("signal") is pre_save:
+        old_entry = EntryValue.objects.filter(pk=instance.pk).values_list("entry_id", flat=True).first()
+        if old_entry is not None and old_entry != instance.entry_id:
+            live_stats.mark_stale()  # значение перенесли в другой день — проще пересобрать
+            # Старый день тоже «грязный» — отметит post_save вместе с новым
+            instance._old_entry_date = Entry.objects.filter(pk=old_entry).values_list("date", flat=True).first()
+    live_stats.snapshot_entry(instance.entry_id)
+
+
+@receiver(post_save, sender=EntryValue, dispatch_uid="diary_entryvalue_saved")
+@receiver(post_delete, sender=EntryValue, dispatch_uid="diary_entryvalue_deleted")
+def update_on_entry_value(sender, instance, **kwargs):
+    wide.refresh_rows([instance.entry_id])
+    live_stats.apply_entry_change(instance.entry_id)
+    # При каскадном удалении Entry уже может не быть — дату запишет её сигнал
+    day = Entry.objects.filter(pk=instance.entry_id).values_list("date", flat=True).first()
+    old_day = instance.__dict__.pop("_old_entry_date", None)
+    snapshot.bump_dirty_dates([d for d in (day, old_day) if d is not None])
+
+
+@receiver(post_save, sender=Parameter, dispatch_uid="diary_parameter_saved")
+@receiver(post_delete, sender=Parameter, dispatch_uid="diary_parameter_deleted")
+def invalidate_on_parameter(sender, **kwargs):
+    catalog.invalidate()
+    live_stats.mark_stale()
+    bump_data_version(parameters=True)
@@ -0,0 +1,292 @@
+# diary/snapshot.py
+"""Колоночный снапшот матрицы «дата × параметр» на диске.
+
+Каталог `settings.DIARY_SNAPSHOT_DIR` содержит версии `v<версия данных>/`:
+
+• `values.npy`    — float64 N×P, пропуски = 0.0 (значения как в БД, без округления);
+• `missing.npy`   — битовая маска пропусков (`np.packbits` по строкам);
+• `dates.npy`     — `datetime64[D]` по строкам (по возрастанию);
+• `param_ids.npy` — `Parameter.id` по столбцам (все активные);
+• `meta.json`     — версия, формат, ключи и названия параметров, `used`.
+
+Столбцы лежат сразу в порядке DataFrame обучения: сначала `used`
+параметров со значениями (по первому появлению), затем пустые. Поэтому
+`get_diary_dataframe` — срез `values[:, :used]` поверх mmap без копии
+и без распаковки маски. Все воркеры читают одни страницы page cache.
+
+Файл `CURRENT` (атомарный `os.replace`) указывает на актуальную версию.
+Читатели открывают массивы через `np.load(mmap_mode="r")`.
+
+При росте версии данных снапшот пересобирается **инкрементально**:
+сигналы пишут изменённые даты в `DirtyDate`, и из БД перечитываются
+только эти дни. Если поменялся набор активных параметров — полная сборка.
+
+Каждая версия пишется целиком в новый каталог: открытые mmap старой
+версии в других воркерах остаются валидными, а частичная запись на
+месте их бы испортила. Для 5 лет × 200 параметров это ~2.9 МБ
+(float64 — значения совпадают с БД, без округления float32): запись
+~13 мс, а вся инкрементальная пересборка — десятки мс на первое
+чтение после записи. Это дешевле, чем слой «база + дельта».
+
+Версия и изменённые даты пишутся одной транзакцией (`bump_dirty_dates`).
+Иначе читатель успел бы собрать снапшот новой версии до появления её
+`DirtyDate`, и день навсегда остался бы устаревшим. После сборки
+удаляются только прочитанные строки `DirtyDate` и только если их версия
+с тех пор не выросла.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from . import wide
+from .data_version import bump_data_version, get_data_version
+from .models import DirtyDate, Parameter
+
+try:  # межпроцессная блокировка сборки (на POSIX)
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger("diary.snapshot")
+
+CURRENT_NAME = "CURRENT"
+FORMAT = 3  # float64, столбцы в порядке DataFrame, `used` в meta
+KEEP_VERSIONS = 2
+
+# Если изменилась бо́льшая доля дней, дешевле собрать всё заново.
+FULL_REBUILD_FRACTION = 0.25
+DELETE_CHUNK = 500
+
+_opened: Dict[str, "Snapshot"] = {}
+_open_lock = threading.Lock()
+
+
+class Snapshot(NamedTuple):
+    version: int
+    path: Path
+    dates: np.ndarray  # datetime64[D], (N,)
+    param_ids: np.ndarray  # int64, (P,)
+    keys: List[str]
+    names: List[str]
+    values: np.ndarray  # float64 (N, P), mmap
+    missing_bits: np.ndarray  # uint8 (N, ceil(P/8)), mmap
+    used: int  # первые `used` столбцов — параметры хотя бы с одним значением
+
+    @property
+    def missing(self) -> np.ndarray:
+        """Булева маска пропусков (N, P)."""
+        return np.unpackbits(self.missing_bits, axis=1, count=len(self.keys)).astype(bool)
+
+    def date_list(self) -> List[date]:
+        return self.dates.astype(object).tolist()
+
+
+def get_snapshot_dir() -> Path:
+    return Path(getattr(settings, "DIARY_SNAPSHOT_DIR", settings.BASE_DIR / "diary" / "snapshots"))
+
+
+# ---------------------------------------------------------------------------
+# Изменённые даты (вызывается из сигналов и bulk-операций)
+# ---------------------------------------------------------------------------
+
+def record_dirty_dates(dates: Iterable[date], version: int) -> None:
+    objs = [DirtyDate(date=d, version=version) for d in set(dates)]
+    if objs:
+        DirtyDate.objects.bulk_create(objs, update_conflicts=True, unique_fields=["date"], update_fields=["version"])
+
+
+def bump_dirty_dates(dates: Iterable[date]) -> int:
+    """Поднимает версию данных и отмечает `dates` изменёнными — одной транзакцией."""
+    with transaction.atomic():
+        version = bump_data_version()
+        record_dirty_dates(dates, version)
+    return version
+
+
+# ---------------------------------------------------------------------------
+# Чтение
+# ---------------------------------------------------------------------------
+
+def _current_name(root: Path) -> str | None:
+    try:
+        return (root / CURRENT_NAME).read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _open(path: Path) -> Snapshot | None:
+    meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+    if meta.get("format") != FORMAT:
+        return None  # снапшот старого формата — соберётся заново
+    return Snapshot(
+        version=int(meta["version"]),
+        path=path,
+        dates=np.load(path / "dates.npy"),
+        param_ids=np.load(path / "param_ids.npy"),
+        keys=meta["keys"],
+        names=meta["names"],
+        values=np.load(path / "values.npy", mmap_mode="r"),
+        missing_bits=np.load(path / "missing.npy", mmap_mode="r"),
+        used=int(meta["used"]),
+    )
+
+
+def open_current() -> Snapshot | None:
+    """Текущий снапшот с диска (как есть, без проверки версии данных)."""
+    root = get_snapshot_dir()
+    name = _current_name(root)
+    if name is None:
+        return None
+    snap = _opened.get(name)
+    if snap is None:
+        with _open_lock:
+            snap = _opened.get(name)
+            if snap is None:
+                snap = _open(root / name)
+                if snap is None:
+                    return None
+                _opened.clear()
+                _opened[name] = snap
+    return snap
+
+
+def get_snapshot() -> Snapshot:
+    """Снапшот для текущей версии данных (при необходимости — пересборка)."""
+    version = get_data_version()
+    snap = open_current()
+    if snap is not None and snap.version == version:
+        return snap
+    with _build_lock():
+        snap = open_current()  # пока ждали блокировку, другой процесс мог собрать
+        if snap is not None and snap.version == version:
+            return snap
+        return refresh(snap, version)
+
+
+# ---------------------------------------------------------------------------
+# Сборка
+# ---------------------------------------------------------------------------
+
+_thread_build_lock = threading.Lock()
+
+
+@contextmanager
+def _build_lock() -> Iterator[None]:
+    root = get_snapshot_dir()
+    root.mkdir(parents=True, exist_ok=True)
+    with _thread_build_lock, open(root / ".lock", "w") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _active_params() -> List[tuple]:
+    return list(Parameter.objects.filter(active=True).order_by("id").values_list("id", "key", "name_ru"))
+
+
+def _rows_for(dates: Iterable[date] | None, param_ids: np.ndarray):
+    """(dates, values float64 с NaN) из широкой таблицы — за все дни или только за `dates`."""
+    days, matrix = wide.read_matrix(param_ids, dates=dates)
+    return np.array(days, dtype="datetime64[D]"), matrix
+
+
+def refresh(previous: Snapshot | None, version: int) -> Snapshot:
+    """Строит снапшот версии `version`: инкрементально от `previous` или с нуля."""
+    params = _active_params()
+    param_ids = np.array([p[0] for p in params], dtype=np.int64)
+    same_layout = (
+        previous is not None
+        and previous.version < version
+        and dict(zip(previous.param_ids.tolist(), zip(previous.keys, previous.names)))
+        == {pid: (key, name) for pid, key, name in params}
+    )
+
+    # Строки версий ≤ `version` уже закоммичены вместе со своей версией
+    pending = list(DirtyDate.objects.filter(version__lte=version).values_list("pk", "date", "version"))
+    dirty: List[date] = []
+    if same_layout:
+        dirty = [d for _, d, v in pending if v > previous.version]
+    incremental = same_layout and len(dirty) <= max(1, int(len(previous.dates) * FULL_REBUILD_FRACTION))
+
+    if incremental:
+        new_dates, new_values = _rows_for(dirty, param_ids)
+        keep_old = ~np.isin(previous.dates, np.array(dirty, dtype="datetime64[D]"))
+        by_id = np.argsort(previous.param_ids)  # столбцы прошлой версии → порядок id
+        old_values = np.where(previous.missing[keep_old], np.nan, previous.values[keep_old])[:, by_id]
+        dates = np.concatenate([previous.dates[keep_old], new_dates])
+        values = np.concatenate([old_values, new_values]) if len(dates) else np.empty((0, len(params)))
+        order = np.argsort(dates, kind="stable")
+        dates, values = dates[order], values[order]
+        logger.info("🧊 Снапшот v%s: инкрементально, изменённых дней %d", version, len(dirty))
+    else:
+        dates, values = _rows_for(None, param_ids)
+        logger.info("🧊 Снапшот v%s: полная сборка (%d дней × %d параметров)", version, *values.shape)
+
+    snap = _write(version, dates, param_ids, [p[1] for p in params], [p[2] for p in params], values)
+    # Строку, которую писатель успел поднять до новой версии, не трогаем
+    pks = [pk for pk, _, _ in pending]
+    for start in range(0, len(pks), DELETE_CHUNK):
+        DirtyDate.objects.filter(pk__in=pks[start:start + DELETE_CHUNK], version__lte=version).delete()
+    return snap
+
+
+def _frame_order(missing: np.ndarray) -> Tuple[np.ndarray, int]:
+    """(порядок столбцов, used): параметры со значениями по первому появлению, затем пустые."""
+    present = ~missing
+    filled = present.any(axis=0)
+    used = np.flatnonzero(filled)
+    first = present[:, used].argmax(axis=0) if used.size else np.empty(0, dtype=np.int64)
+    order = np.concatenate([used[np.argsort(first, kind="stable")], np.flatnonzero(~filled)])
+    return order, int(used.size)
+
+
+def _write(version: int, dates, param_ids, keys, names, values: np.ndarray) -> Snapshot:
+    root = get_snapshot_dir()
+    name = f"v{version:012d}"
+    tmp = root / f".{name}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    missing = np.isnan(values)
+    order, used = _frame_order(missing)
+    values, missing = values[:, order], missing[:, order]
+    np.save(tmp / "values.npy", np.where(missing, 0.0, values).astype(np.float64))
+    np.save(tmp / "missing.npy", np.packbits(missing, axis=1))
+    np.save(tmp / "dates.npy", dates.astype("datetime64[D]"))
+    np.save(tmp / "param_ids.npy", np.asarray(param_ids)[order])
+    meta = {
+        "version": version,
+        "format": FORMAT,
+        "keys": [keys[i] for i in order],
+        "names": [names[i] for i in order],
+        "used": used,
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+    final = root / name
+    shutil.rmtree(final, ignore_errors=True)
+    os.replace(tmp, final)
+    pointer = root / f".{CURRENT_NAME}.tmp"
+    pointer.write_text(name, encoding="utf-8")
+    os.replace(pointer, root / CURRENT_NAME)
+
+    published = sorted(p.name for p in root.iterdir() if p.is_dir() and p.name.startswith("v"))
+    for old in published[:-KEEP_VERSIONS]:
+        shutil.rmtree(root / old, ignore_errors=True)  # открытые mmap на POSIX остаются валидными
+    return open_current()
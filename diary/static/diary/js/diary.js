@@ -65,9 +65,66 @@ function fetchPredictions() {
     .catch(error => console.error("Ошибка при получении прогнозов:", error));
 }
 
+function showTrainingStatus(job) {
+    const box = document.getElementById("training-status");
+    if (!box) return;
+    box.hidden = false;
+    if (job.status === "done") {
+        box.textContent = `✅ Обучение завершено успешно. ${job.message || ""}`;
+    } else if (job.status === "failed") {
+        box.textContent = `❌ Обучение завершилось ошибкой: ${job.message || ""}`;
+    } else {
+        const total = job.total ? ` ${job.done}/${job.total}` : "";
+        box.textContent = `⏳ Обучение моделей…${total}`;
+    }
+}
+
+function pollTrainingJob(jobId) {
+    const box = document.getElementById("training-status");
+    if (!box || !jobId) return;
+    const url = box.dataset.urlStatus.replace(/0\/$/, `${jobId}/`);
+    fetch(url)
+        .then(res => res.json())
+        .then(job => {
+            showTrainingStatus(job);
+            if (job.status === "queued" || job.status === "running") {
+                setTimeout(() => pollTrainingJob(jobId), 1000);
+            } else if (job.status === "done") {
+                fetchPredictions();
+            }
+        })
+        .catch(err => console.error("Ошибка при получении статуса обучения:", err));
+}
+
+function startTraining(form) {
+    fetch(form.action, {
+        method: "POST",
+        headers: {
+            "Accept": "application/json",
+            "X-CSRFToken": getCookie("csrftoken"),
+        },
+    })
+    .then(res => res.json())
+    .then(job => {
+        showTrainingStatus(job);
+        pollTrainingJob(job.id);
+    })
+    .catch(err => console.error("Ошибка при запуске обучения:", err));
+}
+
 document.addEventListener("DOMContentLoaded", () => {
     fetchPredictions();
 
+    // 🧠 Обучение в фоне: запуск и опрос статуса без перезагрузки страницы
+    const trainForm = document.getElementById("train-form");
+    if (trainForm) {
+        trainForm.addEventListener("submit", e => {
+            e.preventDefault();
+            startTraining(trainForm);
+        });
+    }
+    pollTrainingJob(document.getElementById("training-status")?.dataset.job);
+
     // 🟢 Подсветка кнопок по initial значениям
     document.querySelectorAll("input[id^='input-']").forEach(input => {
         const name = input.id.replace("input-", "");
@@ -92,18 +149,39 @@ document.addEventListener("click", function(e) {
         document.getElementById(`input-${name}`).value = valueToSend;
 
         const date = document.getElementById("date-input")?.value || "";
-        const updateUrl = document.getElementById("update-url")?.value || "/update-value/";
-
-        fetch(updateUrl, {
-            method: "POST",
-            headers: {
-                "Content-Type": "application/json",
-                "X-CSRFToken": getCookie("csrftoken"),
-            },
-            body: JSON.stringify({ parameter: name, value: valueToSend, date })
-        })
-        .then(res => res.json())
-        .then(() => fetchPredictions())
-        .catch(err => console.error("Ошибка при обновлении значения:", err));
+        queueValueUpdate({ parameter: name, value: valueToSend, date });
     }
 });
+
+// 📦 Быстрые клики копятся и уходят одним пакетом (последнее значение побеждает)
+const pendingUpdates = new Map();
+let flushTimer = null;
+
+function queueValueUpdate(op) {
+    pendingUpdates.set(`${op.date}|${op.parameter}`, op);
+    clearTimeout(flushTimer);
+    flushTimer = setTimeout(flushValueUpdates, 300);
+}
+
+function flushValueUpdates() {
+    if (pendingUpdates.size === 0) return;
+    const operations = Array.from(pendingUpdates.values());
+    pendingUpdates.clear();
+    const batchUrl = document.getElementById("update-batch-url")?.value || "/update-values/";
+
+    fetch(batchUrl, {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+            "X-CSRFToken": getCookie("csrftoken"),
+        },
+        body: JSON.stringify({ operations })
+    })
+    .then(res => res.json())
+    .then(data => {
+        (data.results || []).filter(r => r.status === "error")
+            .forEach(r => console.error("Значение не сохранено:", operations[r.index], r.message));
+        fetchPredictions();
+    })
+    .catch(err => console.error("Ошибка при обновлении значений:", err));
+}
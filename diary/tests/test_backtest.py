@@ -0,0 +1,36 @@
+import numpy as np
+from django.test import TestCase
+
+from diary.ml_utils.backtest import BacktestResult, run_backtest
+
+from .utils import IsolatedDiaryMixin, make_parameters, write_days
+
+
+class BacktestMissingValuesTests(IsolatedDiaryMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        make_parameters("a", "b")
+        rng = np.random.default_rng(0)
+        rows = {}
+        for day in range(1, 29):
+            a = int(rng.integers(0, 6))
+            # «b» записан только по чётным дням
+            rows[f"2024-02-{day:02d}"] = {"a": a, **({"b": min(5, a + 1)} if day % 2 == 0 else {})}
+        write_days(rows)
+
+    def test_unrecorded_days_are_not_scored(self):
+        result = run_backtest("live", min_history=4)
+        b = result.keys.index("b")
+        self.assertEqual(int(result.observed[:, b].sum()), 14)
+        self.assertTrue(np.isnan(result.actual[~result.observed[:, b], b]).all())
+
+        summary = result.summary()
+        scored = ~np.isnan(result.predicted[:, b]) & result.observed[:, b]
+        self.assertEqual(summary.loc["b", "n"], scored.sum())
+        self.assertEqual(summary.loc["a", "n"], (~np.isnan(result.predicted[:, 0])).sum())
+
+    def test_mask_survives_save_and_load(self):
+        result = run_backtest("live", min_history=4)
+        loaded = BacktestResult.load(result.save(self.tmp / "bt.npz"))
+        np.testing.assert_array_equal(loaded.observed, result.observed)
+        np.testing.assert_array_equal(loaded.summary().to_numpy(), result.summary().to_numpy())
@@ -0,0 +1,31 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase
+
+from diary.benchmarks.suite import isolated_database
+
+
+class IsolatedDatabaseTests(SimpleTestCase):
+    def setUp(self):
+        # Настоящую тестовую БД раннера не трогаем: создание/удаление — заглушки
+        creation = connection.creation
+        for name, value in (("create_test_db", "old.sqlite3"), ("destroy_test_db", None)):
+            patcher = mock.patch.object(creation, name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_restores_test_database_name(self):
+        before = dict(connection.settings_dict["TEST"])
+        with isolated_database() as workdir:
+            self.assertEqual(connection.settings_dict["TEST"]["NAME"], str(workdir / "bench.sqlite3"))
+        self.assertEqual(connection.settings_dict["TEST"], before)
+
+    def test_restores_name_when_creation_fails(self):
+        before = dict(connection.settings_dict["TEST"])
+        connection.creation.create_test_db.side_effect = RuntimeError("нет места")
+        with self.assertRaises(RuntimeError):
+            with isolated_database():
+                pass
+        self.assertEqual(connection.settings_dict["TEST"], before)
+        connection.creation.destroy_test_db.assert_not_called()
@@ -0,0 +1,32 @@
+from django.test import TestCase
+
+from diary.catalog import get_catalog
+from diary.data_version import bump_data_version
+from diary.models import Parameter
+
+from .utils import IsolatedDiaryMixin, make_parameters, write_days
+
+
+class CatalogCacheTests(IsolatedDiaryMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        make_parameters("a", "b")
+
+    def test_value_writes_keep_cached_catalog(self):
+        catalog = get_catalog()
+        write_days({"2024-01-01": {"a": 1, "b": 2}})
+        write_days({"2024-01-01": {"a": None}})
+        self.assertIs(get_catalog(), catalog)
+
+    def test_parameter_change_rebuilds_catalog(self):
+        catalog = get_catalog()
+        Parameter.objects.create(key="c", name_ru="C")
+        self.assertIsNot(get_catalog(), catalog)
+        self.assertIn("c", get_catalog().by_key)
+
+    def test_parameter_change_from_another_process_is_seen(self):
+        get_catalog()
+        # Другой воркер: его сигнал поднял версию, но не сбросил наш кэш
+        Parameter.objects.filter(key="a").update(name_ru="Новое имя")
+        bump_data_version(parameters=True)
+        self.assertEqual(get_catalog().by_key["a"].name_ru, "Новое имя")
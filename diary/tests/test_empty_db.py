@@ -0,0 +1,26 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from diary.ml_utils.utils import get_diary_dataframe
+
+from .utils import IsolatedDiaryMixin, make_parameters
+
+
+class EmptyDiaryTests(IsolatedDiaryMixin, TestCase):
+    """Свежая БД без значений: страницы и команды не падают."""
+
+    def test_dataframe_is_empty(self):
+        make_parameters("a", "b")
+        df = get_diary_dataframe()
+        self.assertTrue(df.empty)
+        self.assertEqual(list(df.columns), ["date"])
+
+    def test_diary_page(self):
+        self.assertEqual(self.client.get(reverse("diary:add_entry")).status_code, 200)
+
+    def test_train_models_and_backtest(self):
+        call_command("train_models", stdout=StringIO())
+        call_command("backtest", "--output", str(self.tmp / "bt.npz"), stdout=StringIO())
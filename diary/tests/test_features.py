@@ -0,0 +1,57 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from diary.ml_utils.features import FeatureSpec, expand_features
+
+SPEC = FeatureSpec(lags=(1, 2), windows=(3, 7))
+
+
+def _naive(df: pd.DataFrame, days, spec: FeatureSpec) -> pd.DataFrame:
+    """Лаги/средние через `shift` / `rolling` по календарю, пропуски — NaN."""
+    keys = [c for c in df.columns if c != "date"]
+    index = pd.date_range(min(df["date"]), max(max(df["date"]), max(days)))
+    full = df.set_index(pd.to_datetime(df["date"]))[keys].reindex(index)
+    columns = {}
+    for k in spec.lags:
+        for key in keys:
+            columns[f"{key}__lag{k}"] = full[key].shift(k).fillna(0.0)
+    for w in spec.windows:
+        for key in keys:
+            # rolling пропускает NaN-дни; shift(1) — без текущего дня
+            columns[f"{key}__mean{w}"] = full[key].rolling(w, min_periods=1).mean().shift(1).fillna(0.0)
+    return pd.DataFrame(columns).loc[pd.to_datetime(list(days))]
+
+
+class CalendarFeaturesTests(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        start = date(2024, 1, 1)
+        recorded = sorted(rng.choice(60, size=35, replace=False).tolist())
+        self.df = pd.DataFrame({
+            "date": [start + timedelta(days=int(i)) for i in recorded],
+            "a": rng.integers(0, 6, size=len(recorded)).astype(float),
+            "b": rng.integers(0, 6, size=len(recorded)).astype(float),
+        })
+
+    def test_rows_match_naive_shift_and_rolling(self):
+        matrix = expand_features(self.df, SPEC)
+        expected = _naive(self.df, self.df["date"], SPEC)
+        names = SPEC.names(["a", "b"])
+        np.testing.assert_allclose(matrix.frame[names].to_numpy(), expected[names].to_numpy())
+
+    def test_history_features_beyond_recorded_days(self):
+        matrix = expand_features(self.df, SPEC)
+        last = max(self.df["date"])
+        for day in (last + timedelta(days=1), last + timedelta(days=4), min(self.df["date"])):
+            expected = _naive(self.df, [day], SPEC).iloc[0]
+            got = matrix.history_features(day)
+            for name, value in expected.items():
+                self.assertAlmostEqual(got[name], value, msg=f"{day} {name}")
+
+    def test_mean_excludes_current_day(self):
+        df = pd.DataFrame({"date": [date(2024, 1, 1), date(2024, 1, 2)], "a": [1.0, 5.0]})
+        frame = expand_features(df, FeatureSpec(lags=(), windows=(3,))).frame
+        self.assertEqual(frame["a__mean3"].tolist(), [0.0, 1.0])
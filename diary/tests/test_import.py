@@ -0,0 +1,56 @@
+from datetime import date
+from unittest import mock
+
+from django.test import TransactionTestCase
+from openpyxl import Workbook
+
+from diary import wide
+from diary.data_version import get_data_version
+from diary.ml_utils import live_stats
+from diary.models import DirtyDate, EntryValue, LiveStats
+from diary.scripts.import_excel_to_db import run_excel_import
+
+from .utils import IsolatedDiaryMixin
+
+
+def write_workbook(path, rows):
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Дата", "Сон", "Боль"])
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+    return path
+
+
+class ExcelImportTests(IsolatedDiaryMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = write_workbook(self.tmp / "diary.xlsx", [
+            [date(2024, 1, 1), 3, 1],
+            [date(2024, 1, 2), 4, None],
+            [date(2024, 1, 3), 2, 5],
+        ])
+
+    def test_failed_chunk_keeps_committed_chunks_invalidated(self):
+        live_stats.rebuild_stats()
+        real_refresh = wide.refresh_rows
+        calls = []
+
+        def refresh(entry_ids):
+            calls.append(entry_ids)
+            if len(calls) == 2:
+                raise RuntimeError("сбой на второй пачке")
+            return real_refresh(entry_ids)
+
+        with mock.patch.object(wide, "refresh_rows", side_effect=refresh):
+            with self.assertRaises(RuntimeError):
+                run_excel_import(self.path, chunk_size=1)
+
+        self.assertEqual(set(EntryValue.objects.values_list("entry__date", flat=True)), {date(2024, 1, 1)})
+        self.assertTrue(LiveStats.objects.get(pk=live_stats._STATS_PK).stale)
+        self.assertEqual(
+            dict(DirtyDate.objects.values_list("date", "version")),
+            {date(2024, 1, 1): get_data_version()},
+        )
+        self.assertEqual(live_stats.check_stats()["ok"], 1.0)
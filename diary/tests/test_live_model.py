@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+from sklearn.linear_model import LinearRegression
+
+from diary.ml_utils.live_model import fit_all
+
+
+def _frame(columns):
+    df = pd.DataFrame(columns)
+    df.insert(0, "date", pd.date_range("2024-01-01", periods=len(df)))
+    return df
+
+
+class FitAllMatchesSklearnTests(SimpleTestCase):
+    def assertMatchesSklearn(self, df, atol=1e-6):
+        system = fit_all(df)
+        X = df[system.features].fillna(0.0)
+        for k, target in enumerate(system.features):
+            others = [c for c in system.features if c != target]
+            model = LinearRegression().fit(X[others], X[target])
+            idx = [system.features.index(c) for c in others]
+            np.testing.assert_allclose(system.coef[idx, k], model.coef_, atol=atol, err_msg=target)
+            self.assertAlmostEqual(system.intercept[k], model.intercept_, delta=atol, msg=target)
+            self.assertEqual(system.coef[k, k], 0.0)
+
+    def test_full_rank(self):
+        rng = np.random.default_rng(0)
+        self.assertMatchesSklearn(_frame({k: rng.uniform(0, 5, 60) for k in "abcde"}))
+
+    def test_missing_values_as_zero(self):
+        rng = np.random.default_rng(1)
+        data = {k: rng.uniform(0, 5, 40) for k in "abcd"}
+        data["b"][rng.random(40) < 0.3] = np.nan
+        self.assertMatchesSklearn(_frame(data))
+
+    def test_collinear_columns(self):
+        rng = np.random.default_rng(2)
+        a, b = rng.uniform(0, 5, 50), rng.uniform(0, 5, 50)
+        self.assertMatchesSklearn(_frame({"a": a, "b": b, "c": a + b, "d": rng.uniform(0, 5, 50)}))
+
+    def test_constant_column_and_more_columns_than_rows(self):
+        rng = np.random.default_rng(3)
+        data = {f"p{i}": rng.uniform(0, 5, 6) for i in range(8)}
+        data["const"] = np.full(6, 2.0)
+        self.assertMatchesSklearn(_frame(data))
@@ -0,0 +1,51 @@
+from datetime import date
+
+from django.test import TransactionTestCase
+from django.db import transaction
+
+from diary.ml_utils import live_stats
+from diary.models import Entry, EntryValue, LiveStats
+
+from .utils import IsolatedDiaryMixin, make_parameters, write_days
+
+
+class RankOneUpdateTests(IsolatedDiaryMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.params = make_parameters("a", "b", "c")
+        write_days({
+            "2024-01-01": {"a": 1, "b": 2, "c": 3},
+            "2024-01-02": {"a": 2, "b": 1},
+            "2024-01-03": {"a": 4, "c": 5},
+            "2024-01-04": {"b": 3, "c": 1},
+        })
+        live_stats.rebuild_stats()
+
+    def _stale(self) -> bool:
+        return LiveStats.objects.get(pk=live_stats._STATS_PK).stale
+
+    def test_save_in_transaction_applies_delta(self):
+        entry = Entry.objects.get(date=date(2024, 1, 2))
+        with transaction.atomic():
+            EntryValue.objects.create(entry=entry, parameter=self.params["c"], value=4)
+        self.assertFalse(self._stale())
+        self.assertEqual(live_stats.check_stats()["ok"], 1.0)
+
+    def test_delete_applies_delta(self):
+        EntryValue.objects.filter(entry__date=date(2024, 1, 1), parameter=self.params["a"]).delete()
+        self.assertFalse(self._stale())
+        self.assertEqual(live_stats.check_stats()["ok"], 1.0)
+
+    def test_plain_save_applies_delta(self):
+        entry = Entry.objects.get(date=date(2024, 1, 4))
+        EntryValue.objects.create(entry=entry, parameter=self.params["a"], value=2)
+        self.assertFalse(self._stale())
+        self.assertEqual(live_stats.check_stats()["ok"], 1.0)
+
+    def test_signal_outside_transaction_marks_stale(self):
+        entry = Entry.objects.get(date=date(2024, 1, 4))
+        live_stats.snapshot_entry(entry.id)
+        EntryValue.objects.filter(entry=entry, parameter=self.params["b"]).update(value=5)
+        live_stats.apply_entry_change(entry.id)
+        self.assertTrue(self._stale())
+        self.assertEqual(live_stats.check_stats()["ok"], 1.0)
@@ -0,0 +1,34 @@
+import logging
+
+from django.test import SimpleTestCase
+
+from diary.log_queue import BackgroundHandler
+
+
+class _Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class BackgroundHandlerTests(SimpleTestCase):
+    def test_close_flushes_queue_and_is_idempotent(self):
+        target = _Collect()
+        handler = BackgroundHandler(target)
+        for i in range(100):
+            handler.handle(logging.makeLogRecord({"msg": "запись %d", "args": (i,)}))
+        handler.close()
+        handler.close()
+        self.assertEqual(len(target.messages), 100)
+
+    def test_restart_after_fork_starts_new_listener(self):
+        target = _Collect()
+        handler = BackgroundHandler(target)
+        handler.listener.stop()  # в дочернем процессе потока слушателя уже нет
+        handler.restart_after_fork()
+        handler.handle(logging.makeLogRecord({"msg": "после fork"}))
+        handler.close()
+        self.assertEqual(target.messages, ["после fork"])
@@ -0,0 +1,57 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from diary import views
+from diary.ml_utils.prediction_cache import PredictionCache, quantize
+
+from .utils import IsolatedDiaryMixin, make_parameters, write_days
+
+
+class PredictionCacheTests(SimpleTestCase):
+    def test_lru_eviction(self):
+        cache = PredictionCache(maxsize=2, ttl=60)
+        cache.put("a", {"x": 1.0})
+        cache.put("b", {"x": 2.0})
+        self.assertEqual(cache.get("a"), {"x": 1.0})  # «a» — самый свежий
+        cache.put("c", {"x": 3.0})
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), {"x": 1.0})
+        self.assertEqual(cache.get("c"), {"x": 3.0})
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_ttl_expiry(self):
+        cache = PredictionCache(maxsize=10, ttl=10)
+        with mock.patch("diary.ml_utils.prediction_cache.time.monotonic", return_value=100.0):
+            cache.put("a", {"x": 1.0})
+        with mock.patch("diary.ml_utils.prediction_cache.time.monotonic", return_value=109.0):
+            self.assertEqual(cache.get("a"), {"x": 1.0})
+        with mock.patch("diary.ml_utils.prediction_cache.time.monotonic", return_value=111.0):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual((cache.stats()["expired"], cache.stats()["size"]), (1, 0))
+
+    def test_quantized_inputs_share_a_key(self):
+        key = lambda values: PredictionCache.make_key("live", 1, quantize(values, 0.1))
+        self.assertEqual(key({"a": 1.04, "b": 2}), key({"b": "2.0", "a": 0.96}))
+        self.assertNotEqual(key({"a": 1.04}), key({"a": 1.06}))
+        self.assertEqual(key({"a": None}), key({"a": "oops"}))
+        self.assertEqual(quantize({"a": 0.30000001}, 0.1), {"a": 0.3})
+
+    def test_returned_value_is_a_copy(self):
+        cache = PredictionCache(maxsize=10, ttl=60)
+        cache.put("a", {"x": 1.0})
+        cache.get("a")["x"] = 5.0
+        self.assertEqual(cache.get("a"), {"x": 1.0})
+
+
+class PredictionCacheVersionTests(IsolatedDiaryMixin, TestCase):
+    def test_data_version_bump_misses_cache(self):
+        make_parameters("a", "b")
+        write_days({"2024-01-01": {"a": 1, "b": 2}})
+        with mock.patch.object(views, "_predict_live", return_value={"a": 1.0}) as predict:
+            views._predict_for_row(None, {"a": 1.02, "b": 2})
+            views._predict_for_row(None, {"a": 0.98, "b": 2})
+            self.assertEqual(predict.call_count, 1)
+            write_days({"2024-01-02": {"a": 3}})
+            views._predict_for_row(None, {"a": 1.0, "b": 2})
+            self.assertEqual(predict.call_count, 2)
@@ -0,0 +1,35 @@
+import threading
+
+from django.test import SimpleTestCase
+
+from diary.ml_utils.registry import ModelRegistry
+from diary.ml_utils.training import train_and_publish
+
+from .test_training import _history
+from .utils import IsolatedDiaryMixin
+
+
+class ModelRegistryTests(IsolatedDiaryMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.model_dir = self.tmp / "models" / "base"
+        self.model_dir.mkdir(parents=True)
+        train_and_publish(_history(), self.model_dir)
+
+    def test_concurrent_lookups_keep_exact_counts(self):
+        registry = ModelRegistry(self.model_dir)
+        threads, rounds = 8, 2000
+
+        def worker():
+            for _ in range(rounds):
+                registry.lookup(["a", "missing"])
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        stats = registry.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (threads * rounds, threads * rounds))
+        self.assertEqual((stats["reloads"], stats["models"]), (1, 3))
@@ -0,0 +1,88 @@
+from datetime import date
+from unittest import mock
+
+import numpy as np
+from django.test import TestCase
+
+from diary import snapshot
+from diary.data_version import get_data_version
+from diary.ml_utils.utils import get_diary_dataframe
+from diary.models import DirtyDate, Entry, EntryValue
+
+from .utils import IsolatedDiaryMixin, make_parameters, write_days
+
+
+class SnapshotRefreshTests(IsolatedDiaryMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.params = make_parameters("a", "b", "c")
+        write_days({f"2024-01-{d:02d}": {"a": d % 6, "b": (d * 2) % 6, "c": None if d % 3 else 1} for d in range(1, 21)})
+
+    def assertMatchesFullBuild(self, snap):
+        dates, values = snapshot._rows_for(None, snap.param_ids)
+        np.testing.assert_array_equal(snap.dates, dates)
+        np.testing.assert_array_equal(snap.missing, np.isnan(values))
+        np.testing.assert_array_equal(snap.values, np.nan_to_num(values))
+
+    def test_incremental_refresh_matches_full_build(self):
+        first = snapshot.get_snapshot()
+        self.assertMatchesFullBuild(first)
+
+        write_days({"2024-01-03": {"a": 5, "b": None}, "2024-02-01": {"c": 4}})
+        entry = Entry.objects.get(date=date(2024, 1, 10))
+        entry.date = date(2024, 3, 1)
+        entry.save()
+        EntryValue.objects.filter(entry__date=date(2024, 1, 5), parameter=self.params["a"]).delete()
+
+        with mock.patch.object(snapshot, "_rows_for", wraps=snapshot._rows_for) as rows_for:
+            second = snapshot.get_snapshot()
+        self.assertGreater(second.version, first.version)
+        self.assertIsNotNone(rows_for.call_args.args[0], "ожидалась инкрементальная сборка")
+        self.assertMatchesFullBuild(second)
+        self.assertFalse(DirtyDate.objects.exists())
+
+    def test_dirty_date_bumped_during_build_survives(self):
+        snapshot.get_snapshot()
+        write_days({"2024-01-02": {"a": 4}})
+
+        real_write = snapshot._write
+
+        def write_with_concurrent_writer(*args, **kwargs):
+            # Параллельный писатель поднимает тот же день до новой версии
+            EntryValue.objects.filter(entry__date=date(2024, 1, 2), parameter=self.params["a"]).update(value=1)
+            snapshot.bump_dirty_dates([date(2024, 1, 2)])
+            return real_write(*args, **kwargs)
+
+        with mock.patch.object(snapshot, "_write", side_effect=write_with_concurrent_writer):
+            snapshot.get_snapshot()
+        self.assertTrue(DirtyDate.objects.filter(date=date(2024, 1, 2)).exists())
+
+        snapshot._opened.clear()
+        self.assertMatchesFullBuild(snapshot.get_snapshot())
+
+    def test_bump_dirty_dates_records_new_version(self):
+        days = [date(2024, 5, 1), date(2024, 5, 2)]
+        version = snapshot.bump_dirty_dates(days)
+        self.assertEqual(dict(DirtyDate.objects.filter(date__in=days).values_list("date", "version")),
+                         {d: version for d in days})
+        self.assertEqual(version, get_data_version())
+
+    def test_dataframe_is_view_of_snapshot(self):
+        make_parameters("empty")
+        write_days({"2023-12-31": {"c": 2}})
+        df = get_diary_dataframe()
+        snap = snapshot.get_snapshot()
+
+        self.assertEqual(list(df.columns), ["date", "c", "a", "b"])
+        self.assertEqual(snap.keys[snap.used:], ["empty"])
+        # Значения — срез mmap, а не копия в памяти процесса
+        self.assertTrue(any(np.shares_memory(block.values, snap.values) for block in df._mgr.blocks))
+        self.assertEqual(df.loc[0, "c"], 2.0)
+        self.assertEqual(df.loc[0, "a"], 0.0)
+
+    def test_dataframe_keeps_decimal_values(self):
+        write_days({"2024-01-01": {"a": 2.3, "b": 4.7}})
+        df = get_diary_dataframe()
+        row = df[df["date"] == date(2024, 1, 1)].iloc[0]
+        self.assertEqual(df["a"].dtype, np.float64)
+        self.assertEqual((row["a"], row["b"]), (2.3, 4.7))
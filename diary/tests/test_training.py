@@ -0,0 +1,74 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from diary.ml_utils.registry import read_manifest
+from diary.ml_utils.training import train_and_publish
+
+from .utils import IsolatedDiaryMixin
+
+
+def _history(days: int = 40, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    start = date(2024, 1, 1)
+    df = pd.DataFrame(rng.integers(0, 6, size=(days, 3)).astype(float), columns=["a", "b", "c"])
+    df.insert(0, "date", [start + timedelta(days=i) for i in range(days)])
+    return df
+
+
+class TrainAndPublishTests(IsolatedDiaryMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.model_dir = self.tmp / "models" / "base"
+        self.model_dir.mkdir(parents=True)
+
+    def test_empty_history_publishes_empty_version(self):
+        df = pd.DataFrame({"date": pd.Series([], dtype=object)})
+        version, models = train_and_publish(df, self.model_dir, targets=[])
+        self.assertEqual(models, {})
+        self.assertEqual(read_manifest(self.model_dir)["version"], version)
+
+        again, _ = train_and_publish(df, self.model_dir, targets=[])
+        self.assertEqual(again, version)
+
+    def test_unchanged_data_reuses_published_version(self):
+        df = _history()
+        version, models = train_and_publish(df, self.model_dir)
+        self.assertEqual(sorted(models), ["a", "b", "c"])
+
+        again, reused = train_and_publish(df, self.model_dir)
+        self.assertEqual(again, version)
+        self.assertEqual(reused, models)
+
+    def test_changed_target_retrains_only_what_changed(self):
+        df = _history()
+        train_and_publish(df, self.model_dir)
+
+        changed = df.copy()
+        changed.loc[5, "a"] = 5.0 if changed.loc[5, "a"] != 5.0 else 0.0
+        version, _ = train_and_publish(changed, self.model_dir)
+        manifest = read_manifest(self.model_dir)
+        self.assertEqual(manifest["version"], version)
+        # «a» — признак остальных целей, поэтому переобучаются все три
+        self.assertEqual(manifest["reused"], [])
+
+    def test_force_retrains_everything(self):
+        df = _history()
+        first, _ = train_and_publish(df, self.model_dir)
+        second, _ = train_and_publish(df, self.model_dir, force=True)
+        self.assertNotEqual(first, second)
+        self.assertEqual(read_manifest(self.model_dir)["reused"], [])
+
+    def test_missing_model_file_retrains_only_that_target(self):
+        df = _history()
+        train_and_publish(df, self.model_dir)
+        manifest = read_manifest(self.model_dir)
+        (self.model_dir / manifest["path"] / manifest["models"]["b"]).unlink()
+
+        version, models = train_and_publish(df, self.model_dir)
+        manifest = read_manifest(self.model_dir)
+        self.assertEqual(manifest["version"], version)
+        self.assertEqual(manifest["reused"], ["a", "c"])
+        self.assertEqual(sorted(models), ["a", "b", "c"])
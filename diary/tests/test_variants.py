@@ -0,0 +1,57 @@
+from datetime import date, timedelta
+
+import numpy as np
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from diary.ml_utils.features import flag_name
+from diary.ml_utils.registry import get_registry
+
+from .utils import IsolatedDiaryMixin, make_parameters, write_days
+
+
+class VariantTrainAndPredictTests(IsolatedDiaryMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        make_parameters("a", "b", "c")
+        rng = np.random.default_rng(0)
+        start = date(2024, 1, 1)
+        write_days({
+            (start + timedelta(days=i)).isoformat(): {k: int(v) for k, v in zip("abc", rng.integers(0, 6, size=3))}
+            for i in range(40)
+        })
+
+    def _train_and_predict(self, variant):
+        call_command("train_models", model=variant)
+        response = self.client.post(
+            f"{reverse('diary:predict_today')}?model={variant}",
+            data={"a": 2, "b": 0, "c": 4},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual(sorted(payload), ["a", "b", "c"])
+        for key, item in payload.items():
+            self.assertTrue(np.isfinite(item["base"]), key)
+        return get_registry(variant).models()
+
+    def test_flags_variant(self):
+        models = self._train_and_predict("flags")
+        features = set(models["a"].feature_names_in_)
+        self.assertIn(flag_name("b"), features)
+        self.assertNotIn("b", features)
+        self.assertNotIn(flag_name("a"), features)
+
+    def test_hybrid_variant(self):
+        models = self._train_and_predict("hybrid")
+        features = set(models["a"].feature_names_in_)
+        self.assertTrue({"b", flag_name("b")} <= features)
+        self.assertNotIn(flag_name("a"), features)
+
+    def test_metrics_report_every_variant_registry(self):
+        self._train_and_predict("flags")
+        registries = self.client.get(reverse("diary:prediction_cache")).json()["registry"]
+        self.assertEqual(sorted(registries), ["base", "flags", "hybrid"])
+        self.assertEqual(registries["flags"]["models"], 3)
+        self.assertEqual(registries["base"]["models"], 0)
@@ -0,0 +1,108 @@
+import json
+from concurrent.futures import Future
+from datetime import date
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import OperationalError
+from django.test import AsyncRequestFactory, Client, RequestFactory, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from diary.models import EntryValue, TrainingJob
+from diary.views import update_value
+from diary.views_async import update_value_async
+from diary.write_queue import write_queue
+
+from .utils import IsolatedDiaryMixin, make_parameters
+
+
+class TrainModelsViewTests(IsolatedDiaryMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = Client(enforce_csrf_checks=True)
+        self.url = reverse("diary:train_models")
+        self.token = "x" * 32
+        self.client.cookies["csrftoken"] = self.token
+        patcher = mock.patch("diary.views.enqueue_training", return_value=(TrainingJob(pk=7), True))
+        self.enqueue = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_does_not_start_training(self):
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        self.enqueue.assert_not_called()
+
+    def test_post_without_csrf_token_is_rejected(self):
+        self.assertEqual(self.client.post(self.url).status_code, 403)
+        self.enqueue.assert_not_called()
+
+    def test_post_with_csrf_token_enqueues(self):
+        response = self.client.post(self.url, HTTP_X_CSRFTOKEN=self.token, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["id"], 7)
+        self.enqueue.assert_called_once()
+
+    def test_form_post_redirects_to_diary(self):
+        response = self.client.post(self.url, {"csrfmiddlewaretoken": self.token}, HTTP_ACCEPT="text/html")
+        self.assertRedirects(response, f"{reverse('diary:add_entry')}?job=7", fetch_redirect_response=False)
+
+
+class UpdateValueViewTests(IsolatedDiaryMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        make_parameters("a")
+        self.factory = RequestFactory()
+        self.async_factory = AsyncRequestFactory()
+        self.body = json.dumps({"date": "2024-01-01", "parameter": "a", "value": 3})
+
+    def _post(self, factory, body):
+        return factory.post("/update-value/", data=body, content_type="application/json")
+
+    def _stored(self):
+        return list(EntryValue.objects.values_list("entry__date", "parameter__key", "value"))
+
+    def test_non_object_body_is_rejected(self):
+        self.assertEqual(update_value(self._post(self.factory, "[1, 2]")).status_code, 400)
+        response = async_to_sync(update_value_async)(self._post(self.async_factory, "[1, 2]"))
+        self.assertEqual(response.status_code, 400)
+
+    def test_write_failure_returns_json_error(self):
+        with mock.patch.object(write_queue, "apply", side_effect=OperationalError("disk I/O error")):
+            response = update_value(self._post(self.factory, self.body))
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(json.loads(response.content)["status"], "error")
+
+        with mock.patch.object(write_queue, "apply", side_effect=TimeoutError()):
+            self.assertEqual(update_value(self._post(self.factory, self.body)).status_code, 503)
+
+    @override_settings(DIARY_WRITE_QUEUE=False)
+    async def test_async_write_with_queue_disabled(self):
+        response = await update_value_async(self._post(self.async_factory, self.body))
+        self.assertEqual(response.status_code, 200)
+        stored = await sync_to_async(self._stored)()
+        self.assertEqual(stored, [(date(2024, 1, 1), "a", 3.0)])
+
+    @override_settings(DIARY_WRITE_QUEUE=True, DIARY_WRITE_QUEUE_TIMEOUT=0.05)
+    async def test_async_write_times_out(self):
+        pending = Future()
+        with mock.patch.object(write_queue, "submit", return_value=pending):
+            response = await update_value_async(self._post(self.async_factory, self.body))
+        self.assertEqual(response.status_code, 503)
+        self.assertTrue(pending.cancelled())
+
+    async def test_async_write_failure_returns_json_error(self):
+        with mock.patch.object(write_queue, "aapply", side_effect=OperationalError("disk I/O error")):
+            response = await update_value_async(self._post(self.async_factory, self.body))
+        self.assertEqual(response.status_code, 500)
+
+
+class UpdateValuesViewTests(IsolatedDiaryMixin, TestCase):
+    @override_settings(DIARY_MAX_BATCH_OPS=2)
+    def test_oversize_batch_is_rejected(self):
+        operations = [{"date": "2024-01-01", "parameter": "a", "value": 1}] * 3
+        with mock.patch.object(write_queue, "apply") as apply:
+            response = self.client.post(
+                reverse("diary:update_values"), data={"operations": operations}, content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 400)
+        apply.assert_not_called()
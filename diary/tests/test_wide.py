@@ -0,0 +1,69 @@
+from datetime import date
+from unittest import mock
+
+from django.test import TransactionTestCase
+
+from diary import wide
+from diary.models import Entry, EntryRow, EntryValue, Parameter
+from diary.scripts.import_excel_to_db import run_excel_import
+
+from .test_import import write_workbook
+from .utils import IsolatedDiaryMixin, make_parameters, write_days
+
+
+class WideRowsConsistencyTests(IsolatedDiaryMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.params = make_parameters("a", "b")
+        write_days({
+            "2024-01-01": {"a": 1, "b": 2},
+            "2024-01-02": {"a": 3},
+        })
+
+    def assertConsistent(self):
+        report = wide.check()
+        self.assertEqual((report["mismatched"], report["extra"], report["missing"]), (0, 0, 0), report)
+
+    def test_bulk_upsert(self):
+        self.assertConsistent()
+        write_days({"2024-01-02": {"a": None, "b": 4}, "2024-01-03": {"a": 5}})
+        self.assertConsistent()
+
+    def test_save(self):
+        entry = Entry.objects.get(date=date(2024, 1, 2))
+        EntryValue.objects.create(entry=entry, parameter=self.params["b"], value=1)
+        value = EntryValue.objects.get(entry=entry, parameter=self.params["a"])
+        value.value = 0
+        value.save()
+        self.assertConsistent()
+
+    def test_delete(self):
+        EntryValue.objects.filter(entry__date=date(2024, 1, 1), parameter=self.params["a"]).delete()
+        self.assertConsistent()
+        Entry.objects.filter(date=date(2024, 1, 2)).delete()
+        self.assertConsistent()
+        self.assertFalse(EntryRow.objects.filter(date=date(2024, 1, 2)).exists())
+
+    def test_entry_date_move(self):
+        entry = Entry.objects.get(date=date(2024, 1, 2))
+        entry.date = date(2024, 2, 1)
+        entry.save()
+        self.assertConsistent()
+        self.assertEqual(EntryRow.objects.get(entry=entry).date, date(2024, 2, 1))
+
+    def test_excel_import(self):
+        Parameter.objects.create(key="sleep", name_ru="Сон")
+        path = write_workbook(self.tmp / "diary.xlsx", [
+            [date(2024, 1, 2), 4, None],
+            [date(2024, 1, 5), 2, 5],
+        ])
+        run_excel_import(path, chunk_size=1)
+        self.assertConsistent()
+
+    def test_failed_refresh_rolls_back_save(self):
+        entry = Entry.objects.get(date=date(2024, 1, 2))
+        with mock.patch.object(wide, "refresh_rows", side_effect=RuntimeError("сбой пересчёта")):
+            with self.assertRaises(RuntimeError):
+                EntryValue.objects.create(entry=entry, parameter=self.params["b"], value=1)
+        self.assertFalse(EntryValue.objects.filter(entry=entry, parameter=self.params["b"]).exists())
+        self.assertConsistent()
@@ -0,0 +1,107 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.test.utils import override_settings
+
+from diary.write_queue import WriteQueue
+
+
+def _op(parameter, value=1):
+    return {"date": "2024-01-01", "parameter": parameter, "value": value}
+
+
+def _statuses(operations):
+    return [{"index": i, "status": "ok", "parameter": op["parameter"]} for i, op in enumerate(operations)]
+
+
+@override_settings(DIARY_WRITE_QUEUE=True, DIARY_WRITE_QUEUE_LINGER_MS=20, DIARY_WRITE_QUEUE_TIMEOUT=5)
+class WriteQueueTests(SimpleTestCase):
+    def setUp(self):
+        self.queue = WriteQueue()
+        self.addCleanup(self.queue.stop)
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.calls = []
+        patcher = mock.patch("diary.write_queue.apply_value_operations", side_effect=self._apply)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.release.set)
+        self.fail_calls = {}
+
+    def _apply(self, operations):
+        self.calls.append([op["parameter"] for op in operations])
+        self.started.set()
+        self.release.wait(5)
+        if len(self.calls) in self.fail_calls:
+            raise self.fail_calls[len(self.calls)]
+        return _statuses(operations)
+
+    def _block_writer(self):
+        """Первый пакет занимает поток, пока тест не отпустит `release`."""
+        first = self.queue.submit([_op("first")])
+        self.assertTrue(self.started.wait(5))
+        return first
+
+    def test_batches_are_merged_and_results_split(self):
+        first = self._block_writer()
+        second = self.queue.submit([_op("a"), _op("b")])
+        third = self.queue.submit([_op("c")])
+        self.release.set()
+
+        self.assertEqual(first.result(5), [{"index": 0, "status": "ok", "parameter": "first"}])
+        self.assertEqual(second.result(5), [
+            {"index": 0, "status": "ok", "parameter": "a"},
+            {"index": 1, "status": "ok", "parameter": "b"},
+        ])
+        self.assertEqual(third.result(5), [{"index": 0, "status": "ok", "parameter": "c"}])
+        self.assertEqual(self.calls, [["first"], ["a", "b", "c"]])
+
+    def test_cancelled_future_is_skipped(self):
+        first = self._block_writer()
+        cancelled = self.queue.submit([_op("a")])
+        self.assertTrue(cancelled.cancel())
+        self.release.set()
+
+        first.result(5)
+        self.assertEqual(self.queue.apply([_op("b")])[0]["parameter"], "b")
+        self.assertEqual(self.calls, [["first"], ["b"]])
+
+    def test_write_error_reaches_every_batch_and_thread_survives(self):
+        error = RuntimeError("database is locked")
+        self.fail_calls[2] = error
+        first = self._block_writer()
+        second = self.queue.submit([_op("a")])
+        third = self.queue.submit([_op("b")])
+        self.release.set()
+
+        self.assertEqual(len(first.result(5)), 1)
+        self.assertIs(second.exception(5), error)
+        self.assertIs(third.exception(5), error)
+        self.assertEqual(self.queue.apply([_op("c")])[0]["parameter"], "c")
+        self.assertEqual(self.calls, [["first"], ["a", "b"], ["c"]])
+
+    def test_writer_failure_outside_write_fails_batch(self):
+        self.release.set()
+        real_flush = self.queue._flush
+        flushes = []
+
+        def flush(batch):
+            flushes.append(batch)
+            if len(flushes) == 1:
+                raise RuntimeError("сбой потока")
+            real_flush(batch)
+
+        with mock.patch.object(self.queue, "_flush", side_effect=flush):
+            failed = self.queue.submit([_op("a")])
+            self.assertIsInstance(failed.exception(5), RuntimeError)
+            self.assertEqual(self.queue.apply([_op("b")])[0]["parameter"], "b")
+
+    @override_settings(DIARY_WRITE_QUEUE_TIMEOUT=0.05)
+    def test_apply_times_out(self):
+        self._block_writer()
+        with self.assertRaises(TimeoutError):
+            self.queue.apply([_op("a")])
+        self.release.set()
+        self.assertEqual(self.queue.apply([_op("b")])[0]["parameter"], "b")
+        self.assertEqual(self.calls, [["first"], ["b"]])
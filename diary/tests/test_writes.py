@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+
+from django.test import TestCase
+
+from diary import wide
+from diary.models import EntryValue
+from diary.writes import apply_value_operations
+
+from .utils import IsolatedDiaryMixin, make_parameters
+
+
+class ApplyValueOperationsTests(IsolatedDiaryMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.params = make_parameters("a", "b")
+
+    def test_statuses_and_coalescing(self):
+        results = apply_value_operations([
+            {"date": "2024-01-01", "parameter": "a", "value": 1},
+            {"date": "2024-01-01", "parameter": "b", "value": 2},
+            {"date": "2024-01-01", "parameter": "a", "value": 3},
+            {"date": "2024-01-01", "parameter": "zzz", "value": 1},
+            {"parameter": "a"},
+            "not an object",
+        ])
+        self.assertEqual(
+            [r["status"] for r in results],
+            ["coalesced", "ok", "ok", "error", "deleted", "error"],
+        )
+        self.assertEqual([r["index"] for r in results], list(range(6)))
+        self.assertEqual(
+            dict(EntryValue.objects.filter(entry__date=date(2024, 1, 1)).values_list("parameter__key", "value")),
+            {"a": 3.0, "b": 2.0},
+        )
+        self.assertEqual(wide.check()["mismatched"], 0)
+
+    def test_null_deletes(self):
+        apply_value_operations([{"date": "2024-01-01", "parameter": "a", "value": 1}])
+        results = apply_value_operations([{"date": "2024-01-01", "parameter": "a", "value": None}])
+        self.assertEqual(results[0]["status"], "deleted")
+        self.assertFalse(EntryValue.objects.exists())
+
+    def test_rejects_non_finite_and_out_of_range(self):
+        raw = ["nan", "inf", float("-inf"), -0.5, 5.5, "abc"]
+        results = apply_value_operations([{"date": "2024-01-01", "parameter": "a", "value": v} for v in raw])
+        self.assertEqual({r["status"] for r in results}, {"error"})
+        self.assertFalse(EntryValue.objects.exists())
+
+    def test_accepts_scale_bounds(self):
+        results = apply_value_operations([
+            {"date": "2024-01-01", "parameter": "a", "value": 0},
+            {"date": "2024-01-01", "parameter": "b", "value": "5"},
+        ])
+        self.assertEqual([r["status"] for r in results], ["ok", "ok"])
+
+    def test_large_delete_batch(self):
+        # > 1000 пар: одно OR-выражение упиралось в глубину дерева SQLite
+        days = [(date(2020, 1, 1) + timedelta(days=i)).isoformat() for i in range(520)]
+        ops = [{"date": d, "parameter": key, "value": 1} for d in days for key in ("a", "b")]
+        apply_value_operations(ops)
+        results = apply_value_operations([{**op, "value": None} for op in ops])
+        self.assertEqual({r["status"] for r in results}, {"deleted"})
+        self.assertFalse(EntryValue.objects.exists())
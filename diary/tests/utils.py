@@ -0,0 +1,64 @@
+# diary/tests/utils.py
+"""Общее для тестов: временные каталоги и чистые кэши процесса.
+
+Кэши дневника (DataFrame, справочник, снапшот, признаки, live-система,
+прогнозы) привязаны к версии данных. Между тестами БД откатывается,
+и номера версий повторяются. Поэтому кэши сбрасываются до и после
+каждого теста, а снапшоты, модели и выгрузки пишутся во временный каталог.
+"""
+from __future__ import annotations
+
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable
+
+from django.test.utils import override_settings
+
+from diary import catalog, snapshot
+from diary.ml_utils import features, live_stats, utils
+from diary.ml_utils.prediction_cache import prediction_cache
+from diary.models import Parameter
+from diary.writes import apply_value_operations
+
+
+def reset_caches() -> None:
+    utils._frame_cache.clear()
+    snapshot._opened.clear()
+    catalog.invalidate()
+    features._cache.clear()
+    live_stats._system_cache.clear()
+    prediction_cache.clear()
+
+
+class IsolatedDiaryMixin:
+    """Временные `DIARY_*_DIR` и сброс кэшей вокруг каждого теста."""
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = Path(tempfile.mkdtemp(prefix="diary-test-"))
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        override = override_settings(
+            DIARY_BASE_MODEL_DIR=self.tmp / "models" / "base",
+            DIARY_SNAPSHOT_DIR=self.tmp / "snapshots",
+            DIARY_EXCEL_EXPORT_PATH=self.tmp / "debug_diary_dataframe.xlsx",
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        reset_caches()
+        self.addCleanup(reset_caches)
+
+
+def make_parameters(*keys: str) -> Dict[str, Parameter]:
+    return {key: Parameter.objects.create(key=key, name_ru=key.upper()) for key in keys}
+
+
+def write_days(rows: Dict[str, Dict[str, float | None]]) -> None:
+    """`{"2024-01-01": {"a": 1, "b": None}, ...}` одним пакетом `apply_value_operations`."""
+    operations: Iterable = (
+        {"date": day, "parameter": key, "value": value}
+        for day, values in rows.items()
+        for key, value in values.items()
+    )
+    results = apply_value_operations(list(operations))
+    assert all(r["status"] != "error" for r in results), results
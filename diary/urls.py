@@ -3,11 +3,19 @@
 
 • `/` и `/add/` ведут на одну и ту же страницу ввода.
 • Остальные — AJAX/REST-эндпоинты.
+• При `DIARY_ASYNC_VIEWS` прогноз и запись значения обслуживают
+  async-вьюхи (`diary.views_async`) — для запуска под ASGI.
 """
+from django.conf import settings
 from django.urls import path
 
 from . import views
 
+if getattr(settings, "DIARY_ASYNC_VIEWS", False):
+    from .views_async import predict_today_async as predict_view, update_value_async as update_view
+else:
+    predict_view, update_view = views.predict_today, views.update_value
+
 app_name = "diary"
 
 urlpatterns = [
@@ -16,12 +24,19 @@ urlpatterns = [
     path("add/", views.add_entry, name="add_entry_alias"),
 
     # API-эндпоинты
-    path("predict/", views.predict_today, name="predict_today"),
-    path("update-value/", views.update_value, name="update_value"),
+    path("predict/", predict_view, name="predict_today"),
+    path("update-value/", update_view, name="update_value"),
+    path("update-values/", views.update_values, name="update_values"),
+    path("export/", views.export_matrix, name="export_matrix"),
 
     # Редирект после успешного сохранения
     path("success/", views.entry_success, name="entry_success"),
 
     # Обучение моделей
     path("train-models/", views.train_models_view, name="train_models"),
+    path("train-models/status/<int:job_id>/", views.training_status, name="training_status"),
+
+    # Метрики: стадии запросов и кэш прогнозов
+    path("metrics/timings/", views.timings_view, name="timings"),
+    path("metrics/prediction-cache/", views.prediction_cache_view, name="prediction_cache"),
 ]
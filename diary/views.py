@@ -2,23 +2,32 @@ from __future__ import annotations
 
 import json
 import logging
-import os
 from datetime import date, datetime
 from typing import Any, Dict
 
-import joblib
 import numpy as np
 import pandas as pd
 from django.conf import settings
-from django.http import JsonResponse, HttpResponseRedirect
+from django.http import JsonResponse, HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import render
 from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 
+from . import exports, instrumentation
+from .catalog import get_catalog
+from .data_version import get_data_version
 from .forms import EntryForm
-from .models import Entry, EntryValue, Parameter
-from .ml_utils import base_model
+from .instrumentation import stage
+from .jobs import enqueue_training, job_status
+from .models import Entry, TrainingJob
+from .write_queue import write_queue
+from .ml_utils import live_stats
+from .ml_utils.features import get_feature_matrix, presence_flags
+from .ml_utils.live_model import LinearSystem
+from .ml_utils.prediction_cache import prediction_cache, quantize
+from .ml_utils.registry import get_registry
+from .ml_utils.variants import VARIANTS, ModelVariant, get_variant
 from .ml_utils.utils import get_diary_dataframe
 
 logger = logging.getLogger(__name__)
@@ -31,42 +40,114 @@ def _color_hint(diff: float) -> str:
         return "yellow"
     return "red"
 
-def _predict_for_row(
+def _safe_float(value: Any) -> float:
+    return float(value) if value not in [None, "", "None"] else 0.0
+
+def _predict_system(
+    system: LinearSystem,
+    today_values: Dict[str, float],
+    targets,
+) -> Dict[str, float]:
+    """Все прогнозы дня одним умножением вектора на матрицу весов."""
+    x_today = np.array([_safe_float(today_values.get(f)) for f in system.features])
+    preds = system.predict(x_today)
+    index = {f: i for i, f in enumerate(system.features)}
+    return {t: round(float(preds[index[t]]), 2) for t in targets if t in index}
+
+def _predict_live(today_values: Dict[str, float]) -> Dict[str, float]:
+    """Все «живые» прогнозы из накопленных статистик (см. `live_stats`)."""
+    try:
+        return _predict_system(live_stats.get_live_system(), today_values, today_values.keys())
+    except Exception:
+        logger.exception("Prediction failed (live mode)")
+        return {}
+
+def _predict_base(
     df: pd.DataFrame,
     today_values: Dict[str, float],
-    mode: str = "live",
+    history: Dict[str, float] | None = None,
+    variant: ModelVariant | None = None,
 ) -> Dict[str, float]:
-    predictions: Dict[str, float] = {}
-    model_dir = os.path.join(settings.BASE_DIR, "diary", "trained_models", "base")
+    """Прогнозы базовых моделей; линейные — одной матрицей из реестра.
 
-    for target in today_values.keys():
+    `history` — лаги и скользящие средние дня (`features.history_features`).
+    Это дополнительные входы, а не цели. Для вариантов с флагами
+    к входам добавляются `*_есть` по значениям дня.
+    """
+    variant = variant or get_variant()
+    targets = list(today_values.keys())
+    inputs = {**today_values, **(history or {})}
+    if variant.flags:
+        inputs.update(presence_flags(today_values))
+    models_registry = get_registry(variant.name)
+    models = models_registry.lookup(targets)
+    for target in targets:
+        if target not in models:
+            logger.warning("Базовая модель %s.pkl не найдена", target)
+
+    system = models_registry.system()
+    if system is not None:
+        try:
+            return _predict_system(system, inputs, [t for t in targets if t in models])
+        except Exception:
+            logger.exception("Prediction failed (base mode)")
+            return {}
+    return _predict_base_per_model(df, inputs, models)
+
+def _predict_base_per_model(
+    df: pd.DataFrame,
+    today_values: Dict[str, float],
+    models: Dict[str, Any],
+) -> Dict[str, float]:
+    """Запасной путь: по одной модели на цель (нелинейные / без имён признаков)."""
+    predictions: Dict[str, float] = {}
+    for target, model in models.items():
         try:
-            if mode == "live":
-                model_info = base_model.train_model(df.copy(), target=target, exclude=[target])
-                model = model_info.get("model")
-                features = model_info.get("features", getattr(model, "feature_names_in_", []))
-            else:
-                model_path = os.path.join(model_dir, f"{target}.pkl")
-                if not os.path.exists(model_path):
-                    logger.warning("Базовая модель %s.pkl не найдена", target)
-                    continue
-                model = joblib.load(model_path)
-                features = getattr(model, "feature_names_in_", [])
+            features = getattr(model, "feature_names_in_", [])
 
             if isinstance(features, (pd.Index, np.ndarray)):
                 features = features.tolist()
             if not features:
                 features = [c for c in df.columns if c not in ("date", target)]
 
-            safe_today = {
-                f: float(today_values.get(f)) if today_values.get(f) not in [None, "", "None"] else 0.0
-                for f in features
-            }
+            safe_today = {f: _safe_float(today_values.get(f)) for f in features}
             X_today = pd.DataFrame([safe_today])
             pred_val = float(model.predict(X_today)[0])
             predictions[target] = round(pred_val, 2)
         except Exception:
-            logger.exception("Prediction failed for %s (%s mode)", target, mode)
+            logger.exception("Prediction failed for %s (base mode)", target)
+    return predictions
+
+def _predict_for_row(
+    df: pd.DataFrame,
+    today_values: Dict[str, float],
+    mode: str = "live",
+    day: date | None = None,
+    variant: ModelVariant | None = None,
+) -> Dict[str, float]:
+    """Прогнозы для строки через LRU-кэш (см. `prediction_cache`).
+
+    Base-модели получают ещё и признаки истории за `day` (по умолчанию — сегодня);
+    `variant` — вариант базовой модели (по умолчанию `DIARY_MODEL_VARIANT`).
+    """
+    values = quantize(today_values, prediction_cache.step())
+    if mode == "live":
+        version = get_data_version()
+    else:
+        day = day or date.today()
+        variant = variant or get_variant()
+        version = (get_data_version(), variant.name, get_registry(variant.name).stamp, day)
+    key = prediction_cache.make_key(mode, version, values)
+    cached = prediction_cache.get(key)
+    if cached is not None:
+        return cached
+
+    if mode == "live":
+        predictions = _predict_live(values)
+    else:
+        predictions = _predict_base(df, values, get_feature_matrix().history_features(day), variant)
+    if predictions:
+        prediction_cache.put(key, predictions)
     return predictions
 
 def _build_pred_dict(
@@ -91,49 +172,47 @@ def add_entry(request):
     except ValueError:
         entry_date = date.today()
         logger.debug("Invalid date '%s' - fallback to today", date_str)
+    try:
+        variant = get_variant(request.GET.get("model"))
+    except ValueError as exc:
+        variant = get_variant()
+        logger.warning("⚠️ %s — используется %s", exc, variant.name)
 
     entry, _ = Entry.objects.get_or_create(date=entry_date)
-    form = EntryForm(request.POST or None, instance=entry)
+    # Справочник и значения дня читаются один раз — и для формы, и для прогнозов
+    catalog = get_catalog()
+    entry_values = catalog.entry_values(entry.pk)
+    with stage("form"):
+        form = EntryForm(request.POST or None, instance=entry, catalog=catalog, values=entry_values)
 
     if request.method == "POST" and form.is_valid():
-        for key, val in form.cleaned_data.items():
-            if key in ("csrfmiddlewaretoken", "comment"):
-                if key == "comment":
-                    entry.comment = val
-                    entry.save()
-                    logger.debug("💬 Updated comment: %s", val)
-                continue
-            try:
-                param = Parameter.objects.get(key=key)
-                if val in (None, ""):
-                    EntryValue.objects.filter(entry=entry, parameter=param).delete()
-                    logger.debug("🗑️ Удалено значение для параметра %s", param)
-                else:
-                    ev, created = EntryValue.objects.update_or_create(
-                        entry=entry,
-                        parameter=param,
-                        defaults={"value": val},
-                    )
-                    logger.debug("✅ EntryValue %s: %s", "создан" if created else "обновлён", ev)
-            except Parameter.DoesNotExist:
-                logger.error("❌ Parameter with key '%s' not found", key)
+        with stage("write"):
+            data = dict(form.cleaned_data)
+            if "comment" in data:
+                entry.comment = data.pop("comment")
+                entry.save()
+                logger.debug("💬 Updated comment: %s", entry.comment)
+            operations = [
+                {"date": entry_date.isoformat(), "parameter": key, "value": None if val in (None, "") else val}
+                for key, val in data.items() if key in catalog.by_key
+            ]
+            if operations:
+                write_queue.apply(operations)
         return HttpResponseRedirect(reverse("diary:add_entry"))
 
-    df = get_diary_dataframe().copy()
+    with stage("dataframe"):
+        df = get_diary_dataframe()
     logger.debug("📅 Получен запрос на отображение страницы за дату: %s", entry_date)
-    values_qs = EntryValue.objects.filter(entry=entry).select_related("parameter")
-    logger.debug("📥 Загружаем значения EntryValue для этой даты...")
-    logger.debug("📦 Найдено параметров: %d", len(values_qs))
-    for ev in values_qs:
-        logger.debug("🔢 Параметр %s = %s", ev.parameter.key, ev.value)
-    all_keys = [p.key for p in Parameter.objects.filter(active=True)]
-    today_values = {k: 0.0 for k in all_keys}
-    today_values.update({ev.parameter.key: ev.value or 0 for ev in values_qs})
+    logger.debug("📦 Найдено параметров: %d", len(entry_values))
+    today_values = {k: 0.0 for k in catalog.active_keys}
+    today_values.update({k: v or 0 for k, v in entry_values.items()})
 
     logger.debug("📤 Значения, переданные в шаблон: %s", today_values)
 
-    live_raw = _predict_for_row(df, today_values, mode="live")
-    base_raw = _predict_for_row(df, today_values, mode="base")
+    with stage("predict_live"):
+        live_raw = _predict_for_row(df, today_values, mode="live")
+    with stage("predict_base"):
+        base_raw = _predict_for_row(df, today_values, mode="base", day=entry_date, variant=variant)
 
     context = {
         "form": form,
@@ -145,47 +224,106 @@ def add_entry(request):
         "live_predictions": _build_pred_dict(live_raw, today_values),
         "base_predictions": _build_pred_dict(base_raw, today_values),
     }
-    return render(request, "diary/add_entry.html", context)
+    with stage("render"):
+        return render(request, "diary/add_entry.html", context)
 
 def entry_success(request):
     return HttpResponseRedirect(reverse("diary:add_entry"))
 
+def _parse_value_update(data: Dict[str, Any]):
+    """(дата, ключ параметра, значение) из тела запроса update_value."""
+    if "date" in data:
+        raw_date = data["date"]
+        logger.debug("📅 Получена дата из POST-запроса: %s", raw_date)
+    else:
+        raw_date = datetime.now().isoformat()
+        logger.warning("⚠️ Дата не передана, используется текущая: %s", raw_date)
+
+    date_obj = datetime.fromisoformat(raw_date.split("T")[0]).date()
+    return date_obj, data.get("parameter"), data.get("value")
+
+def _load_value_update(body: bytes):
+    """Разбор тела update_value; ValueError — на всё, что не объект JSON."""
+    data = json.loads(body)
+    if not isinstance(data, dict):
+        raise ValueError("Ожидается объект {date, parameter, value}")
+    return _parse_value_update(data)
+
+def _write_failed(exc: Exception, view: str) -> JsonResponse:
+    """Ответ на сбой самой записи: 503 при таймауте очереди, иначе 500."""
+    if isinstance(exc, TimeoutError):
+        logger.error("⏱️ %s: очередь записи не ответила вовремя", view)
+        return JsonResponse({"status": "error", "message": "Запись не успела выполниться, повторите"}, status=503)
+    logger.exception("❌ %s: сбой записи", view)
+    return JsonResponse({"status": "error", "message": str(exc)}, status=500)
+
 @csrf_exempt
 @require_POST
 def update_value(request):
     logger.debug("\U0001f680 Вызов функции update_value — старт обработки запроса")
     try:
-        data = json.loads(request.body)
-        if "date" in data:
-            raw_date = data["date"]
-            logger.debug(f"📅 Получена дата из POST-запроса: {raw_date}")
-        else:
-            raw_date = datetime.now().isoformat()
-            logger.warning(f"⚠️ Дата не передана, используется текущая: {raw_date}")
-
-        date_obj = datetime.fromisoformat(raw_date.split("T")[0]).date()
-        param_key = data.get("parameter")  # ← исправлено здесь
-        value = data.get("value")
-
-        entry, _ = Entry.objects.get_or_create(date=date_obj)
-        parameter = Parameter.objects.get(key=param_key)
-
-        if value is None:
-            EntryValue.objects.filter(entry=entry, parameter=parameter).delete()
-            logger.debug("🖑 Удалено значение параметра %s за %s", param_key, date_obj)
-        else:
-            ev, _ = EntryValue.objects.update_or_create(
-                entry=entry,
-                parameter=parameter,
-                defaults={"value": value}
-            )
-            logger.info("Параметр сохраняется в БД. %s=%s for %s", param_key, value, date_obj)
-    except (KeyError, json.JSONDecodeError) as exc:
+        date_obj, param_key, value = _load_value_update(request.body)
+    except (KeyError, ValueError) as exc:
         logger.error("❌ Ошибка в запросе update_value: %s", exc)
         return JsonResponse({"status": "error", "message": str(exc)}, status=400)
 
+    try:
+        with stage("write"):
+            # Через очередь записи: соседние клики уходят одной транзакцией
+            result = write_queue.apply([{"date": date_obj.isoformat(), "parameter": param_key, "value": value}])[0]
+    except Exception as exc:
+        return _write_failed(exc, "update_value")
+
+    if result["status"] == "error":
+        logger.error("❌ Ошибка в запросе update_value: %s", result["message"])
+        return JsonResponse({"status": "error", "message": result["message"]}, status=400)
+    logger.info("Параметр сохраняется в БД. %s=%s for %s", param_key, value, date_obj)
     return JsonResponse({'status': 'ok'})
 
+@csrf_exempt
+@require_POST
+def update_values(request):
+    """Пакетный вариант update_value: список операций в одной транзакции."""
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError as exc:
+        return JsonResponse({"status": "error", "message": str(exc)}, status=400)
+
+    operations = data.get("operations") if isinstance(data, dict) else data
+    if not isinstance(operations, list):
+        return JsonResponse({"status": "error", "message": "Ожидается список operations"}, status=400)
+    limit = getattr(settings, "DIARY_MAX_BATCH_OPS", 2000)
+    if len(operations) > limit:
+        return JsonResponse(
+            {"status": "error", "message": f"Слишком много операций: {len(operations)} > {limit}"}, status=400
+        )
+
+    try:
+        with stage("write"):
+            results = write_queue.apply(operations)
+    except Exception as exc:
+        return _write_failed(exc, "update_values")
+    failed = sum(r["status"] == "error" for r in results)
+    return JsonResponse({"status": "ok" if not failed else "partial", "results": results})
+
+def _predict_payload(user_input: Dict[str, Any], model: str | None = None) -> Dict[str, Dict[str, Any]]:
+    """Ответ predict_today: `{key: {"value": live, "base": base}}`.
+
+    `model` — вариант базовой модели (`?model=base|flags|hybrid`).
+    """
+    variant = get_variant(model)
+    with stage("dataframe"):
+        df = get_diary_dataframe()
+    if df.empty:
+        return {}
+    today_values = {**{k: 0.0 for k in df.columns if k != "date"}, **user_input}
+    with stage("predict_live"):
+        live_raw = _predict_for_row(df, today_values, mode="live")
+    with stage("predict_base"):
+        base_raw = _predict_for_row(df, today_values, mode="base", variant=variant)
+    logger.debug("📤 Итоговые предсказания: %s", live_raw)
+    return {k: {"value": v, "base": base_raw.get(k)} for k, v in live_raw.items()}
+
 @csrf_exempt
 @require_POST
 def predict_today(request):
@@ -196,32 +334,77 @@ def predict_today(request):
         return JsonResponse({"error": "Invalid JSON"}, status=400)
 
     try:
-        df = get_diary_dataframe().copy()
-        if df.empty:
-            return JsonResponse({})
-        today_values = {**{k: 0.0 for k in df.columns if k != "date"}, **user_input}
-        live_raw = _predict_for_row(df, today_values, mode="live")
-        logger.debug(f"📤 Итоговые предсказания: {live_raw}")
-        return JsonResponse({k: {"value": v} for k, v in live_raw.items()})
+        variant = get_variant(request.GET.get("model"))
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    try:
+        return JsonResponse(_predict_payload(user_input, variant.name))
     except Exception as exc:
         logger.exception("predict_today failed")
         return JsonResponse({"error": str(exc)}, status=500)
 
-import subprocess
+def export_matrix(request):
+    """Потоковая выгрузка матрицы «дата × параметр».
+
+    GET-параметры: `format=csv|parquet`, `start` / `end` (YYYY-MM-DD),
+    `params` — ключи параметров через запятую (по умолчанию все активные).
+    """
+    fmt = request.GET.get("format", "csv")
+    try:
+        start = date.fromisoformat(request.GET["start"]) if request.GET.get("start") else None
+        end = date.fromisoformat(request.GET["end"]) if request.GET.get("end") else None
+    except ValueError as exc:
+        return JsonResponse({"error": f"Некорректная дата: {exc}"}, status=400)
+    keys = [k.strip() for k in request.GET.get("params", "").split(",") if k.strip()]
+
+    columns = exports.resolve_columns(keys or None)
+    if not columns:
+        return JsonResponse({"error": "Нет подходящих параметров"}, status=400)
+    rows = exports.iter_matrix_rows(columns, start=start, end=end)
+
+    if fmt == "csv":
+        response = StreamingHttpResponse(exports.stream_csv(columns, rows), content_type="text/csv; charset=utf-8")
+    elif fmt == "parquet":
+        if not exports.parquet_available():
+            return JsonResponse({"error": "Для Parquet нужен пакет pyarrow"}, status=501)
+        response = StreamingHttpResponse(exports.stream_parquet(columns, rows), content_type="application/vnd.apache.parquet")
+    else:
+        return JsonResponse({"error": f"Неизвестный формат: {fmt}"}, status=400)
 
+    response["Content-Disposition"] = f'attachment; filename="diary.{fmt}"'
+    return response
+
+@require_POST
 def train_models_view(request):
+    """Ставит обучение в фоновую очередь и сразу отвечает.
+
+    Только POST с CSRF-токеном: переход по ссылке или prefetch обучение
+    не запускают. JS получает JSON с id задачи и опрашивает
+    `training_status`; обычная отправка формы редиректит на дневник
+    с `?job=<id>`.
+    """
     logger.info("🟡 train_models_view вызван")
+    job, created = enqueue_training()
+    accept = request.headers.get("Accept", "")
+    if "application/json" in accept or "text/html" not in accept:
+        return JsonResponse(job_status(job), status=202 if created else 200)
+    return HttpResponseRedirect(f"{reverse('diary:add_entry')}?job={job.pk}")
+
+def training_status(request, job_id: int):
     try:
-        result = subprocess.run(
-            ["python", "manage.py", "train_models"],
-            check=True,
-            capture_output=True,
-            text=True,
-        )
-        logger.info("🟢 train_models выполнена успешно")
-        logger.debug("STDOUT:\n%s", result.stdout)
-        logger.debug("STDERR:\n%s", result.stderr)
-        return HttpResponseRedirect(reverse("diary:add_entry"))
-    except subprocess.CalledProcessError as exc:
-        logger.exception("train_models_view failed")
-        return JsonResponse({"error": exc.stderr or str(exc)}, status=500)
+        job = TrainingJob.objects.get(pk=job_id)
+    except TrainingJob.DoesNotExist:
+        return JsonResponse({"error": "Задача не найдена"}, status=404)
+    return JsonResponse(job_status(job))
+
+def timings_view(request):
+    """Скользящие p50/p95/p99 по стадиям запросов (см. `instrumentation`)."""
+    return JsonResponse(instrumentation.snapshot())
+
+def prediction_cache_view(request):
+    """Статистика LRU-кэша прогнозов и реестров моделей всех вариантов."""
+    return JsonResponse({
+        "predictions": prediction_cache.stats(),
+        "registry": {name: get_registry(name).stats() for name in VARIANTS},
+    })
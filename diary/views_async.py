@@ -0,0 +1,124 @@
+# diary/views_async.py
+"""Async-варианты `/predict/` и `/update-value/` для ASGI.
+
+• Тяжёлая математика (DataFrame, NumPy, sklearn) выполняется в отдельном
+  ограниченном пуле потоков (`DIARY_PREDICT_WORKERS`), а не в
+  event loop. Пока идёт расчёт, процесс продолжает принимать запросы.
+• Одинаковые запросы прогноза для одной версии данных склеиваются:
+  пока первый считается, остальные ждут тот же future.
+• `update_value` отдаёт запись в очередь (`diary.write_queue`) и ждёт
+  её future, не занимая поток: соседние клики пишутся одной транзакцией.
+  Ожидание ограничено `DIARY_WRITE_QUEUE_TIMEOUT` (503 по истечении);
+  при выключенной очереди запись идёт через `sync_to_async`.
+
+Маршруты подключаются в `diary/urls.py` при `DIARY_ASYNC_VIEWS = True`.
+`diary_project/asgi.py` включает эту настройку по умолчанию.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import json
+import logging
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Tuple
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from .data_version import aget_data_version
+from .instrumentation import stage
+from .ml_utils.variants import get_variant
+from .views import _load_value_update, _predict_payload, _write_failed
+from .write_queue import write_queue
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREDICT_WORKERS = 4
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+# event loop → {(версия данных, вариант модели, тело запроса): future}
+_inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[int, str, str], asyncio.Future]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                workers = int(getattr(settings, "DIARY_PREDICT_WORKERS", DEFAULT_PREDICT_WORKERS))
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="diary-predict")
+    return _executor
+
+
+def _run_predict(user_input: Dict[str, Any], model: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        return _predict_payload(user_input, model)
+    finally:
+        close_old_connections()  # поток пула живёт дольше запроса
+
+
+@csrf_exempt
+@require_POST
+async def predict_today_async(request):
+    try:
+        user_input = json.loads(request.body.decode("utf-8"))
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+    if not isinstance(user_input, dict):
+        return JsonResponse({"error": "Ожидается объект {key: value}"}, status=400)
+    try:
+        variant = get_variant(request.GET.get("model"))
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    key = (await aget_data_version(), variant.name, json.dumps(user_input, sort_keys=True))
+    loop = asyncio.get_running_loop()
+    inflight = _inflight.setdefault(loop, {})
+    future = inflight.get(key)
+    if future is None:
+        context = contextvars.copy_context()  # стадии попадут в замеры этого запроса
+        future = loop.run_in_executor(_get_executor(), context.run, _run_predict, user_input, variant.name)
+        inflight[key] = future
+        future.add_done_callback(lambda _, key=key: inflight.pop(key, None))
+    else:
+        logger.debug("🔁 predict_today: присоединились к расчёту для версии %s", key[0])
+
+    try:
+        payload = await asyncio.shield(future)
+    except Exception as exc:
+        logger.exception("predict_today failed")
+        return JsonResponse({"error": str(exc)}, status=500)
+    return JsonResponse(payload)
+
+
+@csrf_exempt
+@require_POST
+async def update_value_async(request):
+    try:
+        date_obj, param_key, value = _load_value_update(request.body)
+    except (KeyError, ValueError) as exc:
+        logger.error("❌ Ошибка в запросе update_value: %s", exc)
+        return JsonResponse({"status": "error", "message": str(exc)}, status=400)
+
+    operations = [{"date": date_obj.isoformat(), "parameter": param_key, "value": value}]
+    try:
+        with stage("write"):
+            result = (await write_queue.aapply(operations))[0]
+    except Exception as exc:
+        return _write_failed(exc, "update_value")
+
+    if result["status"] == "error":
+        logger.error("❌ Ошибка в запросе update_value: %s", result["message"])
+        return JsonResponse({"status": "error", "message": result["message"]}, status=400)
+    logger.info("Параметр сохраняется в БД. %s=%s for %s", param_key, value, date_obj)
+    return JsonResponse({"status": "ok"})
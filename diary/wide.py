@@ -0,0 +1,136 @@
+# diary/wide.py
+"""Широкое представление дневника: одна строка `EntryRow` на день.
+
+Узкая таблица `EntryValue(entry, parameter, value)` остаётся источником
+истины. Для чтения рядом хранится `EntryRow(entry, date, data)`, где
+`data = {"<Parameter.id>": value}` — все значения дня. Полная история
+читается одним упорядоченным проходом по N строкам вместо N×P строк
+с join на Entry.
+
+• `refresh_rows(entry_ids)` пересчитывает строки дней из EntryValue
+  (внутри `transaction.atomic` — в транзакции вызывающего, если она есть).
+  Вызывается сигналами EntryValue и явно после bulk-операций
+  (`writes`, импорт Excel, генератор бенчмарка). Все эти пути пишут
+  в транзакции: `Entry.save()` / `EntryValue.save()` открывают её сами,
+  `delete()` шлёт сигналы внутри своей. Поэтому сбой пересчёта
+  откатывает и саму запись. `QuerySet.update()` сигналов не шлёт —
+  после ручных правок нужен `manage.py wide_rows --rebuild`.
+• Перенос записи на другую дату правит `EntryRow.date` (`sync_date`).
+• `iter_rows` / `read_matrix` — чтение для снапшота, выгрузок
+  и статистик live-модели.
+• `rebuild()` / `check()` — полная пересборка и сверка с EntryValue
+  (`manage.py wide_rows`).
+"""
+from __future__ import annotations
+
+import logging
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+from django.db import transaction
+
+from .models import Entry, EntryRow, EntryValue
+
+logger = logging.getLogger("diary.wide")
+
+BATCH_SIZE = 500
+CURSOR_CHUNK = 2000
+
+
+def _chunks(ids: List[int], size: int = BATCH_SIZE) -> Iterator[List[int]]:
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+
+def refresh_rows(entry_ids: Iterable[int]) -> None:
+    """Пересобирает `EntryRow` для записей `entry_ids` из EntryValue."""
+    ids = sorted({int(i) for i in entry_ids})
+    if not ids:
+        return
+    with transaction.atomic():
+        for chunk in _chunks(ids):
+            data: Dict[int, Dict[str, float | None]] = {}
+            cells = EntryValue.objects.filter(entry_id__in=chunk).values_list("entry_id", "parameter_id", "value")
+            for entry_id, param_id, value in cells:
+                data.setdefault(entry_id, {})[str(param_id)] = value
+            dates = dict(Entry.objects.filter(id__in=list(data)).values_list("id", "date"))
+
+            rows = [EntryRow(entry_id=e, date=dates[e], data=d) for e, d in data.items() if e in dates]
+            empty = [e for e in chunk if e not in dates]
+            if empty:
+                EntryRow.objects.filter(entry_id__in=empty).delete()
+            if rows:
+                EntryRow.objects.bulk_create(
+                    rows, update_conflicts=True, unique_fields=["entry"], update_fields=["date", "data"]
+                )
+
+
+def sync_date(entry: Entry) -> None:
+    """Entry сменила дату — дублированная дата в строке тоже."""
+    EntryRow.objects.filter(entry_id=entry.pk).exclude(date=entry.date).update(date=entry.date)
+
+
+def iter_rows(
+    *,
+    dates: Iterable[date] | None = None,
+    start: date | None = None,
+    end: date | None = None,
+) -> Iterator[Tuple[date, Dict[str, float | None]]]:
+    """`(дата, {"<param_id>": value})` по возрастанию даты."""
+    qs = EntryRow.objects.order_by("date")
+    if dates is not None:
+        qs = qs.filter(date__in=list(dates))
+    if start:
+        qs = qs.filter(date__gte=start)
+    if end:
+        qs = qs.filter(date__lte=end)
+    return qs.values_list("date", "data").iterator(chunk_size=CURSOR_CHUNK)
+
+
+def read_matrix(param_ids: Iterable[int], *, dates: Iterable[date] | None = None) -> Tuple[List[date], np.ndarray]:
+    """(даты, float64 N×P с NaN) по столбцам `param_ids`; дни без значений этих параметров отброшены."""
+    columns = [str(int(pid)) for pid in param_ids]
+    days: List[date] = []
+    rows: List[List[float]] = []
+    nan = float("nan")
+    for day, data in iter_rows(dates=dates):
+        row = [nan if (v := data.get(c)) is None else v for c in columns]
+        if any(v == v for v in row):  # есть хоть одно не-NaN
+            days.append(day)
+            rows.append(row)
+    values = np.array(rows, dtype=np.float64) if rows else np.empty((0, len(columns)))
+    return days, values
+
+
+def rebuild() -> int:
+    """Пересобирает всю таблицу с нуля; возвращает число строк."""
+    with transaction.atomic():
+        EntryRow.objects.all().delete()
+        entry_ids = list(EntryValue.objects.values_list("entry_id", flat=True).distinct())
+        refresh_rows(entry_ids)
+        count = EntryRow.objects.count()
+    logger.info("🧱 Широкая таблица пересобрана: %d строк", count)
+    return count
+
+
+def check() -> Dict[str, int]:
+    """Сверка EntryRow с EntryValue: число расходящихся / лишних / недостающих строк."""
+    expected: Dict[int, Dict[str, float | None]] = {}
+    for entry_id, param_id, value in EntryValue.objects.values_list("entry_id", "parameter_id", "value").iterator(
+        chunk_size=CURSOR_CHUNK
+    ):
+        expected.setdefault(entry_id, {})[str(param_id)] = value
+    dates = dict(Entry.objects.values_list("id", "date"))
+
+    mismatched = extra = 0
+    seen = set()
+    for entry_id, day, data in EntryRow.objects.values_list("entry_id", "date", "data").iterator(
+        chunk_size=CURSOR_CHUNK
+    ):
+        seen.add(entry_id)
+        if entry_id not in expected:
+            extra += 1
+        elif data != expected[entry_id] or dates.get(entry_id) != day:
+            mismatched += 1
+    return {"rows": len(seen), "mismatched": mismatched, "extra": extra, "missing": len(set(expected) - seen)}
@@ -0,0 +1,222 @@
+# diary/write_queue.py
+"""Единая очередь записи значений дневника.
+
+SQLite допускает одного писателя. Когда каждый запрос пишет сам, клики
+слайдеров из нескольких вкладок, импорт и обучение толкаются за
+блокировку. Каждый клик при этом платит за свой коммит. Здесь все
+записи значений идут через один фоновый поток:
+
+• `submit(operations)` кладёт пакет операций (формат `diary.writes`)
+  в очередь и возвращает `concurrent.futures.Future` со статусами;
+• поток берёт первый пакет и ещё `DIARY_WRITE_QUEUE_LINGER_MS` ждёт
+  соседние (но не больше `DIARY_WRITE_QUEUE_MAX_OPS` операций);
+• все собранные операции применяются одним `apply_value_operations` —
+  одна транзакция и один коммит на всплеск. Повторные клики по той же
+  паре (дата, параметр) схлопываются, побеждает последний;
+• статусы раздаются обратно по пакетам, индексы — свои у каждого.
+  Если упала вся транзакция, исключение получают все пакеты всплеска.
+  Отменённые до записи пакеты пропускаются. Сбой одного всплеска не
+  останавливает поток: ошибку получают его пакеты, очередь работает дальше.
+
+`apply(operations)` — синхронная обёртка для view. Ждёт не дольше
+`DIARY_WRITE_QUEUE_TIMEOUT` секунд, затем отменяет пакет (если его ещё
+не начали писать) и поднимает `TimeoutError`. Запись идёт мимо
+очереди, если она выключена (`DIARY_WRITE_QUEUE = False`), если вызов
+пришёл из открытой транзакции (фоновое соединение не увидит её
+данные и будет ждать её блокировку) или из самого потока очереди.
+
+`aapply(operations)` — то же для async-view: ждёт future без потока,
+с тем же таймаутом. При выключенной очереди запись уходит в
+`sync_to_async` — ORM нельзя вызывать из event loop.
+
+После `fork` (пул обучения) в дочернем процессе очередь создаётся
+заново, поток стартует при первой записи.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Dict, List, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from .writes import apply_value_operations
+
+logger = logging.getLogger("diary.writes")
+
+Operations = List[Dict[str, Any]]
+_STOP = object()
+
+
+class WriteQueue:
+    """Фоновый писатель: склеивает пакеты операций в общие транзакции."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._queue: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, "DIARY_WRITE_QUEUE", True)
+
+    def submit(self, operations: Operations) -> "Future[List[Dict[str, Any]]]":
+        future: "Future[List[Dict[str, Any]]]" = Future()
+        if not self.enabled:
+            try:
+                future.set_result(apply_value_operations(operations))
+            except Exception as exc:
+                future.set_exception(exc)
+            return future
+        self._ensure_started()
+        self._queue.put((list(operations), future))
+        return future
+
+    def apply(self, operations: Operations) -> List[Dict[str, Any]]:
+        """Записывает пакет и ждёт результат (для синхронных view)."""
+        if connection.in_atomic_block or threading.current_thread() is self._thread:
+            return apply_value_operations(operations)
+        timeout = _timeout()
+        future = self.submit(operations)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            _log_timeout(timeout, operations, future.cancel())
+            raise
+
+    async def aapply(self, operations: Operations) -> List[Dict[str, Any]]:
+        """Async-вариант `apply` (для ASGI-view)."""
+        if not self.enabled:
+            return await sync_to_async(apply_value_operations)(operations)
+        timeout = _timeout()
+        future = self.submit(operations)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except TimeoutError:
+            _log_timeout(timeout, operations, future.cancel())
+            raise
+
+    def stop(self) -> None:
+        """Дописывает очередь и останавливает поток (соединение закрывается)."""
+        with self._lock:
+            thread = self._thread
+            if thread is None:
+                return
+            self._queue.put(_STOP)
+            thread.join()
+            self._thread = None
+
+    def restart_after_fork(self) -> None:
+        self._lock = threading.Lock()
+        self._reset()
+
+    # --- Поток записи ---
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="diary-write-queue", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        linger = getattr(settings, "DIARY_WRITE_QUEUE_LINGER_MS", 5) / 1000
+        max_ops = getattr(settings, "DIARY_WRITE_QUEUE_MAX_OPS", 500)
+        stopping = False
+        try:
+            while not stopping:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                batch = [item]
+                size = len(item[0])
+                deadline = time.monotonic() + linger
+                while size < max_ops:
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                    size += len(item[0])
+                try:
+                    self._flush(batch)
+                except Exception as exc:
+                    logger.exception("❌ Очередь записи: сбой обработки пакета")
+                    for _, future in batch:
+                        _settle(future, exc=exc)
+        finally:
+            # Без self._lock: его держит stop(), пока ждёт этот поток
+            if self._thread is threading.current_thread():
+                self._thread = None
+            connection.close()
+
+    def _flush(self, batch: List[Tuple[Operations, Future]]) -> None:
+        # Отменённые (apply() не дождался) пакеты не пишем; остальные
+        # переводим в «выполняется» — отменить их уже нельзя
+        batch = [(ops, future) for ops, future in batch if not future.done() and future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        operations = [op for ops, _ in batch for op in ops]
+        try:
+            close_old_connections()
+            results = apply_value_operations(operations)
+        except Exception as exc:
+            logger.exception("❌ Очередь записи: пакет из %d операций не записан", len(operations))
+            for _, future in batch:
+                _settle(future, exc=exc)
+            return
+        finally:
+            close_old_connections()
+
+        if len(batch) > 1:
+            logger.debug("📝 Очередь записи: %d запросов → одна транзакция (%d операций)", len(batch), len(operations))
+        offset = 0
+        for ops, future in batch:
+            own = results[offset:offset + len(ops)]
+            for result in own:
+                result["index"] -= offset
+            _settle(future, result=own)
+            offset += len(ops)
+
+
+def _timeout() -> float:
+    return getattr(settings, "DIARY_WRITE_QUEUE_TIMEOUT", 30)
+
+
+def _log_timeout(timeout: float, operations: Operations, cancelled: bool) -> None:
+    logger.error(
+        "⏱️ Очередь записи не ответила за %s с (%d операций, %s)",
+        timeout, len(operations), "отменено" if cancelled else "запись уже идёт",
+    )
+
+
+def _settle(future: Future, *, result: Any = None, exc: BaseException | None = None) -> None:
+    """Отдаёт результат или ошибку; уже завершённый future пропускается."""
+    try:
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        logger.warning("⚠️ Очередь записи: результат пакета уже выставлен или пакет отменён")
+
+
+write_queue = WriteQueue()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=write_queue.restart_after_fork)
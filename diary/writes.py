@@ -0,0 +1,132 @@
+# diary/writes.py
+"""Пакетная запись значений дневника.
+
+Одна операция — `{"date": "YYYY-MM-DD", "parameter": key, "value": 0‑5 | null}`;
+`value = null` удаляет значение. NaN, бесконечности и значения вне шкалы
+0‑5 получают статус `error`. Пакет применяется так:
+
+1. повторные операции над одной парой (дата, параметр) схлопываются —
+   побеждает последняя, предыдущие получают статус `coalesced`;
+2. параметры берутся из справочника (`diary.catalog`), записи (Entry)
+   резолвятся одним запросом,
+   недостающие Entry создаются через `bulk_create`;
+3. удаления и upsert'ы (`bulk_create(update_conflicts=True)`) выполняются
+   в одном `transaction.atomic` — один коммит/fsync на весь пакет.
+
+Bulk-операции не шлют `post_save`, поэтому статистики live-модели
+обновляются через `live_stats.track_entries`, широкие строки дней
+(`diary.wide`) пересчитываются явно, а версия данных поднимается
+явно один раз (вместе с отметкой изменённых дат для снапшота).
+"""
+from __future__ import annotations
+
+import logging
+import math
+from datetime import date, datetime
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+from django.db import transaction
+
+from . import snapshot, wide
+from .catalog import get_catalog
+from .ml_utils import live_stats
+from .models import Entry, EntryValue
+
+logger = logging.getLogger("diary.writes")
+
+# Шкала слайдеров (как у полей EntryForm)
+VALUE_MIN, VALUE_MAX = 0.0, 5.0
+# Записей в одном `entry_id IN (...)` при удалении (лимиты SQLite на выражение)
+DELETE_CHUNK = 500
+
+
+def _parse_date(raw: Any) -> date:
+    if not raw:
+        return date.today()
+    return datetime.fromisoformat(str(raw).split("T")[0]).date()
+
+
+def _parse_value(raw: Any) -> float | None:
+    if raw in (None, "", "None"):
+        return None
+    value = float(raw)
+    if not math.isfinite(value) or not VALUE_MIN <= value <= VALUE_MAX:
+        raise ValueError(f"значение должно быть числом от {VALUE_MIN:g} до {VALUE_MAX:g}: {raw!r}")
+    return value
+
+
+def apply_value_operations(operations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Применяет пакет операций; возвращает статус для каждой (в том же порядке)."""
+    results: List[Dict[str, Any]] = [{"index": i, "status": "pending"} for i in range(len(operations))]
+
+    # --- Разбор и схлопывание: последняя операция над парой побеждает ---
+    latest: Dict[Tuple[date, str], Tuple[int, float | None]] = {}
+    for i, op in enumerate(operations):
+        try:
+            if not isinstance(op, dict):
+                raise ValueError("операция должна быть объектом")
+            key = str(op["parameter"])
+            day = _parse_date(op.get("date"))
+            value = _parse_value(op.get("value"))
+        except (KeyError, TypeError, ValueError) as exc:
+            results[i].update(status="error", message=str(exc))
+            continue
+        results[i].update(date=day.isoformat(), parameter=key)
+        previous = latest.get((day, key))
+        if previous is not None:
+            results[previous[0]]["status"] = "coalesced"
+        latest[(day, key)] = (i, value)
+
+    if not latest:
+        return results
+
+    # --- Справочники одним запросом ---
+    catalog = get_catalog()
+    params = {k: catalog.by_key[k].id for _, k in latest if k in catalog.by_key}
+    for (day, key), (i, _) in list(latest.items()):
+        if key not in params:
+            results[i].update(status="error", message=f"Parameter '{key}' not found")
+            del latest[(day, key)]
+    if not latest:
+        return results
+
+    days = {d for d, _ in latest}
+    with transaction.atomic():
+        Entry.objects.bulk_create([Entry(date=d) for d in days], ignore_conflicts=True)
+        entries = dict(Entry.objects.filter(date__in=days).values_list("date", "id"))
+
+        deletes = [(entries[d], params[k]) for (d, k), (_, v) in latest.items() if v is None]
+        upserts = [
+            EntryValue(entry_id=entries[d], parameter_id=params[k], value=v)
+            for (d, k), (_, v) in latest.items() if v is not None
+        ]
+
+        if deletes:
+            # Обычный delete() шлёт сигналы — статистики обновятся сами.
+            # По параметру и кусками записей: одно OR-выражение на весь
+            # пакет упирается в глубину дерева выражений SQLite
+            by_param: Dict[int, List[int]] = defaultdict(list)
+            for entry_id, param_id in deletes:
+                by_param[param_id].append(entry_id)
+            for param_id, entry_ids in by_param.items():
+                for start in range(0, len(entry_ids), DELETE_CHUNK):
+                    EntryValue.objects.filter(
+                        parameter_id=param_id, entry_id__in=entry_ids[start:start + DELETE_CHUNK]
+                    ).delete()
+
+        if upserts:
+            with live_stats.track_entries(ev.entry_id for ev in upserts):
+                EntryValue.objects.bulk_create(
+                    upserts,
+                    update_conflicts=True,
+                    unique_fields=["entry", "parameter"],
+                    update_fields=["value"],
+                )
+            wide.refresh_rows(ev.entry_id for ev in upserts)
+        snapshot.bump_dirty_dates(days)
+
+    for (day, key), (i, value) in latest.items():
+        results[i]["status"] = "deleted" if value is None else "ok"
+    logger.info("Пакет значений записан: %d операций, %d уникальных", len(operations), len(latest))
+    return results
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'diary_project.settings')
+# Под ASGI прогноз и запись значения обслуживают async-вьюхи (diary.views_async)
+os.environ.setdefault('DIARY_ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
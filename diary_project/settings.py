@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -34,6 +35,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'diary.instrumentation.StageTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,9 +68,23 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Соединение живёт между запросами (проверяется перед повторным использованием)
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Транзакция сразу берёт блокировку записи — без взаимных блокировок писателей
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# PRAGMA на каждое новое SQLite-соединение (diary.db)
+DIARY_SQLITE_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "busy_timeout": 20_000,  # мс
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -92,6 +108,10 @@ USE_TZ = True
 STATIC_URL = '/static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Логи пишутся в фоновом потоке (diary.log_queue): запрос только кладёт
+# запись в очередь. Уровень — DIARY_LOG_LEVEL (по умолчанию DEBUG при DEBUG).
+DIARY_LOG_LEVEL = os.environ.get("DIARY_LOG_LEVEL", "DEBUG" if DEBUG else "INFO")
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -103,31 +123,38 @@ LOGGING = {
     },
     "handlers": {
         "console": {
-            "class": "logging.StreamHandler",
+            "()": "diary.log_queue.queued",
+            "target": {"class": "logging.StreamHandler"},
             "formatter": "detailed",
         },
         "diary_file": {
-            "class": "logging.FileHandler",
-            "filename": BASE_DIR / "diary.log",
+            "()": "diary.log_queue.queued",
+            "target": {
+                "class": "logging.FileHandler",
+                "filename": BASE_DIR / "diary.log",
+                "encoding": "utf-8",
+            },
             "formatter": "detailed",
-            "encoding": "utf-8",
         },
         "predict_file": {
-            "class": "logging.FileHandler",
-            "filename": BASE_DIR / "predict.log",
+            "()": "diary.log_queue.queued",
+            "target": {
+                "class": "logging.FileHandler",
+                "filename": BASE_DIR / "predict.log",
+                "encoding": "utf-8",
+            },
             "formatter": "detailed",
-            "encoding": "utf-8",
         },
     },
     "loggers": {
         "diary": {
             "handlers": ["diary_file", "console"],
-            "level": "DEBUG",
+            "level": DIARY_LOG_LEVEL,
             "propagate": False,
         },
         "predict": {
             "handlers": ["predict_file", "console"],
-            "level": "DEBUG",
+            "level": DIARY_LOG_LEVEL,
             "propagate": False,
         },
     },
@@ -136,5 +163,52 @@ LOGGING = {
         "level": "INFO",
     },
 }
+# Признаки истории для базовой модели (diary.ml_utils.features):
+# лаги в днях и окна скользящих средних (пустые кортежи — выключить)
+DIARY_FEATURE_LAGS = (1,)
+DIARY_FEATURE_WINDOWS = (3, 7, 30)
+
+# Каталог базовых моделей (manage.py train_models, diary.ml_utils.registry);
+# варианты flags / hybrid лежат рядом: trained_models/<вариант>/
+DIARY_BASE_MODEL_DIR = BASE_DIR / "diary" / "trained_models" / "base"
+
+# Вариант базовой модели по умолчанию: base | flags | hybrid
+# (train_models --model, ?model= у прогнозов; diary.ml_utils.variants)
+DIARY_MODEL_VARIANT = "base"
+
+# Фоновое обучение (diary.jobs): процессов на задачу и таймаут «зависшей» задачи
+DIARY_TRAINING_JOBS = 1
+DIARY_TRAINING_STALE_SECONDS = 30 * 60
+
+# Отладочная выгрузка дневника в Excel (manage.py export_diary_excel / админка)
+DIARY_EXCEL_EXPORT_PATH = BASE_DIR / "debug_diary_dataframe.xlsx"
+
+# Колоночный снапшот матрицы «дата × параметр» (mmap, общий для воркеров)
+DIARY_SNAPSHOT_DIR = BASE_DIR / "diary" / "snapshots"
+
+# Замеры стадий запросов: окно для p50/p95/p99 и заголовок Server-Timing
+DIARY_TIMING_WINDOW = 1024
+DIARY_SERVER_TIMING = DEBUG
+
+# Async-вьюхи /predict/ и /update-value/ (включается в asgi.py) и размер
+# пула потоков для расчёта прогнозов
+DIARY_ASYNC_VIEWS = os.environ.get("DIARY_ASYNC_VIEWS", "0") == "1"
+DIARY_PREDICT_WORKERS = 4
+
+# Очередь записи значений (diary.write_queue): одна фоновая транзакция на
+# всплеск кликов. Сколько ждать соседние запросы (мс), предел операций в пакете
+# и сколько view ждёт свою запись (сек)
+DIARY_WRITE_QUEUE = True
+DIARY_WRITE_QUEUE_LINGER_MS = 5
+DIARY_WRITE_QUEUE_MAX_OPS = 500
+DIARY_WRITE_QUEUE_TIMEOUT = 30
+# Предел операций в одном запросе /update-values/
+DIARY_MAX_BATCH_OPS = 2000
+
+# LRU-кэш прогнозов: размер, TTL (сек) и шаг квантования входов 0‑5
+DIARY_PREDICTION_CACHE_SIZE = 1024
+DIARY_PREDICTION_CACHE_TTL = 600
+DIARY_PREDICTION_CACHE_STEP = 0.1
+
 STATICFILES_DIRS = [BASE_DIR / 'static']
 STATIC_ROOT = BASE_DIR / 'staticfiles'
\ No newline at end of file